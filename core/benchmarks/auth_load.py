@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+'''
+Load test for the Hysteria2 HTTP auth endpoint (hysteria2/auth_server.py).
+
+Without --url it seeds a throw-away user store, starts the auth server
+against it on a local port and, after the run, blocks one user to measure
+how long the server takes to pick up the change. Keep-alive clients post
+{"auth": "user:password"} for --duration seconds, mostly with valid
+credentials, and the script reports requests/sec and latency percentiles.
+
+    python3 core/benchmarks/auth_load.py --users 10000 --concurrency 64 --duration 10
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import aiohttp
+
+from bench_common import percentile, free_port, seed_users
+
+CORE_DIR = Path(__file__).resolve().parents[1]
+AUTH_SERVER = CORE_DIR / 'scripts' / 'hysteria2' / 'auth_server.py'
+
+
+def seed_credentials(count: int) -> dict[str, str]:
+    return {username: user['password'] for username, user in seed_users(count, 'load').items()}
+
+
+async def wait_until_up(url: str, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.post(url, json={'auth': 'probe:probe'}) as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f'Auth server at {url} did not come up within {timeout}s')
+
+
+async def run_load(url: str, credentials: dict[str, str], concurrency: int, duration: float,
+                   invalid_ratio: float) -> dict:
+    usernames = list(credentials)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(session: aiohttp.ClientSession, seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            username = rng.choice(usernames)
+            password = credentials[username] if rng.random() >= invalid_ratio else 'wrong'
+            started = time.perf_counter()
+            async with session.post(url, json={'auth': f'{username}:{password}'}) as response:
+                await response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session, seed) for seed in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'statuses': statuses,
+    }
+
+
+async def measure_reload(url: str, username: str, password: str, timeout: float = 30) -> float:
+    '''Blocks a user in the store and returns the seconds until the server rejects them.'''
+    from storage import get_store
+
+    store = get_store()
+    store.set_blocked([username])
+    # Publish the snapshot now, as the block-then-kick paths do, so only the server's pickup is timed.
+    store.flush_derived()
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() - started < timeout:
+            async with session.post(url, json={'auth': f'{username}:{password}'}) as response:
+                if response.status == 401:
+                    return time.perf_counter() - started
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f'The server still accepted {username} after {timeout}s')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure auth requests/sec against the auth server.')
+    parser.add_argument('--url', help='Existing auth endpoint; requires --credentials (default: start one locally).')
+    parser.add_argument('--credentials', help='JSON file of {"username": "password"} to use with --url.')
+    parser.add_argument('--users', type=int, default=10000, help='Users to seed for the local server (default: 10000).')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent keep-alive clients (default: 64).')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load (default: 10).')
+    parser.add_argument('--invalid-ratio', type=float, default=0.05, help='Share of wrong passwords (default: 0.05).')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.credentials:
+            parser.error('--url requires --credentials')
+        with open(args.credentials) as f:
+            credentials = json.load(f)
+        result = asyncio.run(run_load(args.url, credentials, args.concurrency, args.duration, args.invalid_ratio))
+        print(json.dumps(result, indent=2) if args.json else result)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='auth_load_') as workdir:
+        os.environ['HYSTERIA_USERS_DB_PATH'] = os.path.join(workdir, 'users.db')
+        os.environ['HYSTERIA_USERS_JSON_PATH'] = os.path.join(workdir, 'users.json')
+        sys.path.insert(0, str(CORE_DIR / 'scripts'))
+        credentials = seed_credentials(args.users)
+
+        port = free_port()
+        url = f'http://127.0.0.1:{port}/auth'
+        env = dict(os.environ, HYSTERIA_AUTH_PORT=str(port))
+        server = subprocess.Popen([sys.executable, str(AUTH_SERVER)], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            asyncio.run(wait_until_up(url))
+            result = asyncio.run(run_load(url, credentials, args.concurrency, args.duration, args.invalid_ratio))
+            username = next(iter(credentials))
+            result['reload_seconds'] = round(asyncio.run(measure_reload(url, username, credentials[username])), 2)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps({'users': args.users, 'concurrency': args.concurrency, **result}, indent=2))
+        return 0
+
+    print(f'{args.users} users, {args.concurrency} clients, {args.duration:g}s')
+    print(f"requests/sec: {result['requests_per_sec']}  ({result['requests']} requests)")
+    print(f"latency p50: {result['p50_ms']} ms  p99: {result['p99_ms']} ms")
+    print(f"status codes: {result['statuses']}")
+    print(f"blocked user rejected after: {result['reload_seconds']} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+'''
+Helpers shared by the benchmark scripts in this directory.
+
+The scripts are run directly (python3 core/benchmarks/<name>.py), which puts
+this directory on sys.path, so they import it as ``bench_common``.
+'''
+
+import time
+import uuid
+import socket
+from typing import Any, Dict, Sequence
+
+GIB = 1024 ** 3
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    '''Nearest-rank percentile; 0.0 for no samples.'''
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_users(count: int, prefix: str = 'user', **fields: Any) -> Dict[str, Dict[str, Any]]:
+    '''
+    Adds ``count`` users named <prefix><i> to the active store, writes the
+    derived files, and returns the users. Keyword arguments override the
+    default fields; a callable is called with the user's index.
+    '''
+    from storage import get_store
+
+    today = time.strftime('%Y-%m-%d')
+    users = {}
+    for i in range(count):
+        user = {
+            'password': uuid.uuid4().hex,
+            'max_download_bytes': 100 * GIB,
+            'expiration_days': 30,
+            'account_creation_date': today,
+            'blocked': False,
+            'unlimited_user': False,
+            'upload_bytes': 0,
+            'download_bytes': 0,
+        }
+        for key, value in fields.items():
+            user[key] = value(i) if callable(value) else value
+        users[f'{prefix}{i}'] = user
+    store = get_store()
+    store.add_many(users)
+    # Servers started next read the auth snapshot and users.json, not the store.
+    store.flush_derived()
+    return users
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+'''
+Latency benchmark for the cli_api calls behind the webpanel user endpoints.
+
+Runs every operation in both cli_api modes (in-process and one interpreter per
+call) against a throw-away user store in a temporary directory and prints
+p50/p99 latency per operation. The subprocess mode executes the installed
+scripts under /etc/hysteria/core/scripts and is skipped when they are missing.
+
+    python3 core/benchmarks/cli_api_bench.py --users 1000 --iterations 50
+'''
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+
+from bench_common import GIB, percentile, seed_users
+
+CORE_DIR = Path(__file__).resolve().parents[1]
+
+
+def seed(count: int) -> None:
+    seed_users(count, 'seed', max_download_bytes=10 * GIB, account_creation_date='2025-01-01',
+               token=lambda i: str(uuid.uuid4()), upload_bytes=lambda i: i * 1024, download_bytes=lambda i: i * 2048)
+
+
+def operations(cli_api, mode: str, iteration: int, with_uri: bool) -> list[tuple[str, Callable[[], Any]]]:
+    '''One round of the webpanel user endpoints, in the order a user's lifetime would hit them.'''
+    username = f'bench_{mode}_{iteration}'
+    ops = [
+        ('GET /users', cli_api.list_users),
+        ('POST /users', lambda: cli_api.add_user(username, 10, 30, None, None, False)),
+        ('GET /users/{name}', lambda: cli_api.get_user(username)),
+        ('PATCH /users/{name}', lambda: cli_api.edit_user(username, None, 20, 60, True, False, None, None)),
+        ('GET /users/{name}/reset', lambda: cli_api.reset_user(username)),
+    ]
+    if with_uri:
+        ops.append(('GET /users/{name}/uri', lambda: cli_api.show_user_uri_json([username])))
+    ops.append(('DELETE /users/{name}', lambda: cli_api.remove_user(username)))
+    return ops
+
+
+def run_mode(cli_api, mode: str, iterations: int, with_uri: bool) -> dict[str, dict[str, float]]:
+    cli_api.SUBPROCESS_MODE = mode == 'subprocess'
+    samples: dict[str, list[float]] = {}
+    for iteration in range(iterations):
+        for name, operation in operations(cli_api, mode, iteration, with_uri):
+            start = time.perf_counter()
+            operation()
+            samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    return {
+        name: {
+            'p50_ms': round(percentile(values, 50), 3),
+            'p99_ms': round(percentile(values, 99), 3),
+            'samples': len(values),
+        }
+        for name, values in samples.items()
+    }
+
+
+def print_table(results: dict[str, dict[str, dict[str, float]]]) -> None:
+    modes = list(results)
+    names = list(dict.fromkeys(name for mode in modes for name in results[mode]))
+    header = f"{'operation':<26}" + ''.join(f'{mode + " p50":>18}{mode + " p99":>18}' for mode in modes)
+    print(header)
+    print('-' * len(header))
+    for name in names:
+        row = f'{name:<26}'
+        for mode in modes:
+            stats = results[mode].get(name)
+            row += f"{stats['p50_ms']:>15.2f} ms{stats['p99_ms']:>15.2f} ms" if stats else f"{'-':>18}{'-':>18}"
+        print(row)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare in-process and subprocess cli_api latency.')
+    parser.add_argument('--users', type=int, default=1000, help='Users in the store before measuring (default: 1000).')
+    parser.add_argument('--iterations', type=int, default=30, help='Rounds of every operation per mode (default: 30).')
+    parser.add_argument('--modes', default='inprocess,subprocess', help='Comma-separated modes to run.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cli_api_bench_') as workdir:
+        # The store reads these on first use, and the subprocess mode inherits them.
+        os.environ['HYSTERIA_USERS_DB_PATH'] = os.path.join(workdir, 'users.db')
+        os.environ['HYSTERIA_USERS_JSON_PATH'] = os.path.join(workdir, 'users.json')
+        sys.path.insert(0, str(CORE_DIR))
+        import cli_api
+
+        seed(args.users)
+        with_uri = os.path.exists(cli_api.CONFIG_FILE)
+
+        results = {}
+        for mode in [mode.strip() for mode in args.modes.split(',') if mode.strip()]:
+            if mode == 'subprocess' and not os.path.isdir(cli_api.SCRIPT_DIR):
+                print(f'Skipping subprocess mode: {cli_api.SCRIPT_DIR} does not exist.', file=sys.stderr)
+                continue
+            results[mode] = run_mode(cli_api, mode, args.iterations, with_uri)
+        # Write the pending derived files while their directory still exists.
+        cli_api.get_store().flush_derived()
+
+    if args.json:
+        print(json.dumps({'users': args.users, 'iterations': args.iterations, 'results': results}, indent=2))
+    else:
+        print(f'{args.users} users, {args.iterations} iterations per operation'
+              + ('' if with_uri else ' (URI endpoint skipped: no config.json)'))
+        print_table(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
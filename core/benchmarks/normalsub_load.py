@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+'''
+Concurrency test for the Normal-SUB subscription server (normalsub/normalsub.py).
+
+Seeds a throw-away user store, starts the server against it on a local port
+and lets --clients concurrent keep-alive clients fetch subscriptions for
+random users with a mix of plain, sing-box and browser user agents (each
+client gets its own X-Forwarded-For, as behind Caddy). Reports latency
+percentiles and status codes, and exits non-zero if any request failed or
+the p99 latency exceeds --max-p99-ms. --workers runs the server with that
+many SO_REUSEPORT worker processes.
+
+URIs are built from the server's /etc/hysteria settings; without them the
+plain responses still go through the full pipeline but list no URIs.
+
+    python3 core/benchmarks/normalsub_load.py --clients 200 --requests 25
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import aiohttp
+
+from bench_common import percentile, free_port, seed_users
+
+CORE_DIR = Path(__file__).resolve().parents[1]
+NORMALSUB = CORE_DIR / 'scripts' / 'normalsub' / 'normalsub.py'
+SUBPATH = 'loadtest'
+USER_AGENTS = ['v2rayNG/1.8.5', 'ClashMeta', 'sing-box 1.8.0', 'Mozilla/5.0 Chrome/120.0']
+
+
+def seed_tokens(count: int) -> list[str]:
+    users = seed_users(count, 'sub', blocked=lambda i: i % 50 == 0)
+    return [user['password'] for user in users.values()]
+
+
+async def wait_until_up(base_url: str, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f'{base_url}/robots.txt') as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f'Normal-SUB server at {base_url} did not come up within {timeout}s')
+
+
+async def run_clients(base_url: str, tokens: list[str], clients: int, requests: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    start = asyncio.Event()
+
+    async def client(seed: int):
+        rng = random.Random(seed)
+        headers = {'X-Forwarded-For': f'10.{seed // 250}.{seed % 250}.1'}
+        async with aiohttp.ClientSession(headers=headers) as session:
+            await start.wait()
+            for _ in range(requests):
+                url = f'{base_url}/sub/normal/{rng.choice(tokens)}'
+                started = time.perf_counter()
+                async with session.get(url, headers={'User-Agent': rng.choice(USER_AGENTS)}) as response:
+                    await response.read()
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    tasks = [asyncio.create_task(client(seed)) for seed in range(clients)]
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2),
+        'statuses': statuses,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Serve many concurrent subscription clients and check tail latency.')
+    parser.add_argument('--users', type=int, default=2000, help='Users to seed (default: 2000).')
+    parser.add_argument('--clients', type=int, default=200, help='Concurrent clients (default: 200).')
+    parser.add_argument('--requests', type=int, default=25, help='Requests per client (default: 25).')
+    parser.add_argument('--workers', type=int, default=1, help='Server worker processes (default: 1).')
+    parser.add_argument('--max-p99-ms', type=float, default=500, help='Fail above this p99 latency (default: 500).')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='normalsub_load_') as workdir:
+        os.environ['HYSTERIA_USERS_DB_PATH'] = os.path.join(workdir, 'users.db')
+        os.environ['HYSTERIA_USERS_JSON_PATH'] = os.path.join(workdir, 'users.json')
+        sys.path.insert(0, str(CORE_DIR / 'scripts'))
+        tokens = seed_tokens(args.users)
+
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}/{SUBPATH}'
+        env = dict(os.environ, SUBPATH=SUBPATH, AIOHTTP_LISTEN_ADDRESS='127.0.0.1', AIOHTTP_LISTEN_PORT=str(port),
+                   NORMALSUB_MAX_CONCURRENT=str(max(256, args.clients)))
+        server = subprocess.Popen([sys.executable, str(NORMALSUB), '--workers', str(args.workers)], env=env, cwd=workdir,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            asyncio.run(wait_until_up(base_url))
+            result = asyncio.run(run_clients(base_url, tokens, args.clients, args.requests))
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+
+    failed = sum(count for status, count in result['statuses'].items() if status != 200)
+    passed = failed == 0 and result['p99_ms'] <= args.max_p99_ms
+    if args.json:
+        print(json.dumps({'users': args.users, 'clients': args.clients, 'workers': args.workers,
+                          'passed': passed, **result}, indent=2))
+        return 0 if passed else 1
+
+    print(f"{args.clients} clients x {args.requests} requests over {args.users} users, {args.workers} worker(s)")
+    print(f"requests/sec: {result['requests_per_sec']}  ({result['requests']} requests)")
+    print(f"latency p50: {result['p50_ms']} ms  p99: {result['p99_ms']} ms  max: {result['max_ms']} ms")
+    print(f"status codes: {result['statuses']}")
+    print('PASS' if passed else f'FAIL (non-200 responses: {failed}, p99 limit: {args.max_p99_ms} ms)')
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+'''
+Benchmark for quota and expiry evaluation (the kick list of traffic.py and
+hysteria2/kick.py).
+
+Compares the previous implementation (one ThreadPoolExecutor task per
+user, each parsing the creation date) with QuotaTable: the one-off build
+that parses every user, the full evaluation pass used by one-shot runs
+(NumPy when it is installed; --no-numpy times the pure-Python fallback)
+and the incremental due_changes() the traffic collector runs every tick,
+with --active percent of the users reporting traffic.
+
+    python3 core/benchmarks/quota_bench.py --sizes 1000,10000,100000
+'''
+
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import quota  # noqa: E402
+from quota import QuotaTable  # noqa: E402
+
+GB = 1024 ** 3
+
+
+def make_users(count: int) -> dict:
+    rng = random.Random(count)
+    today = datetime.date.today()
+    users = {}
+    for i in range(count):
+        users[f'user{i}'] = {
+            'password': f'p{i}',
+            'max_download_bytes': rng.choice([0, 10 * GB, 50 * GB, 200 * GB]),
+            'expiration_days': rng.choice([0, 30, 90, 365]),
+            'account_creation_date': (today - datetime.timedelta(days=rng.randint(0, 400))).isoformat(),
+            'blocked': rng.random() < 0.05,
+            'unlimited_user': False,
+            'upload_bytes': rng.randint(0, 20 * GB),
+            'download_bytes': rng.randint(0, 150 * GB),
+        }
+    return users
+
+
+def legacy_process_user(username, user_data, config_secret, users_data):
+    '''The per-user task kick_expired_users() submitted before QuotaTable.'''
+    if user_data.get('blocked', False):
+        return None
+    max_download_bytes = user_data.get('max_download_bytes', 0)
+    expiration_days = user_data.get('expiration_days', 0)
+    account_creation_date = user_data.get('account_creation_date')
+    total_bytes = user_data.get('download_bytes', 0) + user_data.get('upload_bytes', 0)
+    if not account_creation_date:
+        return None
+    try:
+        current_date = datetime.datetime.now().timestamp()
+        creation_date = datetime.datetime.fromisoformat(account_creation_date.replace('Z', '+00:00'))
+        expiration_date = (creation_date + datetime.timedelta(days=expiration_days)).timestamp()
+        if max_download_bytes > 0 and total_bytes >= 0 and expiration_days > 0:
+            if total_bytes >= max_download_bytes or current_date >= expiration_date:
+                return username
+    except Exception:
+        return None
+    return None
+
+
+def legacy_kick_list(users_data: dict) -> list:
+    users_to_kick = []
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(legacy_process_user, username, user_data, '', users_data)
+                   for username, user_data in users_data.items()]
+        for future in futures:
+            username = future.result()
+            if username:
+                users_to_kick.append(username)
+    return users_to_kick
+
+
+def best_of(repeat: int, fn):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare kick list evaluation strategies.')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated user counts.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is reported.')
+    parser.add_argument('--active', type=float, default=5, help='Percent of users with traffic per tick (default: 5).')
+    parser.add_argument('--no-numpy', action='store_true', help='Force the pure-Python evaluation pass.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    if args.no_numpy:
+        quota.np = None
+    backend = 'numpy' if quota.np is not None else 'array'
+
+    results = {}
+    for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+        users = make_users(size)
+        legacy_ms, expected = best_of(args.repeat, lambda: legacy_kick_list(users))
+        build_ms, table = best_of(args.repeat, lambda: QuotaTable.from_users(users))
+        due_ms, due = best_of(args.repeat, lambda: table.due())
+        tick_traffic = {f'user{i}': (1024, 4096) for i in range(0, size, max(1, round(100 / args.active)))}
+
+        def incremental_tick():
+            table.add_usage(tick_traffic)
+            return table.due_changes()
+
+        table.due_changes()  # drain the rows set by the initial build
+        tick_ms, _ = best_of(args.repeat, incremental_tick)
+        if sorted(due) != sorted(expected):
+            print(f'Mismatch at {size} users: {len(due)} vs {len(expected)} to kick', file=sys.stderr)
+            return 1
+        results[size] = {
+            'to_kick': len(due),
+            'legacy_ms': round(legacy_ms, 2),
+            'build_ms': round(build_ms, 2),
+            'due_ms': round(due_ms, 3),
+            'tick_ms': round(tick_ms, 3),
+            'speedup_per_tick': round(legacy_ms / tick_ms, 1) if tick_ms else None,
+            'speedup_cold': round(legacy_ms / (build_ms + due_ms), 1),
+        }
+
+    if args.json:
+        print(json.dumps({'backend': backend, 'results': results}, indent=2))
+        return 0
+
+    print(f'QuotaTable evaluation backend: {backend}')
+    header = (f"{'users':>8}{'to kick':>9}{'thread pool':>14}{'table build':>14}{'due() pass':>13}"
+              f"{'tick':>12}{'cold x':>9}{'tick x':>9}")
+    print(header)
+    print('-' * len(header))
+    for size, row in results.items():
+        print(f"{size:>8}{row['to_kick']:>9}{row['legacy_ms']:>11.1f} ms{row['build_ms']:>11.1f} ms"
+              f"{row['due_ms']:>10.2f} ms{row['tick_ms']:>9.3f} ms{row['speedup_cold']:>9}{row['speedup_per_tick']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
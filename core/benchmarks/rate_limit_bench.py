@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''
+Memory and throughput check for the subscription servers' rate limiter
+(core/scripts/rate_limit.py).
+
+Feeds --addresses distinct synthetic client IPs (1M by default, as a scan
+from many source addresses would) through a TokenBucketLimiter. It
+records traced memory at checkpoints and compares it with an unbounded
+dict keyed by IP, the structure the servers used before. Exits non-zero
+if the limiter's memory still grows once it is full. Also reports the
+throughput of the shared-memory limiter used by normalsub --workers.
+
+    python3 core/benchmarks/rate_limit_bench.py --addresses 1000000
+'''
+
+import sys
+import json
+import time
+import argparse
+import ipaddress
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+from rate_limit import TokenBucketLimiter, SharedTokenBucketLimiter, DEFAULT_MAX_KEYS  # noqa: E402
+
+
+def addresses(count: int):
+    base = int(ipaddress.IPv4Address('10.0.0.0'))
+    for i in range(count):
+        yield str(ipaddress.IPv4Address(base + i))
+
+
+def traced_run(check, count: int, checkpoints: int) -> list[tuple[int, int]]:
+    '''Returns [(addresses seen, traced bytes)] sampled at evenly spaced checkpoints.'''
+    step = max(1, count // checkpoints)
+    samples = []
+    tracemalloc.start()
+    try:
+        for seen, address in enumerate(addresses(count), 1):
+            check(address)
+            if seen % step == 0:
+                samples.append((seen, tracemalloc.get_traced_memory()[0]))
+    finally:
+        tracemalloc.stop()
+    return samples
+
+
+def checks_per_second(check, count: int) -> float:
+    pending = list(addresses(count))
+    started = time.perf_counter()
+    for address in pending:
+        check(address)
+    return count / (time.perf_counter() - started)
+
+
+def legacy_check(store: dict, limit: int, window: int):
+    def check(client_ip):
+        now = time.monotonic()
+        requests, last = store.get(client_ip, (0, 0))
+        if now - last < window and requests >= limit:
+            return False
+        store[client_ip] = (requests + 1 if now - last < window else 1, now)
+        return True
+    return check
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Check that rate limiter memory stays flat under many source IPs.')
+    parser.add_argument('--addresses', type=int, default=1_000_000, help='Distinct client IPs (default: 1000000).')
+    parser.add_argument('--max-keys', type=int, default=DEFAULT_MAX_KEYS, help='Limiter capacity (default: %(default)s).')
+    parser.add_argument('--checkpoints', type=int, default=10, help='Memory samples to take (default: 10).')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only measure the bounded limiter.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    limiter = TokenBucketLimiter(100, 60, args.max_keys)
+    samples = traced_run(limiter.allow, args.addresses, args.checkpoints)
+    full = [traced for seen, traced in samples if seen > args.max_keys]
+    # Once the LRU is full, memory may only wobble with allocator noise.
+    flat = not full or max(full) <= min(full) * 1.05
+    results = {
+        'addresses': args.addresses,
+        'max_keys': args.max_keys,
+        'keys': len(limiter),
+        'limiter_mb': [round(traced / 2 ** 20, 2) for _, traced in samples],
+        'limiter_ops_per_sec': round(checks_per_second(TokenBucketLimiter(100, 60, args.max_keys).allow,
+                                                       min(args.addresses, 200_000))),
+        'shared_limiter_ops_per_sec': round(checks_per_second(SharedTokenBucketLimiter(100, 60, args.max_keys).allow,
+                                                              min(args.addresses, 200_000))),
+        'flat': flat,
+    }
+    if not args.skip_legacy:
+        legacy_samples = traced_run(legacy_check({}, 100, 60), args.addresses, args.checkpoints)
+        results['legacy_mb'] = [round(traced / 2 ** 20, 2) for _, traced in legacy_samples]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0 if flat else 1
+
+    print(f"{args.addresses} distinct addresses, limiter capacity {args.max_keys} keys")
+    print(f"{'seen':>10}{'limiter MB':>12}" + ('' if args.skip_legacy else f"{'dict MB':>10}"))
+    for index, (seen, _) in enumerate(samples):
+        line = f"{seen:>10}{results['limiter_mb'][index]:>12}"
+        if not args.skip_legacy:
+            line += f"{results['legacy_mb'][index]:>10}"
+        print(line)
+    print(f"limiter: {results['limiter_ops_per_sec']} checks/sec, {results['keys']} keys tracked")
+    print(f"shared limiter: {results['shared_limiter_ops_per_sec']} checks/sec")
+    print('memory flat once full' if flat else 'FAIL: memory kept growing after the limiter filled up')
+    return 0 if flat else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+'''
+Microbenchmark for the sing-box subscription body built by normalsub.
+
+Compares the previous builder (shallow template copy, merge, then
+json.dumps(indent=4, sort_keys=True) of the whole config on every request)
+with the compiled SingboxConfigGenerator, both on a cache miss and when the
+encoded body comes from its cache. Every compiled body is checked to be
+byte-identical to the legacy output first.
+
+    python3 core/benchmarks/singbox_bench.py --users 1000 --nodes 4
+'''
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from urllib.parse import unquote, parse_qs, urlparse
+
+CORE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CORE_DIR / 'scripts' / 'normalsub'))
+
+from normalsub import SingboxConfigGenerator  # noqa: E402
+from show_user_uri import build_user_uris  # noqa: E402
+
+TEMPLATE = CORE_DIR / 'scripts' / 'normalsub' / 'singbox.json'
+
+
+class LegacySingboxConfigGenerator:
+    '''combine_configs() as it was before the compiled builder.'''
+
+    def __init__(self, template_path: str, default_sni: str):
+        self.template_path = template_path
+        self.default_sni = default_sni
+        self._template_cache = None
+
+    def get_template(self):
+        if self._template_cache is None:
+            with open(self.template_path, 'r') as f:
+                self._template_cache = json.load(f)
+        return self._template_cache.copy()
+
+    def generate_config_from_uri(self, uri, fragment):
+        parsed_url = urlparse(uri)
+        auth_password = parsed_url.password
+        auth_user = unquote(parsed_url.username or '')
+        if auth_password:
+            final_password = f"{auth_user}:{auth_password}" if auth_user else auth_password
+        else:
+            final_password = auth_user
+        return {
+            "type": "hysteria2",
+            "tag": unquote(parsed_url.fragment),
+            "server": parsed_url.hostname,
+            "server_port": parsed_url.port,
+            "obfs": {"type": "salamander", "password": parse_qs(parsed_url.query).get('obfs-password', [''])[0]},
+            "password": final_password,
+            "tls": {"enabled": True, "server_name": fragment if fragment else self.default_sni, "insecure": True},
+        }
+
+    def render(self, all_uris, fragment):
+        combined_config = self.get_template()
+        combined_config['outbounds'] = [out for out in combined_config['outbounds'] if out.get('type') != 'hysteria2']
+        hysteria_outbounds = [self.generate_config_from_uri(uri, fragment) for uri in all_uris]
+        all_tags = [out['tag'] for out in hysteria_outbounds]
+        for outbound in combined_config['outbounds']:
+            if outbound.get('tag') == 'select':
+                outbound['outbounds'] = ["auto"] + all_tags
+            elif outbound.get('tag') == 'auto':
+                outbound['outbounds'] = all_tags
+        combined_config['outbounds'].extend(hysteria_outbounds)
+        return json.dumps(combined_config, indent=4, sort_keys=True).encode()
+
+
+def make_uris(users: int, nodes: int) -> list[tuple[str, list[str]]]:
+    settings = {
+        "port": "443", "sha256": "sha256/AAAA", "obfs_password": "obfs", "insecure": True,
+        "ip4": "203.0.113.10", "ip6": "2001:db8::10", "sni": "example.com",
+        "nodes": [{"name": f"node{i}", "ip": f"198.51.100.{i + 1}"} for i in range(nodes)],
+    }
+    return [(f'user{i}', [uri for _, uri, _ in build_user_uris(f'user{i}', f'pass{i}', settings, show_all=True)])
+            for i in range(users)]
+
+
+def per_second(fn, requests, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for username, uris in requests:
+            fn(username, uris)
+        best = min(best, time.perf_counter() - started)
+    return len(requests) / best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare sing-box subscription builders.')
+    parser.add_argument('--users', type=int, default=1000, help='Distinct users rendered per round (default: 1000).')
+    parser.add_argument('--nodes', type=int, default=4, help='External nodes per user (default: 4).')
+    parser.add_argument('--repeat', type=int, default=3, help='Rounds per measurement; the best is reported.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    requests = make_uris(args.users, args.nodes)
+    with tempfile.NamedTemporaryFile('w', suffix='.json') as template:
+        # Include a "select" outbound and a stale hysteria2 outbound so every slot is exercised.
+        config = json.loads(TEMPLATE.read_text())
+        config['outbounds'].insert(0, {"tag": "select", "type": "selector", "outbounds": []})
+        config['outbounds'].append({"tag": "old", "type": "hysteria2"})
+        json.dump(config, template)
+        template.flush()
+
+        legacy = LegacySingboxConfigGenerator(template.name, 'example.com')
+        compiled = SingboxConfigGenerator('example.com', cache_bytes=1024 ** 3)
+        compiled.set_template_path(template.name)
+
+        for fragment in ('', 'cdn.example.org'):
+            for username, uris in requests[:50]:
+                if compiled.render(uris, username, fragment) != legacy.render(uris, fragment):
+                    print(f'Output mismatch for {username} (fragment {fragment!r})', file=sys.stderr)
+                    return 1
+
+        results = {
+            'legacy_rps': per_second(lambda username, uris: legacy.render(uris, ''), requests, args.repeat),
+            'compiled_rps': per_second(lambda username, uris: compiled.render(uris, username, ''), requests, args.repeat),
+        }
+        for username, uris in requests:
+            compiled.render(uris, username, '', (username,))
+        results['cached_rps'] = per_second(lambda username, uris: compiled.get_cached((username,), ''),
+                                           requests, args.repeat)
+        body_bytes = len(legacy.render(requests[0][1], ''))
+
+    results = {key: round(value) for key, value in results.items()}
+    if args.json:
+        print(json.dumps({'users': args.users, 'uris_per_user': len(requests[0][1]),
+                          'body_bytes': body_bytes, **results}, indent=2))
+        return 0
+
+    print(f'{args.users} users, {len(requests[0][1])} URIs each, {body_bytes} byte bodies')
+    print(f"legacy combine_configs + json.dumps: {results['legacy_rps']:>9} req/s")
+    print(f"compiled builder (cache miss):       {results['compiled_rps']:>9} req/s "
+          f"({results['compiled_rps'] / results['legacy_rps']:.1f}x)")
+    print(f"compiled builder (cache hit):        {results['cached_rps']:>9} req/s "
+          f"({results['cached_rps'] / results['legacy_rps']:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
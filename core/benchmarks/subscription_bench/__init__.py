@@ -0,0 +1,18 @@
+'''
+Offline load test and benchmark for the subscription endpoints served by
+normalsub (plain text, sing-box JSON and the browser HTML page).
+
+It writes synthetic users.json, nodes.json, extra.json, config.json and
+.configs.env at the requested scale into a temporary directory, starts the
+normalsub HysteriaServer against them on a local port, drives it with a
+weighted mix of real-world client User-Agents and reports throughput and
+p50/p95/p99 latency per response type. Reports are JSON so runs of two
+releases can be compared with --baseline.
+
+    python3 core/benchmarks/subscription_bench --users 5000 --nodes 3 --duration 20 --output 1.17.0.json
+    python3 core/benchmarks/subscription_bench --baseline 1.17.0.json
+
+Everything runs on the local machine; nothing is fetched from the network.
+'''
+
+REPORT_SCHEMA = 1
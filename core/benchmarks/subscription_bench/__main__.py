@@ -0,0 +1,74 @@
+'''
+Command line entry point: python3 core/benchmarks/subscription_bench [options]
+'''
+
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+if __package__ in (None, ''):
+    # Run as a directory; make the package importable by name.
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    __package__ = 'subscription_bench'
+
+from subscription_bench.driver import DEFAULT_MIX, parse_mix, run_load  # noqa: E402
+from subscription_bench.fixtures import write_fixtures  # noqa: E402
+from subscription_bench.report import build_report, compare, print_report  # noqa: E402
+from subscription_bench.server import SubscriptionServer  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='subscription_bench',
+                                     description='Benchmark the normalsub subscription endpoints offline.')
+    parser.add_argument('--users', type=int, default=5000, help='Synthetic users (default: 5000).')
+    parser.add_argument('--nodes', type=int, default=3, help='External nodes in nodes.json (default: 3).')
+    parser.add_argument('--extra', type=int, default=2, help='Extra URIs in extra.json (default: 2).')
+    parser.add_argument('--blocked-ratio', type=float, default=0.02, help='Share of blocked users (default: 0.02).')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent keep-alive clients (default: 64).')
+    parser.add_argument('--duration', type=float, default=15, help='Measured seconds (default: 15).')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before that (default: 3).')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Weights per response type (default: normal=60,singbox=30,html=10).')
+    parser.add_argument('--revalidate', type=float, default=0.0,
+                        help='Chance that a client sends the ETag it last saw for that user (default: 0).')
+    parser.add_argument('--workers', type=int, default=1, help='normalsub worker processes (default: 1).')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for fixtures and the request sequence.')
+    parser.add_argument('--output', type=Path, help='Write the JSON report to this file.')
+    parser.add_argument('--json', action='store_true', help='Print the JSON report instead of a table.')
+    parser.add_argument('--baseline', type=Path, help='Earlier JSON report to compare against.')
+    parser.add_argument('--max-regression', type=float, default=10.0,
+                        help='With --baseline, fail if req/s drops or p99 rises by more than this percent.')
+    args = parser.parse_args()
+
+    params = {key: getattr(args, key) for key in ('users', 'nodes', 'extra', 'blocked_ratio', 'concurrency',
+                                                  'duration', 'warmup', 'mix', 'revalidate', 'workers', 'seed')}
+    with tempfile.TemporaryDirectory(prefix='subscription_bench_') as workdir:
+        fixtures = write_fixtures(Path(workdir), args.users, args.nodes, args.extra, args.blocked_ratio, args.seed)
+        with SubscriptionServer(fixtures.env, fixtures.workdir, args.workers,
+                                startup_timeout=60 + args.users / 2000) as server:
+            result = asyncio.run(run_load(server.base_url, fixtures.tokens + fixtures.blocked_tokens,
+                                          args.concurrency, args.duration, args.warmup, args.mix,
+                                          args.revalidate, args.seed))
+
+    report = build_report(result, params)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if not compare(baseline, report, args.max_regression, out=sys.stderr if args.json else sys.stdout):
+            return 1
+    failed = report['overall']['errors'] + sum(n for status, n in report['overall']['statuses'].items()
+                                               if status not in ('200', '304'))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
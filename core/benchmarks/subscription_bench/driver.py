@@ -0,0 +1,126 @@
+'''
+Closed-loop HTTP driver for the subscription endpoints.
+
+Each of --concurrency clients keeps one keep-alive connection and, for the
+whole run, requests random users' subscriptions with a User-Agent picked
+from the configured mix of response types. Requests carry the subscriber's
+own address in X-Forwarded-For, as they would arrive through Caddy, so the
+per-address rate limit sees one address per user.
+'''
+
+import time
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import aiohttp
+
+# Strings sent by common clients, grouped by the response normalsub gives them.
+USER_AGENTS = {
+    'normal': [
+        'v2rayNG/1.8.19',
+        'v2rayN/6.42',
+        'ClashMeta/1.18.0',
+        'clash-verge/v1.6.2',
+        'Streisand/1.6.2 CFNetwork/1474 Darwin/23.0.0',
+        'Shadowrocket/2070 CFNetwork/1474 Darwin/23.0.0',
+        'NekoBox/Android/1.3.1 (Prefer ClashMeta Format)',
+        'HiddifyNext/1.5.2 (android) like ClashMeta v2ray sing-box',
+    ],
+    'singbox': [
+        'SFA/1.8.0 (262; sing-box 1.8.0)',
+        'SFI/1.8.0 (sing-box 1.8.0; iOS 17.1)',
+        'sing-box 1.8.5',
+    ],
+    'html': [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+        'Version/17.1 Mobile/15E148 Safari/604.1',
+        'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    ],
+}
+DEFAULT_MIX = {'normal': 60, 'singbox': 30, 'html': 10}
+
+
+@dataclass
+class Samples:
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    body_bytes: int = 0
+    errors: int = 0
+
+
+@dataclass
+class RunResult:
+    elapsed: float
+    by_kind: Dict[str, Samples]
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    '''Parses "normal=60,singbox=30,html=10" into weights.'''
+    mix = {}
+    for item in value.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in USER_AGENTS:
+            raise ValueError(f"Unknown response type '{kind}'. Use {', '.join(USER_AGENTS)}.")
+        mix[kind] = int(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError('The mix needs at least one positive weight.')
+    return mix
+
+
+def _client_address(index: int) -> str:
+    return f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+
+
+async def run_load(base_url: str, tokens: List[str], concurrency: int, duration: float, warmup: float,
+                   mix: Dict[str, int], revalidate: float, seed: int = 1) -> RunResult:
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+    by_kind = {kind: Samples() for kind in kinds}
+    etags: Dict[Tuple[int, str], str] = {}
+    window = {'recording': False, 'stop': False}
+
+    async def client(seed_offset: int):
+        rng = random.Random(seed * 100003 + seed_offset)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=1)) as session:
+            while not window['stop']:
+                kind = rng.choices(kinds, weights)[0]
+                user_agent = rng.choice(USER_AGENTS[kind])
+                index = rng.randrange(len(tokens))
+                headers = {'User-Agent': user_agent, 'X-Forwarded-For': _client_address(index)}
+                etag = etags.get((index, user_agent))
+                if etag and rng.random() < revalidate:
+                    headers['If-None-Match'] = etag
+
+                recording = window['recording']
+                samples = by_kind[kind]
+                started = time.perf_counter()
+                try:
+                    async with session.get(f'{base_url}/sub/normal/{tokens[index]}', headers=headers) as response:
+                        body = await response.read()
+                        status = response.status
+                        if response.headers.get('ETag'):
+                            etags[(index, user_agent)] = response.headers['ETag']
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if recording:
+                        samples.errors += 1
+                    continue
+                if recording and not window['stop']:
+                    samples.latencies_ms.append((time.perf_counter() - started) * 1000)
+                    samples.statuses[status] = samples.statuses.get(status, 0) + 1
+                    samples.body_bytes += len(body)
+
+    tasks = [asyncio.create_task(client(i)) for i in range(concurrency)]
+    await asyncio.sleep(warmup)
+    window['recording'] = True
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    window['stop'] = True
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*tasks)
+    return RunResult(elapsed=elapsed, by_kind=by_kind)
@@ -0,0 +1,96 @@
+'''
+Synthetic server files for the subscription benchmark.
+
+write_fixtures() lays out the files normalsub reads in a directory and
+returns the environment overrides (paths.py and storage) that point the
+server at them. Generation is seeded, so the same arguments always
+produce the same users, nodes and settings.
+'''
+
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+GIB = 1024 ** 3
+
+
+@dataclass
+class Fixtures:
+    workdir: Path
+    env: Dict[str, str]
+    tokens: List[str]
+    blocked_tokens: List[str]
+
+
+def _user(rng: random.Random, today: date, blocked: bool) -> dict:
+    quota_gb = rng.choice([0, 10, 30, 50, 100, 200])
+    return {
+        'password': uuid.UUID(int=rng.getrandbits(128)).hex,
+        'max_download_bytes': quota_gb * GIB,
+        'expiration_days': rng.choice([0, 30, 30, 90, 365]),
+        'account_creation_date': (today - timedelta(days=rng.randrange(30))).isoformat(),
+        'blocked': blocked,
+        'unlimited_user': quota_gb == 0,
+        'upload_bytes': rng.randrange(2 * GIB),
+        'download_bytes': rng.randrange(max(1, quota_gb) * GIB // 2),
+    }
+
+
+def _server_config(rng: random.Random) -> dict:
+    fingerprint = ':'.join(f'{rng.getrandbits(8):02X}' for _ in range(32))
+    return {
+        'listen': ':443',
+        'tls': {'cert': '/etc/hysteria/ca.crt', 'key': '/etc/hysteria/ca.key',
+                'pinSHA256': fingerprint, 'insecure': True},
+        'obfs': {'type': 'salamander', 'salamander': {'password': uuid.UUID(int=rng.getrandbits(128)).hex}},
+        'auth': {'type': 'http', 'http': {'url': 'http://127.0.0.1:28262/auth'}},
+        'trafficStats': {'listen': '127.0.0.1:25413', 'secret': uuid.UUID(int=rng.getrandbits(128)).hex},
+    }
+
+
+def write_fixtures(workdir: Path, users: int, nodes: int, extra: int,
+                   blocked_ratio: float = 0.02, seed: int = 1) -> Fixtures:
+    '''Writes users.json, nodes.json, extra.json, config.json and .configs.env into workdir.'''
+    rng = random.Random(seed)
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    today = date.today()
+
+    user_map = {f'user{i:06d}': _user(rng, today, rng.random() < blocked_ratio) for i in range(users)}
+    node_list = [{'name': f'node{i}', 'ip': f'198.51.100.{i + 1}' if i % 2 == 0 else f'node{i}.example.net'}
+                 for i in range(nodes)]
+    extra_list = [{'name': f'extra{i}',
+                   'uri': f'vless://{uuid.UUID(int=rng.getrandbits(128))}@203.0.113.{i + 1}:443'
+                          f'?security=tls&type=ws&path=%2Fws#extra{i}'}
+                  for i in range(extra)]
+
+    files = {
+        'users.json': json.dumps(user_map, indent=4),
+        'nodes.json': json.dumps(node_list, indent=4),
+        'extra.json': json.dumps(extra_list, indent=4),
+        'config.json': json.dumps(_server_config(rng), indent=2),
+        '.configs.env': 'IP4=203.0.113.10\nIP6=2001:db8::10\nSNI=bench.example.com\n',
+    }
+    for name, content in files.items():
+        (workdir / name).write_text(content)
+
+    # users.db does not exist yet, so the server imports users.json on its first start.
+    env = {
+        'HYSTERIA_USERS_JSON_PATH': str(workdir / 'users.json'),
+        'HYSTERIA_USERS_DB_PATH': str(workdir / 'users.db'),
+        'HYSTERIA_CONFIG_PATH': str(workdir / 'config.json'),
+        'HYSTERIA_CONFIG_ENV_PATH': str(workdir / '.configs.env'),
+        'HYSTERIA_NODES_JSON_PATH': str(workdir / 'nodes.json'),
+        'HYSTERIA_EXTRA_CONFIG_PATH': str(workdir / 'extra.json'),
+        'HYSTERIA_TRAFFIC_HISTORY': 'false',
+    }
+    return Fixtures(
+        workdir=workdir,
+        env=env,
+        tokens=[user['password'] for user in user_map.values() if not user['blocked']],
+        blocked_tokens=[user['password'] for user in user_map.values() if user['blocked']],
+    )
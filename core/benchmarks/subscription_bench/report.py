@@ -0,0 +1,111 @@
+'''
+Summaries and release-to-release comparison of benchmark reports.
+'''
+
+import os
+import sys
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench_common import percentile
+
+from . import REPORT_SCHEMA
+from .driver import RunResult, Samples
+
+REPO_DIR = Path(__file__).resolve().parents[3]
+
+
+def summarize(samples: Samples, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(samples.latencies_ms)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'requests_per_sec': round(count / elapsed, 1) if elapsed else 0.0,
+        'bytes_per_sec': round(samples.body_bytes / elapsed) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / count, 2) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if count else 0.0,
+        'statuses': {str(status): n for status, n in sorted(samples.statuses.items())},
+        'errors': samples.errors,
+    }
+
+
+def _revision() -> Dict[str, str]:
+    revision = {}
+    version_file = REPO_DIR / 'VERSION'
+    if version_file.exists():
+        revision['version'] = version_file.read_text().strip()
+    try:
+        revision['commit'] = subprocess.run(['git', '-C', str(REPO_DIR), 'rev-parse', '--short', 'HEAD'],
+                                            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return revision
+
+
+def build_report(result: RunResult, params: Dict[str, Any]) -> Dict[str, Any]:
+    overall = Samples()
+    for samples in result.by_kind.values():
+        overall.latencies_ms.extend(samples.latencies_ms)
+        overall.body_bytes += samples.body_bytes
+        overall.errors += samples.errors
+        for status, count in samples.statuses.items():
+            overall.statuses[status] = overall.statuses.get(status, 0) + count
+    return {
+        'schema': REPORT_SCHEMA,
+        'benchmark': 'subscription',
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': _revision(),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count()},
+        'params': params,
+        'elapsed_sec': round(result.elapsed, 3),
+        'overall': summarize(overall, result.elapsed),
+        'by_kind': {kind: summarize(samples, result.elapsed) for kind, samples in result.by_kind.items()},
+    }
+
+
+def print_report(report: Dict[str, Any], out=sys.stdout) -> None:
+    params = report['params']
+    revision = ' '.join(f'{key} {value}' for key, value in report['revision'].items())
+    print(f"{params['users']} users, {params['nodes']} nodes, {params['extra']} extra URIs; "
+          f"{params['concurrency']} clients for {params['duration']}s, {params['workers']} worker(s) [{revision}]",
+          file=out)
+    print(f"{'type':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses",
+          file=out)
+    rows = [*report['by_kind'].items(), ('overall', report['overall'])]
+    for kind, stats in rows:
+        print(f"{kind:<10}{stats['requests_per_sec']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}  {stats['statuses']}"
+              + (f" errors={stats['errors']}" if stats['errors'] else ''), file=out)
+
+
+def _label(report: Dict[str, Any]) -> str:
+    return f"{report['revision'].get('version', '?')}@{report['revision'].get('commit', '?')}"
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], max_regression_pct: float, out=sys.stdout) -> bool:
+    '''
+    Prints throughput and p99 changes per response type. Returns False if
+    any of them regressed by more than max_regression_pct.
+    '''
+    ok = True
+    print(f"\nbaseline {_label(baseline)} -> current {_label(current)}", file=out)
+    for kind in [*current['by_kind'], 'overall']:
+        old = baseline['overall'] if kind == 'overall' else baseline['by_kind'].get(kind)
+        new = current['overall'] if kind == 'overall' else current['by_kind'][kind]
+        if not old or not old['requests_per_sec'] or not old['p99_ms']:
+            continue
+        rps_change = (new['requests_per_sec'] - old['requests_per_sec']) / old['requests_per_sec'] * 100
+        p99_change = (new['p99_ms'] - old['p99_ms']) / old['p99_ms'] * 100
+        regressed = rps_change < -max_regression_pct or p99_change > max_regression_pct
+        ok = ok and not regressed
+        print(f"{kind:<10}req/s {old['requests_per_sec']:>9} -> {new['requests_per_sec']:<9} ({rps_change:+.1f}%)  "
+              f"p99 {old['p99_ms']:>8} -> {new['p99_ms']:<8} ({p99_change:+.1f}%)"
+              + ('  REGRESSION' if regressed else ''), file=out)
+    return ok
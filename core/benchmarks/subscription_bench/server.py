@@ -0,0 +1,78 @@
+'''
+Runs normalsub's HysteriaServer as a child process against the fixtures.
+'''
+
+import os
+import sys
+import time
+import asyncio
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+
+from bench_common import free_port
+
+NORMALSUB = Path(__file__).resolve().parents[2] / 'scripts' / 'normalsub' / 'normalsub.py'
+SUBPATH = 'bench'
+
+
+class SubscriptionServer:
+    '''Context manager that starts normalsub on a free local port and stops it on exit.'''
+
+    def __init__(self, env: Dict[str, str], workdir: Path, workers: int = 1, startup_timeout: float = 60):
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}/{SUBPATH}'
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self.log_path = Path(workdir) / 'normalsub.log'
+        self.env = dict(os.environ, **env,
+                        SUBPATH=SUBPATH,
+                        HYSTERIA_DOMAIN='bench.example.com',
+                        AIOHTTP_LISTEN_ADDRESS='127.0.0.1',
+                        AIOHTTP_LISTEN_PORT=str(self.port),
+                        NORMALSUB_TOKEN_RATE_LIMIT='0')
+        self.workdir = Path(workdir)
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> 'SubscriptionServer':
+        log = open(self.log_path, 'wb')
+        self.process = subprocess.Popen([sys.executable, str(NORMALSUB), '--workers', str(self.workers)],
+                                        env=self.env, cwd=self.workdir, stdout=log, stderr=subprocess.STDOUT)
+        log.close()
+        try:
+            asyncio.run(self._wait_until_up())
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def log_tail(self, lines: int = 20) -> str:
+        try:
+            return '\n'.join(self.log_path.read_text(errors='replace').splitlines()[-lines:])
+        except OSError:
+            return ''
+
+    async def _wait_until_up(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f'normalsub exited with status {self.process.returncode}:\n{self.log_tail()}')
+                try:
+                    async with session.get(f'{self.base_url}/robots.txt') as response:
+                        await response.read()
+                        return
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.1)
+        raise RuntimeError(f'normalsub did not come up within {self.startup_timeout}s:\n{self.log_tail()}')
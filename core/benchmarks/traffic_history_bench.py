@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+'''
+Query benchmark for the per-user traffic history database.
+
+Seeds a throw-away history with one tick per hour for every user over the
+requested number of days (each user active in about half of the hours),
+then times the queries behind `cli.py traffic-history` and
+/api/v1/traffic/*, printing p50/p99 latency per query.
+
+    python3 core/benchmarks/traffic_history_bench.py --users 10000 --days 30
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CORE_DIR / 'scripts'))
+
+from storage.history import TrafficHistory, HOUR, DAY  # noqa: E402
+from bench_common import percentile  # noqa: E402
+
+
+def seed(history: TrafficHistory, users: int, days: int, now: int) -> float:
+    rng = random.Random(1)
+    usernames = [f'user{i}' for i in range(users)]
+    started = time.perf_counter()
+    for tick in range(days * 24, 0, -1):
+        timestamp = now - tick * HOUR
+        history.record({
+            username: (rng.randint(1, 50) * 1024 ** 2, rng.randint(1, 500) * 1024 ** 2)
+            for username in usernames if rng.random() < 0.5
+        }, timestamp)
+    return time.perf_counter() - started
+
+
+def queries(now: int, users: int) -> list[tuple[str, callable]]:
+    sample = [f'user{i}' for i in range(0, users, max(1, users // 10))][:10]
+    return [
+        ('top 20, last hour', lambda h: h.top(now - HOUR, now, 20, now=now)),
+        ('top 20, last 24h', lambda h: h.top(now - DAY, now, 20, now=now)),
+        ('top 20, last 7d', lambda h: h.top(now - 7 * DAY, now, 20, now=now)),
+        ('top 20, last 30d', lambda h: h.top(now - 30 * DAY, now, 20, now=now)),
+        ('all users, last 30d', lambda h: h.top(now - 30 * DAY, now, None, now=now)),
+        ('total series, last 30d', lambda h: h.series(now - 30 * DAY, now, now=now)),
+        ('1 user series, last 30d', lambda h: h.series(now - 30 * DAY, now, sample[:1], now=now)),
+        ('10 user series, last 7d', lambda h: h.series(now - 7 * DAY, now, sample, now=now)),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Time traffic history range queries.')
+    parser.add_argument('--users', type=int, default=10000, help='Users with traffic (default: 10000).')
+    parser.add_argument('--days', type=int, default=30, help='Days of hourly ticks to seed (default: 30).')
+    parser.add_argument('--iterations', type=int, default=20, help='Runs of every query (default: 20).')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    now = int(time.time())
+    with tempfile.TemporaryDirectory(prefix='traffic_history_bench_') as workdir:
+        history = TrafficHistory(Path(workdir) / 'traffic_history.db', max_bytes=0)
+        seed_seconds = seed(history, args.users, args.days, now)
+        size = os.path.getsize(history.path)
+
+        results = {}
+        for name, query in queries(now, args.users):
+            samples = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                query(history)
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'p50_ms': round(percentile(samples, 50), 3),
+                'p99_ms': round(percentile(samples, 99), 3),
+            }
+        history.close()
+
+    if args.json:
+        print(json.dumps({'users': args.users, 'days': args.days, 'seed_seconds': round(seed_seconds, 1),
+                          'db_bytes': size, 'results': results}, indent=2))
+        return 0
+
+    print(f'{args.users} users, {args.days} days of hourly ticks '
+          f'(seeded in {seed_seconds:.1f}s, {size / 1024 ** 2:.1f} MiB)')
+    print(f"{'query':<26}{'p50':>14}{'p99':>14}")
+    print('-' * 54)
+    for name, stats in results.items():
+        print(f"{name:<26}{stats['p50_ms']:>11.2f} ms{stats['p99_ms']:>11.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -114,6 +114,29 @@ def list_users():
         click.echo(f'{e}', err=True)
 
 
+@cli.command('export-users')
+@click.option('--format', '-f', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', help='Output format (default: ndjson)')
+@click.option('--fields', '-F', help='Comma-separated fields to include, e.g. username,upload_bytes,download_bytes (default: all)')
+@click.option('--since', '-s', help='Only users modified since then: epoch seconds, ISO 8601 or a duration ago such as 24h')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), help='Write to this file instead of stdout')
+def export_users(fmt: str, fields: str, since: str, output: str):
+    """
+    Streams all users as NDJSON or CSV without loading them into memory at once.
+    """
+    try:
+        chunks = cli_api.export_users(fmt, fields, since)
+        if output:
+            with open(output, 'w', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            stdout = click.get_text_stream('stdout')
+            for chunk in chunks:
+                stdout.write(chunk)
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('get-user')
 @click.option('--username', '-u', required=True, help='Username for the user to get', type=str)
 def get_user(username: str):
@@ -165,7 +188,7 @@ def bulk_user_add(traffic_gb: float, expiration_days: int, count: int, prefix: s
 def edit_user(username: str, new_username: str, new_traffic_limit: int, new_expiration_days: int, renew_password: bool, renew_creation_date: bool, blocked: bool | None, unlimited_ip: bool | None):
     try:
         cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
+        cli_api.flush_user_traffic([username])
         cli_api.edit_user(username, new_username, new_traffic_limit, new_expiration_days,
                           renew_password, renew_creation_date, blocked, unlimited_ip)
         click.echo(f"User '{username}' updated successfully.")
@@ -188,12 +211,44 @@ def reset_user(username: str):
 def remove_user(username: str):
     try:
         cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
+        cli_api.flush_user_traffic([username])
         cli_api.remove_user(username)
         click.echo(f"User '{username}' removed successfully.")
     except Exception as e:
         click.echo(f'{e}', err=True)
 
+@cli.command('bulk-edit')
+@click.option('--action', '-a', type=click.Choice(['delete', 'block', 'unblock', 'extend', 'reset']), help='Action to apply to every given user')
+@click.option('--usernames', '-u', help='Comma-separated usernames for --action')
+@click.option('--days', '-d', type=int, help='Days to add to the expiration (extend only)')
+@click.option('--file', '-f', 'operations_file', type=click.File('r'),
+              help='JSON list of {"action", "usernames", "days"} operations to apply together ("-" for stdin)')
+@click.option('--json', 'as_json', is_flag=True, help='Print the per-user results as JSON')
+def bulk_edit(action: str, usernames: str, days: int, operations_file, as_json: bool):
+    """
+    Deletes, blocks, unblocks, extends or resets many users in one transaction.
+    """
+    try:
+        if operations_file:
+            operations = json.load(operations_file)
+        elif action and usernames:
+            operations = [{'action': action, 'usernames': usernames, 'days': days}]
+        else:
+            raise click.UsageError('Give either --action and --usernames, or --file.')
+        results = cli_api.bulk_edit_users(operations)
+        if as_json:
+            pretty_print(results)
+            return
+        for result in results:
+            click.echo(f"{result['action']} {result['username']}: {result['detail']}", err=not result['success'])
+        succeeded = sum(1 for result in results if result['success'])
+        click.echo(f'{succeeded} of {len(results)} changes applied.')
+    except click.UsageError:
+        raise
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('kick-user')
 @click.option('--username', '-u', required=True, help='Username of the user to kick')
 def kick_user(username: str):
@@ -237,6 +292,19 @@ def show_user_uri_json(usernames: list[str]):
     except Exception as e:
         click.echo(f'{e}', err=True)
 
+
+@cli.command('migrate-user-store')
+@click.option('--force', '-f', is_flag=True, help='Replace users already in the store with the contents of users.json')
+def migrate_user_store(force: bool):
+    """
+    Imports users.json into the SQLite user store.
+    """
+    try:
+        count = cli_api.migrate_user_store(force)
+        click.echo(f'{count} users imported into the user store.')
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
 # endregion
 
 # region Server
@@ -251,6 +319,37 @@ def traffic_status(no_gui):
         click.echo(f'{e}', err=True)
 
 
+@cli.command('compact-traffic')
+def compact_traffic():
+    """
+    Folds the pending traffic journal into the user store.
+    """
+    try:
+        count = cli_api.compact_traffic()
+        click.echo(f'{count} traffic ticks compacted.')
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
+@cli.command('traffic-history')
+@click.option('--username', '-u', 'usernames', multiple=True, help='User to show (repeatable); omit for the total of all users')
+@click.option('--start', '-s', help='Range start: epoch seconds, ISO 8601 or a duration ago such as 24h (default: 24h)')
+@click.option('--end', '-e', help='Range end, same formats as --start (default: now)')
+@click.option('--resolution', '-r', type=click.Choice(['minute', 'hour', 'day']), help='Bucket size (default: automatic)')
+@click.option('--top', '-t', type=int, help='Instead of a time series, list the N users with the most traffic')
+def traffic_history(usernames: tuple[str, ...], start: str, end: str, resolution: str, top: int):
+    """
+    Shows per-user traffic over time from the traffic history database.
+    """
+    try:
+        if top is not None:
+            pretty_print(cli_api.traffic_top(start, end, top, list(usernames)))
+        else:
+            pretty_print(cli_api.traffic_history(list(usernames), start, end, resolution))
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('server-info')
 def server_info():
     try:
@@ -1,16 +1,31 @@
 import os
+import sys
+import secrets
+import string
 import subprocess
+import importlib.util
 from enum import Enum
+from functools import cache, wraps
+from types import ModuleType
 from datetime import datetime
 import json
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 from dotenv import dotenv_values
 
 import traffic
+from storage import get_store, get_history, StoreError, UserNotFoundError, migrate_from_json, UserIndex, ListFilters
+from storage import export_users as stream_user_export, EXPORT_CONTENT_TYPES
+from server_status import ServerStatusSampler, hysteria_online_counter
+import services_status
 
 DEBUG = False
+# User operations import the hysteria2 scripts and call them in this process.
+# Set HYSTERIA_CLI_API_SUBPROCESS=true to run every script in its own interpreter instead.
+SUBPROCESS_MODE = os.getenv('HYSTERIA_CLI_API_SUBPROCESS', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
 SCRIPT_DIR = '/etc/hysteria/core/scripts'
+LOCAL_SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
 CONFIG_FILE = '/etc/hysteria/config.json'
+USERS_FILE = '/etc/hysteria/users.json'
 CONFIG_ENV_FILE = '/etc/hysteria/.configs.env'
 WEBPANEL_ENV_FILE = '/etc/hysteria/core/scripts/webpanel/.env'
 NORMALSUB_ENV_FILE = '/etc/hysteria/core/scripts/normalsub/.env'
@@ -28,7 +43,8 @@ class Command(Enum):
     GET_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'get_user.py')
     ADD_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'add_user.py')
     BULK_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'bulk_users.py')
-    EDIT_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'edit_user.sh')
+    BULK_EDIT = os.path.join(SCRIPT_DIR, 'hysteria2', 'bulk_edit.py')
+    EDIT_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'edit_user.py')
     RESET_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'reset_user.py')
     REMOVE_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'remove_user.py')
     SHOW_USER_URI = os.path.join(SCRIPT_DIR, 'hysteria2', 'show_user_uri.py')
@@ -40,7 +56,7 @@ class Command(Enum):
     EXTRA_CONFIG_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'extra_config.py')
     TRAFFIC_STATUS = 'traffic.py'  # won't be called directly (it's a python module)
     UPDATE_GEO = os.path.join(SCRIPT_DIR, 'hysteria2', 'update_geo.py')
-    LIST_USERS = os.path.join(SCRIPT_DIR, 'hysteria2', 'list_users.sh')
+    LIST_USERS = os.path.join(SCRIPT_DIR, 'hysteria2', 'list_users.py')
     SERVER_INFO = os.path.join(SCRIPT_DIR, 'hysteria2', 'server_info.py')
     BACKUP_HYSTERIA2 = os.path.join(SCRIPT_DIR, 'hysteria2', 'backup.py')
     RESTORE_HYSTERIA2 = os.path.join(SCRIPT_DIR, 'hysteria2', 'restore.py')
@@ -53,7 +69,6 @@ class Command(Enum):
     UNINSTALL_WARP = os.path.join(SCRIPT_DIR, 'warp', 'uninstall.py')
     CONFIGURE_WARP = os.path.join(SCRIPT_DIR, 'warp', 'configure.py')
     STATUS_WARP = os.path.join(SCRIPT_DIR, 'warp', 'status.py')
-    SERVICES_STATUS = os.path.join(SCRIPT_DIR, 'services_status.sh')
     VERSION = os.path.join(SCRIPT_DIR, 'hysteria2', 'version.py')
     LIMIT_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'limit.sh')
     KICK_USER_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'kickuser.py')
@@ -117,18 +132,68 @@ def run_cmd(command: list[str]) -> str:
         raise CommandExecutionError(f"OS error while trying to run command '{' '.join(command)}': {e}")
 
 
+def changes_services(func):
+    '''
+    Marks a function that starts, stops or (un)installs services: the cached service states are dropped
+    once it returns or fails, so the next get_services_status() sees the change.
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            services_status.invalidate()
+    return wrapper
+
+
 def generate_password() -> str:
     '''
-    Generates a random password using pwgen for user.
-    Could raise subprocess.CalledProcessError
+    Generates a random 32-character alphanumeric password for user (the alphabet of `pwgen -s`).
     '''
+    alphabet = string.ascii_letters + string.digits
     try:
-        return subprocess.check_output(['pwgen', '-s', '32', '1'], shell=False).decode().strip()
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        try:
-            return subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], shell=False).decode().strip()
-        except Exception as e:
-            raise PasswordGenerationError(f"Failed to generate password: {e}")
+        return ''.join(secrets.choice(alphabet) for _ in range(32))
+    except Exception as e:
+        raise PasswordGenerationError(f"Failed to generate password: {e}")
+
+
+@cache
+def load_script(command: Command) -> ModuleType:
+    '''
+    Imports a script from core/scripts as a module so its functions can be called in-process.
+    Raises ScriptNotFoundError if the script does not exist.
+    '''
+    path = os.path.join(LOCAL_SCRIPT_DIR, os.path.relpath(command.value, SCRIPT_DIR))
+    if not os.path.isfile(path):
+        raise ScriptNotFoundError(f"Script not found: {path}")
+
+    # The scripts resolve their shared imports through init_paths in their own directory.
+    script_dir = os.path.dirname(path)
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+
+    name = f'_cli_api_{command.name.lower()}'
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def call_script(command: Command, function: str, *args, **kwargs) -> Any:
+    '''
+    Calls a function of a script in-process, mapping its errors to the exceptions run_cmd raises.
+    '''
+    try:
+        return getattr(load_script(command), function)(*args, **kwargs)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except (StoreError, RuntimeError) as e:
+        raise CommandExecutionError(str(e))
 
 # endregion
 
@@ -137,6 +202,7 @@ def generate_password() -> str:
 # region Hysteria
 
 
+@changes_services
 def install_hysteria2(port: int, sni: str):
     '''
     Installs Hysteria2 on the given port and uses the provided or default SNI value.
@@ -144,16 +210,19 @@ def install_hysteria2(port: int, sni: str):
     run_cmd(['bash', Command.INSTALL_HYSTERIA2.value, str(port), sni])
 
 
+@changes_services
 def uninstall_hysteria2():
     '''Uninstalls Hysteria2.'''
     run_cmd(['python3', Command.UNINSTALL_HYSTERIA2.value])
 
 
+@changes_services
 def update_hysteria2():
     '''Updates Hysteria2.'''
     run_cmd(['python3', Command.UPDATE_HYSTERIA2.value])
 
 
+@changes_services
 def restart_hysteria2():
     '''Restarts Hysteria2.'''
     run_cmd(['python3', Command.RESTART_HYSTERIA2.value])
@@ -203,6 +272,7 @@ def backup_hysteria2():
         raise
 
 
+@changes_services
 def restore_hysteria2(backup_file_path: str):
     '''Restores Hysteria configuration from the given backup file.'''
     try:
@@ -256,22 +326,127 @@ def list_users() -> dict[str, dict[str, Any]] | None:
     '''
     Lists all users.
     '''
-    if res := run_cmd(['bash', Command.LIST_USERS.value]):
-        return json.loads(res)
+    if SUBPROCESS_MODE:
+        if res := run_cmd(['python3', Command.LIST_USERS.value]):
+            return json.loads(res)
+        return None
+    try:
+        return get_store().all()
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+
 
+@cache
+def _user_index() -> UserIndex:
+    return UserIndex(get_store())
 
-def get_user(username: str) -> dict[str, Any] | None:
+
+def list_users_page(offset: int = 0, limit: int = 50, cursor: str | None = None, sort: str = 'name',
+                    descending: bool = False, status: str | None = None, blocked: bool | None = None,
+                    expired: bool | None = None, near_quota: bool | None = None,
+                    prefix: str | None = None) -> dict[str, Any]:
+    '''
+    Lists one page of users, filtered and sorted on the server.
+    Pass the returned next_cursor back as cursor to get the following page; it is None on the last one.
+    '''
+    filters = ListFilters(status=status, blocked=blocked, expired=expired, near_quota=near_quota,
+                          prefix=prefix or None)
+    try:
+        if SUBPROCESS_MODE:
+            index = UserIndex.from_users(list_users() or {})
+        else:
+            index = _user_index()
+        page = index.query(filters, sort, descending, offset, limit, cursor)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+    return {
+        'total': page.total,
+        'offset': page.offset,
+        'limit': page.limit,
+        'next_cursor': page.next_cursor,
+        'items': [{'username': username, **user} for username, user in page.items],
+    }
+
+
+def export_users(fmt: str = 'ndjson', fields: list[str] | str | None = None,
+                 since: str | int | float | None = None) -> Iterator[str]:
+    '''
+    Streams every user (or those modified since `since`) as NDJSON or CSV text chunks.
+    `fields` projects the output onto the given columns; `since` takes the same formats as traffic_history.
+    Reads the store directly in both modes so that memory use does not grow with the number of users.
+    '''
+    since_ts = _parse_time_point(since, datetime.now().timestamp(), 0) if since not in (None, '') else None
+    try:
+        chunks = stream_user_export(get_store(), fmt, fields, since_ts)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+
+    def stream() -> Iterator[str]:
+        try:
+            yield from chunks
+        except StoreError as e:
+            raise CommandExecutionError(str(e))
+    return stream()
+
+
+def get_user(username: str) -> dict[str, Any]:
     '''
     Retrieves information about a specific user.
+    Raises UserNotFoundError for an unknown user, in both modes.
     '''
-    if res := run_cmd(['python3', Command.GET_USER.value, '-u', str(username)]):
-        return json.loads(res)
+    not_found = f"User '{username}' not found."
+    if SUBPROCESS_MODE:
+        try:
+            return json.loads(run_cmd(['python3', Command.GET_USER.value, '-u', str(username)]))
+        except CommandExecutionError as e:
+            if not_found in str(e):
+                raise UserNotFoundError(not_found)
+            raise
+    try:
+        user = get_store().get(username)
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+    if user is None:
+        raise UserNotFoundError(not_found)
+    return user
+
+
+def get_user_by_token(token: str) -> dict[str, Any] | None:
+    '''
+    Retrieves a user (including its username) by subscription token.
+    '''
+    if res := get_store().get_by_token(token):
+        username, user = res
+        return {'username': username, **user}
+
+
+def migrate_user_store(force: bool = False) -> int:
+    '''
+    Imports users.json into the SQLite user store.
+    With force, existing users in the store are replaced by the file contents.
+    '''
+    store = get_store()
+    if store.name != 'sqlite':
+        raise InvalidInputError(f"The active user store backend is '{store.name}', not 'sqlite'.")
+    try:
+        return migrate_from_json(store, USERS_FILE, replace=force)
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
 
 
 def add_user(username: str, traffic_limit: int, expiration_days: int, password: str | None, creation_date: str | None, unlimited: bool):
     '''
     Adds a new user with the given parameters, respecting positional argument requirements.
     '''
+    if not SUBPROCESS_MODE:
+        call_script(Command.ADD_USER, 'create_user', username, traffic_limit, expiration_days,
+                    password or generate_password(), creation_date, unlimited)
+        return
+
     command = ['python3', Command.ADD_USER.value, username, str(traffic_limit), str(expiration_days)]
 
     if unlimited:
@@ -320,6 +495,11 @@ def edit_user(username: str, new_username: str | None, new_traffic_limit: int |
     password = generate_password() if renew_password else ''
     creation_date = datetime.now().strftime('%Y-%m-%d') if renew_creation_date else ''
 
+    if not SUBPROCESS_MODE:
+        call_script(Command.EDIT_USER, 'update_user', username, new_username or None, new_traffic_limit,
+                    new_expiration_days, password or None, creation_date or None, blocked, unlimited_ip)
+        return
+
     blocked_str = ''
     if blocked is True:
         blocked_str = 'true'
@@ -333,7 +513,7 @@ def edit_user(username: str, new_username: str | None, new_traffic_limit: int |
         unlimited_str = 'false'
 
     command_args = [
-        'bash',
+        'python3',
         Command.EDIT_USER.value,
         username,
         new_username or '',
@@ -347,10 +527,38 @@ def edit_user(username: str, new_username: str | None, new_traffic_limit: int |
     run_cmd(command_args)
 
 
+def bulk_edit_users(operations: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    '''
+    Applies delete, block, unblock, extend (by "days") and reset operations to many users at once.
+    Every operation is validated first; then the users' traffic is flushed once, all changes are
+    saved in a single store transaction (and the auth snapshot rewritten), and only then are the
+    deleted and blocked users kicked in one batched call, so they cannot reconnect.
+    Returns one {username, action, success, detail} result per user and operation.
+    '''
+    plan = call_script(Command.BULK_EDIT, 'parse_operations', operations)
+    flush_user_traffic([username for _, usernames, _ in plan for username in usernames])
+    if not SUBPROCESS_MODE:
+        results = call_script(Command.BULK_EDIT, 'apply_operations', plan)
+    else:
+        results = json.loads(run_cmd(['python3', Command.BULK_EDIT.value, json.dumps(operations)]))
+    if to_kick := load_script(Command.BULK_EDIT).users_to_kick(results):
+        try:
+            kick_users_by_name(to_kick)
+        except HysteriaError as e:
+            # The changes are saved; report the failed kick next to them instead of hiding them.
+            for result in results:
+                if result['username'] in to_kick and result['success']:
+                    result['detail'] += f" (kick failed: {e})"
+    return results
+
+
 def reset_user(username: str):
     '''
     Resets a user's configuration.
     '''
+    if not SUBPROCESS_MODE:
+        call_script(Command.RESET_USER, 'reset_user_usage', username)
+        return
     run_cmd(['python3', Command.RESET_USER.value, username])
 
 
@@ -358,12 +566,23 @@ def remove_user(username: str):
     '''
     Removes a user by username.
     '''
+    if not SUBPROCESS_MODE:
+        call_script(Command.REMOVE_USER, 'delete_user', username)
+        return
     run_cmd(['python3', Command.REMOVE_USER.value, username])
 
 def kick_user_by_name(username: str):
     '''Kicks a specific user by username.'''
     if not username:
         raise InvalidInputError('Username must be provided to kick a specific user.')
+    if not SUBPROCESS_MODE:
+        try:
+            call_script(Command.KICK_USER_SCRIPT, 'kick_user', username)
+        except HysteriaError:
+            raise
+        except Exception as e:
+            raise CommandExecutionError(f"Failed to kick user '{username}': {e}")
+        return
     script_path = Command.KICK_USER_SCRIPT.value
     if not os.path.exists(script_path):
         raise ScriptNotFoundError(f"Kick user script not found at: {script_path}")
@@ -372,11 +591,27 @@ def kick_user_by_name(username: str):
     except subprocess.CalledProcessError as e:
         raise CommandExecutionError(f"Failed to execute kick user script: {e}")
 
+def kick_users_by_name(usernames: list[str]):
+    '''Kicks several users with one API client, in batches.'''
+    if not usernames:
+        raise InvalidInputError('At least one username must be provided to kick users.')
+    if not SUBPROCESS_MODE:
+        try:
+            call_script(Command.KICK_USER_SCRIPT, 'kick_users', list(usernames))
+        except HysteriaError:
+            raise
+        except Exception as e:
+            raise CommandExecutionError(f"Failed to kick users: {e}")
+        return
+    run_cmd(['python3', Command.KICK_USER_SCRIPT.value, *usernames])
+
 # TODO: it's better to return json
 def show_user_uri(username: str, qrcode: bool, ipv: int, all: bool, singbox: bool, normalsub: bool) -> str | None:
     '''
     Displays the URI for a user, with options for QR code and other formats.
     '''
+    if not SUBPROCESS_MODE:
+        return call_script(Command.SHOW_USER_URI, 'render_user_uri', username, qrcode, ipv, all, singbox, normalsub).strip()
     command_args = ['python3', Command.SHOW_USER_URI.value, '-u', username]
     if qrcode:
         command_args.append('-qr')
@@ -394,6 +629,13 @@ def show_user_uri_json(usernames: list[str]) -> list[dict[str, Any]] | None:
     '''
     Displays the URI for a list of users in JSON format.
     '''
+    if not SUBPROCESS_MODE:
+        try:
+            return call_script(Command.SHOW_USER_URI, 'user_uri_data', list(usernames))
+        except HysteriaError:
+            raise
+        except Exception as e:
+            raise HysteriaError(f'An unexpected error occurred: {e}')
     script_path = Command.WRAPPER_URI.value
     if not os.path.exists(script_path):
         raise ScriptNotFoundError(f"Wrapper URI script not found at: {script_path}")
@@ -424,6 +666,84 @@ def traffic_status(no_gui=False, display_output=True):
     return data
 
 
+def flush_user_traffic(usernames: list[str]) -> dict[str, tuple[int, int]]:
+    '''
+    Stores the pending traffic of the given users only, leaving everybody else's counters to the collector.
+    Cheaper than traffic_status() before editing or removing a few users. Returns {username: (upload, download)} added.
+    '''
+    try:
+        return traffic.flush_user_traffic(usernames)
+    except (StoreError, RuntimeError, OSError, ValueError) as e:
+        raise CommandExecutionError(f"Failed to flush user traffic: {e}")
+
+
+def compact_traffic() -> int:
+    '''
+    Folds the pending traffic journal into the user store. Returns the number of folded ticks.
+    '''
+    try:
+        return traffic.compact_traffic_journal()
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+
+
+def _parse_time_point(value: str | int | float | None, now: float, default: float) -> float:
+    '''
+    Accepts epoch seconds, an ISO 8601 timestamp or a duration before now
+    such as "90m", "24h" or "30d".
+    '''
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    if value[-1:].lower() in units and value[:-1].isdigit():
+        return now - int(value[:-1]) * units[value[-1].lower()]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise InvalidInputError(f"Invalid time '{value}'. Use epoch seconds, ISO 8601 or a duration like 24h.")
+
+
+def _history_range(start, end) -> tuple[float, float]:
+    now = datetime.now().timestamp()
+    return _parse_time_point(start, now, now - 86400), _parse_time_point(end, now, now)
+
+
+def traffic_history(usernames: list[str] | None = None, start: str | None = None, end: str | None = None,
+                    resolution: str | None = None) -> dict[str, Any]:
+    '''
+    Returns per-bucket upload/download bytes for the given users, or the total of all users
+    when no usernames are given. The range defaults to the last 24 hours.
+    '''
+    range_start, range_end = _history_range(start, end)
+    try:
+        return get_history().series(range_start, range_end, usernames or None, resolution)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+
+
+def traffic_top(start: str | None = None, end: str | None = None, limit: int = 20,
+                usernames: list[str] | None = None) -> dict[str, Any]:
+    '''
+    Returns the users with the most traffic in the range (default: the last 24 hours), highest first.
+    '''
+    range_start, range_end = _history_range(start, end)
+    try:
+        return get_history().top(range_start, range_end, limit, usernames or None)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except StoreError as e:
+        raise CommandExecutionError(str(e))
+
+
 # Next Update:
 # TODO: it's better to return json
 # TODO: After json todo need fix Telegram Bot and WebPanel
@@ -432,6 +752,27 @@ def server_info() -> str | None:
     return run_cmd(['python3', Command.SERVER_INFO.value])
 
 
+@cache
+def status_sampler() -> ServerStatusSampler:
+    '''
+    Returns the process-wide server status sampler, starting it on first use.
+    Its background thread samples /proc only while acquire()d (by the webpanel's live stream);
+    long-running callers should stop() it on exit.
+    '''
+    return ServerStatusSampler(store=get_store(),
+                               online_counter=hysteria_online_counter(CONFIG_FILE, traffic.API_BASE_URL)).start()
+
+
+def server_status() -> dict[str, Any] | None:
+    '''
+    Returns the newest structured server status snapshot:
+    uptime, CPU, memory, network speeds and totals, connections, online users and user traffic.
+    Samples on the spot when nothing has refreshed the sampler within one interval.
+    '''
+    sampler = status_sampler()
+    return sampler.latest(max_age=sampler.interval)
+
+
 def get_ip_address() -> tuple[str | None, str | None]:
     '''
     Retrieves the IP address from the .configs.env file.
@@ -526,11 +867,13 @@ def install_tcp_brutal():
     run_cmd(['python3', Command.INSTALL_TCP_BRUTAL.value])
 
 
+@changes_services
 def install_warp():
     '''Installs WARP.'''
     run_cmd(['python3', Command.INSTALL_WARP.value])
 
 
+@changes_services
 def uninstall_warp():
     '''Uninstalls WARP.'''
     run_cmd(['python3', Command.UNINSTALL_WARP.value])
@@ -567,6 +910,7 @@ def warp_status() -> str | None:
     return run_cmd(['python3', Command.STATUS_WARP.value])
 
 
+@changes_services
 def start_telegram_bot(token: str, adminid: str):
     '''Starts the Telegram bot.'''
     if not token or not adminid:
@@ -574,11 +918,13 @@ def start_telegram_bot(token: str, adminid: str):
     run_cmd(['python3', Command.INSTALL_TELEGRAMBOT.value, 'start', token, adminid])
 
 
+@changes_services
 def stop_telegram_bot():
     '''Stops the Telegram bot.'''
     run_cmd(['python3', Command.INSTALL_TELEGRAMBOT.value, 'stop'])
 
 
+@changes_services
 def start_singbox(domain: str, port: int):
     '''Starts Singbox.'''
     if not domain or not port:
@@ -586,11 +932,13 @@ def start_singbox(domain: str, port: int):
     run_cmd(['bash', Command.SHELL_SINGBOX.value, 'start', domain, str(port)])
 
 
+@changes_services
 def stop_singbox():
     '''Stops Singbox.'''
     run_cmd(['bash', Command.SHELL_SINGBOX.value, 'stop'])
 
 
+@changes_services
 def start_normalsub(domain: str, port: int):
     '''Starts NormalSub.'''
     if not domain or not port:
@@ -618,11 +966,13 @@ def get_normalsub_subpath() -> str | None:
         print(f"Error reading NormalSub .env file: {e}")
         return None
 
+@changes_services
 def stop_normalsub():
     '''Stops NormalSub.'''
     run_cmd(['bash', Command.INSTALL_NORMALSUB.value, 'stop'])
 
 
+@changes_services
 def start_webpanel(domain: str, port: int, admin_username: str, admin_password: str, expiration_minutes: int, debug: bool, decoy_path: str):
     '''Starts WebPanel.'''
     if not domain or not port or not admin_username or not admin_password or not expiration_minutes:
@@ -633,6 +983,7 @@ def start_webpanel(domain: str, port: int, admin_username: str, admin_password:
     )
 
 
+@changes_services
 def stop_webpanel():
     '''Stops WebPanel.'''
     run_cmd(['bash', Command.SHELL_WEBPANEL.value, 'stop'])
@@ -687,9 +1038,10 @@ def reset_webpanel_credentials(new_username: str | None = None, new_password: st
     run_cmd(cmd_args)
 
 def get_services_status() -> dict[str, bool] | None:
-    '''Gets the status of all project services.'''
-    if res := run_cmd(['bash', Command.SERVICES_STATUS.value]):
-        return json.loads(res)
+    '''
+    Gets the status of all project services, from one systemctl call cached for a few seconds.
+    '''
+    return services_status.statuses()
 
 def show_version() -> str | None:
     """Displays the currently installed version of the panel."""
@@ -700,10 +1052,12 @@ def check_version() -> str | None:
     """Checks if the current version is up-to-date and displays changelog if not."""
     return run_cmd(['python3', Command.VERSION.value, 'check-version'])
 
+@changes_services
 def start_ip_limiter():
     '''Starts the IP limiter service.'''
     run_cmd(['bash', Command.LIMIT_SCRIPT.value, 'start'])
 
+@changes_services
 def stop_ip_limiter():
     '''Stops the IP limiter service.'''
     run_cmd(['bash', Command.LIMIT_SCRIPT.value, 'stop'])
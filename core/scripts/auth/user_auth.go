@@ -1,23 +1,35 @@
 package main
 
 import (
+	"bufio"
 	"crypto/subtle"
 	"encoding/json"
 	"io"
 	"log"
 	"net/http"
 	"os"
+	"strconv"
 	"strings"
 	"sync"
 	"time"
 )
 
 const (
-	listenAddr = "127.0.0.1:28262"
-	usersFile  = "/etc/hysteria/users.json"
-	cacheTTL   = 5 * time.Second
+	listenAddr   = "127.0.0.1:28262"
+	usersFile    = "/etc/hysteria/users.json"
+	snapshotFile = "/etc/hysteria/auth.snapshot"
+	cacheTTL     = 5 * time.Second
 )
 
+// Flag bits of the auth snapshot written by storage/auth_snapshot.py.
+const (
+	flagBlocked       = 1
+	flagUnlimited     = 2
+	flagQuotaExceeded = 4
+)
+
+const snapshotMagic = "#hysteria-auth"
+
 type User struct {
 	Password            string `json:"password"`
 	MaxDownloadBytes    int64  `json:"max_download_bytes"`
@@ -29,6 +41,14 @@ type User struct {
 	UnlimitedUser       bool   `json:"unlimited_user"`
 }
 
+// authEntry is the per-user state the handler needs; ExpiresAt is a Unix
+// timestamp, 0 when the account never expires.
+type authEntry struct {
+	Password  string
+	Flags     int
+	ExpiresAt int64
+}
+
 type httpAuthRequest struct {
 	Addr string `json:"addr"`
 	Auth string `json:"auth"`
@@ -41,11 +61,77 @@ type httpAuthResponse struct {
 }
 
 var (
-	userCache  map[string]User
-	cacheMutex = &sync.RWMutex{}
+	userCache       map[string]authEntry
+	snapshotVersion string
+	cacheMutex      = &sync.RWMutex{}
 )
 
-func loadUsersToCache() {
+var unescaper = strings.NewReplacer(`\\`, `\`, `\t`, "\t", `\r`, "\r", `\n`, "\n")
+
+// parseSnapshotHeader returns the version from "#hysteria-auth 1 <version> <count>".
+func parseSnapshotHeader(line string) (string, bool) {
+	fields := strings.Fields(line)
+	if len(fields) != 4 || fields[0] != snapshotMagic || fields[1] != "1" {
+		return "", false
+	}
+	return fields[2], true
+}
+
+// loadSnapshot reads the auth snapshot. It reports false when the file is
+// missing or unusable, and stops after the header when the version is unchanged.
+func loadSnapshot() bool {
+	f, err := os.Open(snapshotFile)
+	if err != nil {
+		return false
+	}
+	defer f.Close()
+
+	scanner := bufio.NewScanner(f)
+	scanner.Buffer(make([]byte, 64*1024), 1024*1024)
+	if !scanner.Scan() {
+		return false
+	}
+	version, ok := parseSnapshotHeader(scanner.Text())
+	if !ok {
+		return false
+	}
+	cacheMutex.RLock()
+	unchanged := version == snapshotVersion
+	cacheMutex.RUnlock()
+	if unchanged {
+		return true
+	}
+
+	users := make(map[string]authEntry)
+	for scanner.Scan() {
+		fields := strings.Split(scanner.Text(), "\t")
+		if len(fields) != 4 {
+			continue
+		}
+		flags, err1 := strconv.Atoi(fields[2])
+		expiresAt, err2 := strconv.ParseInt(fields[3], 10, 64)
+		if err1 != nil || err2 != nil {
+			continue
+		}
+		users[unescaper.Replace(fields[0])] = authEntry{
+			Password:  unescaper.Replace(fields[1]),
+			Flags:     flags,
+			ExpiresAt: expiresAt,
+		}
+	}
+	if scanner.Err() != nil {
+		return false
+	}
+
+	cacheMutex.Lock()
+	userCache = users
+	snapshotVersion = version
+	cacheMutex.Unlock()
+	return true
+}
+
+// loadUsersJSON is the fallback for installs that have not written a snapshot yet.
+func loadUsersJSON() {
 	data, err := os.ReadFile(usersFile)
 	if err != nil {
 		return
@@ -54,11 +140,37 @@ func loadUsersToCache() {
 	if err := json.Unmarshal(data, &users); err != nil {
 		return
 	}
+	entries := make(map[string]authEntry, len(users))
+	for username, user := range users {
+		entry := authEntry{Password: user.Password}
+		if user.Blocked {
+			entry.Flags |= flagBlocked
+		}
+		if user.UnlimitedUser {
+			entry.Flags |= flagUnlimited
+		}
+		if user.MaxDownloadBytes > 0 && (user.DownloadBytes+user.UploadBytes) >= user.MaxDownloadBytes {
+			entry.Flags |= flagQuotaExceeded
+		}
+		if user.ExpirationDays > 0 {
+			if creationDate, err := time.ParseInLocation("2006-01-02", user.AccountCreationDate, time.Local); err == nil {
+				entry.ExpiresAt = creationDate.AddDate(0, 0, user.ExpirationDays).Unix()
+			}
+		}
+		entries[username] = entry
+	}
 	cacheMutex.Lock()
-	userCache = users
+	userCache = entries
+	snapshotVersion = ""
 	cacheMutex.Unlock()
 }
 
+func loadUsersToCache() {
+	if !loadSnapshot() {
+		loadUsersJSON()
+	}
+}
+
 func authHandler(w http.ResponseWriter, r *http.Request) {
 	if r.Method != http.MethodPost {
 		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
@@ -86,7 +198,7 @@ func authHandler(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	if user.Blocked {
+	if user.Flags&flagBlocked != 0 {
 		json.NewEncoder(w).Encode(httpAuthResponse{OK: false})
 		return
 	}
@@ -97,21 +209,18 @@ func authHandler(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	if user.UnlimitedUser {
+	if user.Flags&flagUnlimited != 0 {
 		w.Header().Set("Content-Type", "application/json")
 		json.NewEncoder(w).Encode(httpAuthResponse{OK: true, ID: username})
 		return
 	}
 
-	if user.ExpirationDays > 0 {
-		creationDate, err := time.Parse("2006-01-02", user.AccountCreationDate)
-		if err == nil && time.Now().After(creationDate.AddDate(0, 0, user.ExpirationDays)) {
-			json.NewEncoder(w).Encode(httpAuthResponse{OK: false})
-			return
-		}
+	if user.ExpiresAt > 0 && time.Now().Unix() > user.ExpiresAt {
+		json.NewEncoder(w).Encode(httpAuthResponse{OK: false})
+		return
 	}
 
-	if user.MaxDownloadBytes > 0 && (user.DownloadBytes+user.UploadBytes) >= user.MaxDownloadBytes {
+	if user.Flags&flagQuotaExceeded != 0 {
 		json.NewEncoder(w).Encode(httpAuthResponse{OK: false})
 		return
 	}
@@ -0,0 +1,131 @@
+"""Precompressed response bodies shared by the subscription servers (normalsub and singbox).
+
+Bodies are compressed once per encoding and kept in a byte-bounded LRU
+keyed by a digest of the uncompressed body, so a subscription that did not
+change is served from memory however often clients poll it. Brotli is
+offered when the optional brotli package is installed; gzip always is.
+"""
+
+import gzip
+import hashlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 5
+
+
+def parse_accept_encoding(header):
+    """Returns {coding: q} for an Accept-Encoding header; unparsable q-values count as 0"""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class CompressedBodyCache:
+    """Compresses response bodies on first use and remembers the result per (body digest, encoding).
+
+    ``min_size`` keeps tiny bodies (short plain-text subscriptions) uncompressed;
+    a result that is not smaller than its input is remembered as uncompressible.
+    """
+
+    # Charged per entry on top of its data, so uncompressible entries count too.
+    _ENTRY_OVERHEAD = 64
+
+    def __init__(self, max_bytes, gzip_level=DEFAULT_GZIP_LEVEL, brotli_quality=DEFAULT_BROTLI_QUALITY,
+                 min_size=DEFAULT_MIN_SIZE):
+        self.max_bytes = max_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+        # In order of preference when the client accepts several equally.
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self._entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(body):
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    def negotiate(self, accept_encoding, size):
+        """Returns the encoding to send a body of ``size`` bytes in, or None to send it as is"""
+        if size < self.min_size or not accept_encoding:
+            return None
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, body, encoding):
+        """Compresses without touching the cache; safe to call from worker threads"""
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def lookup(self, key, encoding):
+        """Returns the cached data, b'' if the body does not shrink, or None on a miss"""
+        data = self._entries.get((key, encoding))
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((key, encoding))
+        self.hits += 1
+        return data
+
+    def store(self, key, encoding, body, data):
+        """Remembers ``data`` compressed from ``body``; returns what lookup() will return for it"""
+        if len(data) >= len(body):
+            data = b''
+        size = self._ENTRY_OVERHEAD + len(data)
+        if size > self.max_bytes:
+            return data
+        previous = self._entries.pop((key, encoding), None)
+        if previous is not None:
+            self.current_bytes -= self._ENTRY_OVERHEAD + len(previous)
+        self._entries[(key, encoding)] = data
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= self._ENTRY_OVERHEAD + len(evicted)
+        return data
+
+    def encode(self, body, accept_encoding):
+        """Returns (data, encoding) for the body, compressing inline on a miss; encoding is None if sent as is"""
+        encoding = self.negotiate(accept_encoding, len(body))
+        if encoding is None:
+            return body, None
+        key = self.key(body)
+        data = self.lookup(key, encoding)
+        if data is None:
+            data = self.store(key, encoding, body, self.compress(body, encoding))
+        return (data, encoding) if data else (body, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.current_bytes, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'encodings': list(self.encodings)}
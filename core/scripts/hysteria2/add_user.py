@@ -1,113 +1,116 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
 import subprocess
 import re
+import uuid
 from datetime import datetime
 from init_paths import *
 from paths import *
+from storage import get_store, StoreError, UserExistsError
 
-def add_user(username, traffic_gb, expiration_days, password=None, creation_date=None, unlimited_user=False):
+def generate_password():
     """
-    Adds a new user to the USERS_FILE.
+    Generates a random password with pwgen, falling back to a kernel UUID.
 
-    Args:
-        username (str): The username to add.
-        traffic_gb (str): The traffic limit in GB.
-        expiration_days (str): The number of days until the account expires.
-        password (str, optional): The user's password. If None, a random one is generated.
-        creation_date (str, optional): The account creation date in YYYY-MM-DD format. If None, the current date is used.
-        unlimited_user (bool, optional): If True, user is exempt from IP limits. Defaults to False.
+    Raises:
+        RuntimeError: If neither source is available.
+    """
+    try:
+        password_process = subprocess.run(['pwgen', '-s', '32', '1'], capture_output=True, text=True, check=True)
+        return password_process.stdout.strip()
+    except FileNotFoundError:
+        try:
+            return subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], text=True).strip()
+        except Exception:
+            raise RuntimeError("Error: Failed to generate password. Please install 'pwgen' or ensure /proc access.")
 
-    Returns:
-        int: 0 on success, 1 on failure.
+
+def create_user(username, traffic_gb, expiration_days, password=None, creation_date=None, unlimited_user=False):
     """
-    if not username or not traffic_gb or not expiration_days:
-        print(f"Usage: {sys.argv[0]} <username> <traffic_limit_GB> <expiration_days> [password] [creation_date] [unlimited_user (true/false)]")
-        return 1
+    Validates the arguments and stores a new user. This is the library entry
+    point used by cli_api; add_user() wraps it for command-line use.
+
+    Returns:
+        str: The stored (lower-cased) username.
 
+    Raises:
+        ValueError: If an argument is invalid.
+        UserExistsError: If the username, password or token is already taken.
+        StoreError: If the user store cannot be written.
+        RuntimeError: If no password was given and none could be generated.
+    """
     try:
         traffic_bytes = int(float(traffic_gb) * 1073741824)
         expiration_days = int(expiration_days)
     except ValueError:
-        print("Error: Traffic limit and expiration days must be numeric.")
-        return 1
+        raise ValueError("Error: Traffic limit and expiration days must be numeric.")
 
     username_lower = username.lower()
 
-    if not password:
-        try:
-            password_process = subprocess.run(['pwgen', '-s', '32', '1'], capture_output=True, text=True, check=True)
-            password = password_process.stdout.strip()
-        except FileNotFoundError:
-            try:
-                password = subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], text=True).strip()
-            except Exception:
-                print("Error: Failed to generate password. Please install 'pwgen' or ensure /proc access.")
-                return 1
-
     if not creation_date:
         creation_date = datetime.now().strftime("%Y-%m-%d")
     else:
         if not re.match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$", creation_date):
-            print("Invalid date format. Expected YYYY-MM-DD.")
-            return 1
+            raise ValueError("Invalid date format. Expected YYYY-MM-DD.")
         try:
             datetime.strptime(creation_date, "%Y-%m-%d")
         except ValueError:
-            print("Invalid date. Please provide a valid date in YYYY-MM-DD format.")
-            return 1
+            raise ValueError("Invalid date. Please provide a valid date in YYYY-MM-DD format.")
 
     if not re.match(r"^[a-zA-Z0-9_]+$", username):
-        print("Error: Username can only contain letters, numbers, and underscores.")
-        return 1
+        raise ValueError("Error: Username can only contain letters, numbers, and underscores.")
 
-    if not os.path.isfile(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'w') as f:
-                json.dump({}, f)
-        except IOError:
-            print(f"Error: Could not create {USERS_FILE}.")
-            return 1
+    store = get_store()
+    if store.exists(username_lower, ignore_case=True):
+        raise UserExistsError("User already exists.")
+
+    if not password:
+        password = generate_password()
+
+    store.add(username_lower, {
+        "password": password,
+        "max_download_bytes": traffic_bytes,
+        "expiration_days": expiration_days,
+        "account_creation_date": creation_date,
+        "blocked": False,
+        "unlimited_user": unlimited_user,
+        "token": str(uuid.uuid4())
+    })
+    return username_lower
+
+
+def add_user(username, traffic_gb, expiration_days, password=None, creation_date=None, unlimited_user=False):
+    """
+    Adds a new user to the user store.
+
+    Args:
+        username (str): The username to add.
+        traffic_gb (str): The traffic limit in GB.
+        expiration_days (str): The number of days until the account expires.
+        password (str, optional): The user's password. If None, a random one is generated.
+        creation_date (str, optional): The account creation date in YYYY-MM-DD format. If None, the current date is used.
+        unlimited_user (bool, optional): If True, user is exempt from IP limits. Defaults to False.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    if not username or not traffic_gb or not expiration_days:
+        print(f"Usage: {sys.argv[0]} <username> <traffic_limit_GB> <expiration_days> [password] [creation_date] [unlimited_user (true/false)]")
+        return 1
 
     try:
-        with open(USERS_FILE, 'r+') as f:
-            try:
-                users_data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error: {USERS_FILE} contains invalid JSON.")
-                return 1
-
-            for existing_username in users_data:
-                if existing_username.lower() == username_lower:
-                    print("User already exists.")
-                    return 1
-
-            import uuid
-            user_token = str(uuid.uuid4())
-            users_data[username_lower] = {
-                "password": password,
-                "max_download_bytes": traffic_bytes,
-                "expiration_days": expiration_days,
-                "account_creation_date": creation_date,
-                "blocked": False,
-                "unlimited_user": unlimited_user,
-                "token": user_token
-            }
-
-            f.seek(0)
-            json.dump(users_data, f, indent=4)
-            f.truncate()
-
-        print(f"User {username} added successfully.")
-        return 0
-
-    except IOError:
-        print(f"Error: Could not write to {USERS_FILE}.")
+        create_user(username, traffic_gb, expiration_days, password, creation_date, unlimited_user)
+    except (ValueError, RuntimeError, UserExistsError) as e:
+        print(e)
+        return 1
+    except (StoreError, IOError) as e:
+        print(f"Error: Could not save user {username}: {e}")
         return 1
 
+    print(f"User {username} added successfully.")
+    return 0
+
 if __name__ == "__main__":
     if len(sys.argv) < 4 or len(sys.argv) > 7:
         print(f"Usage: {sys.argv[0]} <username> <traffic_limit_GB> <expiration_days> [password] [creation_date] [unlimited_user (true/false)]")
@@ -1,31 +1,107 @@
-import json
 import os
+import json
+import time
 import asyncio
-from datetime import datetime, timedelta
+from typing import NamedTuple
 from aiohttp import web
-import aiofiles
 from init_paths import *
 from paths import *
+from storage import get_store, StoreError, auth_snapshot_path, read_auth_snapshot, read_auth_snapshot_version
+from storage.auth_snapshot import auth_entry, FLAG_BLOCKED, FLAG_QUOTA_EXCEEDED
+
+# Written by the storage layer on every committed change; only its header is read while idle.
+SNAPSHOT_PATH = auth_snapshot_path()
+# Seconds between checks of the snapshot for changes made by other processes.
+RELOAD_INTERVAL = float(os.getenv("HYSTERIA_AUTH_RELOAD_INTERVAL", "2"))
+AUTH_HOST = "127.0.0.1"
+AUTH_PORT = int(os.getenv("HYSTERIA_AUTH_PORT", "28262"))
+NEVER = float("inf")
+
+
+class AuthEntry(NamedTuple):
+    password: str
+    blocked: bool
+    expires_at: float
+    quota_exceeded: bool
+
+
+def build_entry(user):
+    password, flags, expires_at = auth_entry(user)
+    return entry_from_flags(password, flags, expires_at)
+
+
+def entry_from_flags(password, flags, expires_at):
+    return AuthEntry(
+        password=password or None,  # an empty password never matches
+        blocked=bool(flags & FLAG_BLOCKED),
+        expires_at=expires_at or NEVER,
+        quota_exceeded=bool(flags & FLAG_QUOTA_EXCEEDED),
+    )
+
+
+def build_snapshot(users):
+    return {username: build_entry(user) for username, user in users.items()}
+
+
+# Replaced as a whole on reload and never mutated, so requests read it without a lock.
+snapshot = {}
+snapshot_token = None
+
+
+def load_snapshot():
+    """Returns (snapshot, token); prefers the auth snapshot file and falls back to the store. Runs in a worker thread."""
+    version, entries = read_auth_snapshot(SNAPSHOT_PATH)
+    if version is not None:
+        return {username: entry_from_flags(*entry) for username, entry in entries.items()}, ("file", version)
+    store = get_store()
+    token = store.change_token()
+    return build_snapshot(store.all()), ("store", token)
+
+
+def current_token():
+    version = read_auth_snapshot_version(SNAPSHOT_PATH)
+    if version is not None:
+        return ("file", version)
+    return ("store", get_store().change_token())
+
+
+async def refresh_snapshot(force=False):
+    global snapshot, snapshot_token
+    token = await asyncio.to_thread(current_token)
+    if not force and token[1] is not None and token == snapshot_token:
+        return False
+    snapshot, snapshot_token = await asyncio.to_thread(load_snapshot)
+    return True
+
+
+async def watch_store(app):
+    while True:
+        await asyncio.sleep(RELOAD_INTERVAL)
+        try:
+            await refresh_snapshot()
+        except StoreError as e:
+            print(f"Warning: keeping the previous user snapshot: {e}")
+        except Exception as e:
+            print(f"Warning: user snapshot reload failed: {e}")
 
-users_data = {}
-users_lock = asyncio.Lock()
 
 async def load_users(app):
-    global users_data
-    async with users_lock:
-        if os.path.exists(USERS_FILE):
-            try:
-                async with aiofiles.open(USERS_FILE, 'r') as f:
-                    content = await f.read()
-                    users_data = json.loads(content)
-            except (IOError, json.JSONDecodeError):
-                users_data = {}
-        else:
-            users_data = {}
-    app['users_data'] = users_data
+    try:
+        await refresh_snapshot(force=True)
+    except StoreError as e:
+        print(f"Warning: could not load users: {e}")
+    app['watcher'] = asyncio.create_task(watch_store(app))
+
+
+async def stop_watcher(app):
+    app['watcher'].cancel()
+    try:
+        await app['watcher']
+    except asyncio.CancelledError:
+        pass
+
 
 async def authenticate(request):
-    global users_data
     try:
         data = await request.json()
         auth_str = data.get("auth")
@@ -33,42 +109,32 @@ async def authenticate(request):
             return web.json_response({"ok": False, "msg": "Auth field missing"}, status=400)
         
         username, password = auth_str.split(":", 1)
-    except (json.JSONDecodeError, ValueError, TypeError):
+    except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
         return web.json_response({"ok": False, "msg": "Invalid request format"}, status=400)
 
-    async with users_lock:
-        user = users_data.get(username)
+    user = snapshot.get(username)
 
-        if not user:
-            return web.json_response({"ok": False, "msg": "User not found"}, status=401)
+    if not user:
+        return web.json_response({"ok": False, "msg": "User not found"}, status=401)
 
-        if user.get("blocked", False):
-            return web.json_response({"ok": False, "msg": "User is blocked"}, status=401)
+    if user.blocked:
+        return web.json_response({"ok": False, "msg": "User is blocked"}, status=401)
 
-        if user.get("password") != password:
-            return web.json_response({"ok": False, "msg": "Invalid password"}, status=401)
-        
-        expiration_days = user.get("expiration_days", 0)
-        if expiration_days > 0:
-            creation_date_str = user.get("account_creation_date")
-            if creation_date_str:
-                creation_date = datetime.strptime(creation_date_str, "%Y-%m-%d")
-                expiration_date = creation_date + timedelta(days=expiration_days)
-                if datetime.now() >= expiration_date:
-                    return web.json_response({"ok": False, "msg": "Account expired"}, status=401)
-
-        max_bytes = user.get("max_download_bytes", 0)
-        if max_bytes > 0:
-            current_up = user.get("upload_bytes", 0)
-            current_down = user.get("download_bytes", 0)
-            if (current_up + current_down) >= max_bytes:
-                return web.json_response({"ok": False, "msg": "Data limit exceeded"}, status=401)
+    if user.password != password:
+        return web.json_response({"ok": False, "msg": "Invalid password"}, status=401)
+
+    if time.time() >= user.expires_at:
+        return web.json_response({"ok": False, "msg": "Account expired"}, status=401)
+
+    if user.quota_exceeded:
+        return web.json_response({"ok": False, "msg": "Data limit exceeded"}, status=401)
 
     return web.json_response({"ok": True, "id": username})
 
 app = web.Application()
 app.router.add_post("/auth", authenticate)
 app.on_startup.append(load_users)
+app.on_cleanup.append(stop_watcher)
 
 if __name__ == "__main__":
-    web.run_app(app, host="127.0.0.1", port=28262)
\ No newline at end of file
+    web.run_app(app, host=AUTH_HOST, port=AUTH_PORT)
@@ -3,6 +3,9 @@
 import zipfile
 from pathlib import Path
 from datetime import datetime
+from init_paths import *
+from paths import *
+from storage import get_store
 
 backup_dir = Path("/opt/hysbackup")
 backup_file = backup_dir / f"hysteria_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
@@ -18,6 +21,7 @@ files_to_backup = [
 backup_dir.mkdir(parents=True, exist_ok=True)
 
 try:
+    get_store().export_json(USERS_FILE)
     with zipfile.ZipFile(backup_file, 'w') as zipf:
         for file_path in files_to_backup:
             if file_path.exists():
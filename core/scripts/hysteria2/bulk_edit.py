@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+from datetime import date
+from init_paths import *
+from paths import *
+from storage import get_store, StoreError
+
+ACTIONS = ('delete', 'block', 'unblock', 'extend', 'reset')
+# Actions whose users must lose their live sessions.
+KICK_ACTIONS = ('delete', 'block')
+
+
+def parse_operations(operations):
+    """
+    Validates a list of {"action", "usernames", "days"} operations before anything is changed.
+    usernames may be a list or a comma-separated string; days is required for (and only used by) extend.
+
+    Returns:
+        list: (action, usernames, days) tuples, in the given order.
+
+    Raises:
+        ValueError: If an operation is malformed.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("Error: At least one operation is required.")
+
+    plan = []
+    for position, operation in enumerate(operations, 1):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Error: Operation {position} must be an object.")
+        action = operation.get('action')
+        if action not in ACTIONS:
+            raise ValueError(f"Error: Operation {position} has an unknown action '{action}'. "
+                             f"Use one of: {', '.join(ACTIONS)}.")
+
+        usernames = operation.get('usernames')
+        if isinstance(usernames, str):
+            usernames = usernames.split(',')
+        if not isinstance(usernames, list) or not all(isinstance(name, str) for name in usernames):
+            raise ValueError(f"Error: Operation {position} needs a list of usernames.")
+        usernames = list(dict.fromkeys(name.strip() for name in usernames if name.strip()))
+        if not usernames:
+            raise ValueError(f"Error: Operation {position} needs at least one username.")
+
+        days = None
+        if action == 'extend':
+            days = operation.get('days')
+            if isinstance(days, bool) or not isinstance(days, int) or days <= 0:
+                raise ValueError(f"Error: Operation {position} (extend) needs a positive number of days.")
+        plan.append((action, usernames, days))
+    return plan
+
+
+def users_to_kick(results):
+    """Returns every user that a saved delete or block disconnects, once each."""
+    return list(dict.fromkeys(result['username'] for result in results
+                              if result['action'] in KICK_ACTIONS and result['success']))
+
+
+def _apply(store, action, username, days, today):
+    if action == 'delete':
+        return store.remove(username), "removed"
+    if action in ('block', 'unblock'):
+        return store.update(username, {'blocked': action == 'block'}), f"{action}ed"
+    if action == 'reset':
+        done = store.update(username, {
+            'upload_bytes': 0,
+            'download_bytes': 0,
+            'status': "Offline",
+            'account_creation_date': today,
+            'blocked': False
+        })
+        return done, "reset"
+    user = store.get(username)
+    if user is None:
+        return False, None
+    expiration_days = int(user.get('expiration_days', 0) or 0) + days
+    store.update(username, {'expiration_days': expiration_days})
+    return True, f"extended by {days} days to {expiration_days}"
+
+
+def apply_operations(plan):
+    """
+    Applies a parsed plan in one store transaction: either every change is saved or none is.
+    A missing user fails only its own entry. The auth snapshot is rewritten before returning,
+    so users kicked afterwards cannot log back in with the old credentials.
+
+    Returns:
+        list: One {"username", "action", "success", "detail"} result per user and operation.
+
+    Raises:
+        StoreError: If the user store cannot be written (nothing is changed).
+    """
+    store = get_store()
+    today = date.today().strftime("%Y-%m-%d")
+    results = []
+    with store.transaction():
+        for action, usernames, days in plan:
+            for username in usernames:
+                done, detail = _apply(store, action, username, days, today)
+                results.append({
+                    'username': username,
+                    'action': action,
+                    'success': bool(done),
+                    'detail': detail if done else f"User '{username}' not found.",
+                })
+    store.flush_derived()
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} '<operations as JSON>'")
+        sys.exit(1)
+
+    try:
+        results = apply_operations(parse_operations(json.loads(sys.argv[1])))
+    except (ValueError, StoreError) as e:
+        print(e)
+        sys.exit(1)
+    print(json.dumps(results))
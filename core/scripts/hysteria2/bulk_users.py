@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
+import uuid
 import subprocess
 import argparse
 import re
 from datetime import datetime
 from init_paths import *
 from paths import *
+from storage import get_store, StoreError
 
 def add_bulk_users(traffic_gb, expiration_days, count, prefix, start_number, unlimited_user):
     try:
@@ -17,74 +17,56 @@ def add_bulk_users(traffic_gb, expiration_days, count, prefix, start_number, unl
         print("Error: Traffic limit must be a numeric value.")
         return 1
 
-    if not os.path.isfile(USERS_FILE):
+    try:
+        store = get_store()
+        new_users_to_add = {}
+        creation_date = datetime.now().strftime("%Y-%m-%d")
+
         try:
-            with open(USERS_FILE, 'w') as f:
-                json.dump({}, f)
-        except IOError:
-            print(f"Error: Could not create {USERS_FILE}.")
+            password_process = subprocess.run(['pwgen', '-s', '32', str(count)], capture_output=True, text=True, check=True)
+            passwords = password_process.stdout.strip().split('\n')
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("Warning: 'pwgen' not found or failed. Falling back to UUID for password generation.")
+            passwords = [subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], text=True).strip() for _ in range(count)]
+
+        if len(passwords) < count:
+            print("Error: Could not generate enough passwords.")
             return 1
 
-    try:
-        with open(USERS_FILE, 'r+') as f:
-            try:
-                users_data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error: {USERS_FILE} contains invalid JSON.")
-                return 1
-
-            existing_users_lower = {u.lower() for u in users_data}
-            new_users_to_add = {}
-            creation_date = datetime.now().strftime("%Y-%m-%d")
-
-            try:
-                password_process = subprocess.run(['pwgen', '-s', '32', str(count)], capture_output=True, text=True, check=True)
-                passwords = password_process.stdout.strip().split('\n')
-            except (FileNotFoundError, subprocess.CalledProcessError):
-                print("Warning: 'pwgen' not found or failed. Falling back to UUID for password generation.")
-                passwords = [subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], text=True).strip() for _ in range(count)]
-
-            if len(passwords) < count:
-                print("Error: Could not generate enough passwords.")
-                return 1
-
-            for i in range(count):
-                username = f"{prefix}{start_number + i}"
-                username_lower = username.lower()
-
-                if not re.match(r"^[a-zA-Z0-9_]+$", username_lower):
-                    print(f"Error: Generated username '{username}' contains invalid characters. Use only letters, numbers, and underscores.")
-                    continue
-
-                if username_lower in existing_users_lower or username_lower in new_users_to_add:
-                    print(f"Warning: User '{username}' already exists. Skipping.")
-                    continue
-
-                new_users_to_add[username_lower] = {
-                    "password": passwords[i],
-                    "max_download_bytes": traffic_bytes,
-                    "expiration_days": expiration_days,
-                    "account_creation_date": creation_date,
-                    "blocked": False,
-                    "unlimited_user": unlimited_user
-                }
-                # print(f"Preparing to add user: {username}")
-
-            if not new_users_to_add:
-                print("No new users to add.")
-                return 0
-
-            users_data.update(new_users_to_add)
-            
-            f.seek(0)
-            json.dump(users_data, f, indent=4)
-            f.truncate()
-            
+        for i in range(count):
+            username = f"{prefix}{start_number + i}"
+            username_lower = username.lower()
+
+            if not re.match(r"^[a-zA-Z0-9_]+$", username_lower):
+                print(f"Error: Generated username '{username}' contains invalid characters. Use only letters, numbers, and underscores.")
+                continue
+
+            if username_lower in new_users_to_add or store.exists(username_lower, ignore_case=True):
+                print(f"Warning: User '{username}' already exists. Skipping.")
+                continue
+
+            new_users_to_add[username_lower] = {
+                "password": passwords[i],
+                "max_download_bytes": traffic_bytes,
+                "expiration_days": expiration_days,
+                "account_creation_date": creation_date,
+                "blocked": False,
+                "unlimited_user": unlimited_user,
+                "token": str(uuid.uuid4())
+            }
+            # print(f"Preparing to add user: {username}")
+
+        if not new_users_to_add:
+            print("No new users to add.")
+            return 0
+
+        store.add_many(new_users_to_add)
+
         print(f"\nSuccessfully added {len(new_users_to_add)} users.")
         return 0
 
-    except IOError:
-        print(f"Error: Could not read or write to {USERS_FILE}.")
+    except StoreError as e:
+        print(f"Error: Could not save users: {e}")
         return 1
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import sys
+import re
+from datetime import datetime
+from init_paths import *
+from paths import *
+from storage import get_store, StoreError, UserNotFoundError
+
+GB_TO_BYTES = 1024 * 1024 * 1024
+
+
+def validate_non_negative_int(value, label):
+    if not value:
+        return None
+    if not re.match(r"^[0-9]+$", value):
+        raise ValueError(f"Error: {label} must be a valid non-negative number (use 0 for unlimited).")
+    return int(value)
+
+
+def validate_bool(value, label):
+    if not value:
+        return None
+    if value not in ("true", "false"):
+        raise ValueError(f"{label} status must be 'true' or 'false'.")
+    return value == "true"
+
+
+def validate_date(value):
+    if not value:
+        return None
+    if not re.match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$", value):
+        raise ValueError("Invalid date format. Expected YYYY-MM-DD.")
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Invalid date. Please provide a valid date in YYYY-MM-DD format.")
+    return value
+
+
+def update_user(username, new_username=None, traffic_limit_gb=None, expiration_days=None,
+                password=None, creation_date=None, blocked=None, unlimited=None):
+    """
+    Applies already-validated changes to a user in one transaction. None
+    leaves the corresponding field unchanged. This is the library entry point
+    used by cli_api; edit_user() wraps it for command-line use.
+
+    Raises:
+        ValueError: If the new username is invalid.
+        UserNotFoundError: If the user does not exist.
+        StoreError: If the change conflicts with another user or cannot be saved.
+    """
+    if new_username and not re.match(r"^[a-zA-Z0-9_]+$", new_username):
+        raise ValueError(f"Invalid username: {new_username}. "
+                         "Username can only contain letters, numbers, and underscores.")
+
+    changes = {}
+    if password:
+        changes['password'] = password
+    if traffic_limit_gb is not None:
+        changes['max_download_bytes'] = traffic_limit_gb * GB_TO_BYTES
+    if expiration_days is not None:
+        changes['expiration_days'] = expiration_days
+    if creation_date is not None:
+        changes['account_creation_date'] = creation_date
+    if blocked is not None:
+        changes['blocked'] = blocked
+    if unlimited is not None:
+        changes['unlimited_user'] = unlimited
+
+    store = get_store()
+    target_username = new_username or username
+    with store.transaction():
+        if not store.exists(username):
+            raise UserNotFoundError(f"User '{username}' not found.")
+        store.rename(username, target_username)
+        if changes:
+            store.update(target_username, changes)
+    return changes
+
+
+def edit_user(username, new_username="", new_traffic_limit="", new_expiration_days="",
+              new_password="", new_creation_date="", new_blocked="", new_unlimited=""):
+    """
+    Edits a user in place. Empty arguments leave the corresponding field unchanged.
+
+    Args:
+        username (str): The user to edit.
+        new_username (str): New username.
+        new_traffic_limit (str): New traffic limit in GB.
+        new_expiration_days (str): New number of days until expiration.
+        new_password (str): New password.
+        new_creation_date (str): New account creation date (YYYY-MM-DD).
+        new_blocked (str): 'true' or 'false'.
+        new_unlimited (str): 'true' or 'false' (exempt from IP limits).
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    if not get_store().exists(username):
+        print(f"User '{username}' not found.")
+        return 1
+
+    try:
+        traffic_limit = validate_non_negative_int(new_traffic_limit, "Traffic limit")
+        expiration_days = validate_non_negative_int(new_expiration_days, "Expiration days")
+        creation_date = validate_date(new_creation_date)
+        blocked = validate_bool(new_blocked, "Blocked")
+        unlimited = validate_bool(new_unlimited, "Unlimited")
+    except ValueError as e:
+        print(e)
+        return 1
+
+    print("Updating user:")
+    print(f"Username: {new_username or username}")
+    print(f"Password: {new_password or '(not changed)'}")
+    print(f"Max Download Bytes: {traffic_limit * GB_TO_BYTES if traffic_limit is not None else '(not changed)'}")
+    print(f"Expiration Days: {new_expiration_days or '(not changed)'}")
+    print(f"Creation Date: {new_creation_date or '(not changed)'}")
+    print(f"Blocked: {new_blocked or '(not changed)'}")
+    print(f"Unlimited IP: {new_unlimited or '(not changed)'}")
+
+    try:
+        update_user(username, new_username or None, traffic_limit, expiration_days,
+                    new_password or None, creation_date, blocked, unlimited)
+    except (ValueError, UserNotFoundError) as e:
+        print(e)
+        return 1
+    except StoreError as e:
+        print(f"Failed to update user '{username}': {e}")
+        return 1
+
+    print("User updated successfully.")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or len(sys.argv) > 9:
+        print(f"Usage: {sys.argv[0]} <username> [new_username] [new_traffic_limit_GB] [new_expiration_days] "
+              "[new_password] [new_creation_date] [blocked (true/false)] [unlimited_user (true/false)]")
+        sys.exit(1)
+
+    args = sys.argv[1:] + [""] * (9 - len(sys.argv))
+    sys.exit(edit_user(*args))
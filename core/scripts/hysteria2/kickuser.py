@@ -8,6 +8,7 @@ from hysteria2_api import Hysteria2Client, Hysteria2Error
 
 from init_paths import *
 from paths import *
+from quota import batches
 
 
 def get_api_secret(config_path: str) -> str:
@@ -34,29 +35,42 @@ def get_api_secret(config_path: str) -> str:
          raise KeyError(f"Missing expected key {e} in {config_path}")
 
 
+def kick_user(username: str) -> None:
+    """Disconnects a user's active sessions through the Hysteria2 traffic stats API."""
+    api_secret = get_api_secret(CONFIG_FILE)
+    client = Hysteria2Client(
+        base_url=API_BASE_URL,
+        secret=api_secret
+    )
+    client.kick_clients([username])
+
+
+def kick_users(usernames: list[str]) -> None:
+    """Disconnects many users with one API client, in the batch size the traffic collector uses."""
+    api_secret = get_api_secret(CONFIG_FILE)
+    client = Hysteria2Client(
+        base_url=API_BASE_URL,
+        secret=api_secret
+    )
+    for batch in batches(list(usernames)):
+        client.kick_clients(batch)
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Kick a Hysteria2 user via the API.",
-        usage="%(prog)s <username>" 
+        description="Kick Hysteria2 users via the API.",
+        usage="%(prog)s <username> [<username> ...]" 
     )
     parser.add_argument(
-        "username",
-        help="The username (Auth identity) to kick."
+        "usernames",
+        nargs="+",
+        help="The usernames (Auth identities) to kick."
     )
     args = parser.parse_args()
-    username_to_kick = args.username
+    username_to_kick = ", ".join(args.usernames)
 
     try:
-        api_secret = get_api_secret(CONFIG_FILE)
-        # print(api_secret)
-        # print(f"Kicking user: {username_to_kick}")
-
-        client = Hysteria2Client(
-            base_url=API_BASE_URL,
-            secret=api_secret
-        )
-
-        client.kick_clients([username_to_kick])
+        kick_users(args.usernames)
 
         # print(f"User '{username_to_kick}' kicked successfully.")
         sys.exit(0)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+from init_paths import *
+from paths import *
+from storage import get_store, StoreError
+
+
+def list_users():
+    """
+    Prints all users as a JSON object in the users.json layout.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    try:
+        users = get_store().all()
+    except StoreError as e:
+        print(f"Error: Could not read user store: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(users, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(list_users())
@@ -1,6 +0,0 @@
-#!/bin/bash
-
-source /etc/hysteria/core/scripts/path.sh
-
-
-cat "$USERS_FILE"
\ No newline at end of file
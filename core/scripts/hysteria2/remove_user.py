@@ -1,31 +1,21 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
 import asyncio
 from init_paths import *
 from paths import *
+from storage import get_store, UserNotFoundError
 
-def sync_remove_user(username):
-    if not os.path.isfile(USERS_FILE):
-        return 1, f"Error: Config file {USERS_FILE} not found."
+def delete_user(username):
+    if not get_store().remove(username):
+        raise UserNotFoundError(f"Error: User {username} not found.")
 
+def sync_remove_user(username):
     try:
-        with open(USERS_FILE, 'r') as f:
-            try:
-                users_data = json.load(f)
-            except json.JSONDecodeError:
-                return 1, f"Error: {USERS_FILE} contains invalid JSON."
-
-        if username in users_data:
-            del users_data[username]
-            with open(USERS_FILE, 'w') as f:
-                json.dump(users_data, f, indent=4)
-            return 0, f"User {username} removed successfully."
-        else:
-            return 1, f"Error: User {username} not found."
-
+        delete_user(username)
+        return 0, f"User {username} removed successfully."
+    except UserNotFoundError as e:
+        return 1, str(e)
     except Exception as e:
         return 1, f"Error: {str(e)}"
 
@@ -1,15 +1,34 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
 from datetime import date
 from init_paths import *
 from paths import *
+from storage import get_store, StoreError, UserNotFoundError
+
+def reset_user_usage(username):
+    """
+    Clears a user's traffic, unblocks it and restarts its period today.
+
+    Raises:
+        UserNotFoundError: If the user does not exist.
+        StoreError: If the user store cannot be written.
+    """
+    today = date.today().strftime("%Y-%m-%d")
+    updated = get_store().update(username, {
+        'upload_bytes': 0,
+        'download_bytes': 0,
+        'status': "Offline",
+        'account_creation_date': today,
+        'blocked': False
+    })
+    if not updated:
+        raise UserNotFoundError(f"Error: User '{username}' not found.")
+
 
 def reset_user(username):
     """
-    Resets the data usage, status, and creation date of a user in the USERS_FILE.
+    Resets the data usage, status, and creation date of a user in the user store.
 
     Args:
         username (str): The username to reset.
@@ -17,36 +36,17 @@ def reset_user(username):
     Returns:
         int: 0 on success, 1 on failure.
     """
-    if not os.path.isfile(USERS_FILE):
-        print(f"Error: File '{USERS_FILE}' not found.")
-        return 1
-
     try:
-        with open(USERS_FILE, 'r') as f:
-            users_data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: {USERS_FILE} contains invalid JSON.")
+        reset_user_usage(username)
+    except UserNotFoundError as e:
+        print(e)
         return 1
-
-    if username not in users_data:
-        print(f"Error: User '{username}' not found in '{USERS_FILE}'.")
+    except StoreError as e:
+        print(f"Error: Failed to reset user '{username}': {e}")
         return 1
 
-    today = date.today().strftime("%Y-%m-%d")
-    users_data[username]['upload_bytes'] = 0
-    users_data[username]['download_bytes'] = 0
-    users_data[username]['status'] = "Offline"
-    users_data[username]['account_creation_date'] = today
-    users_data[username]['blocked'] = False
-
-    try:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users_data, f, indent=4)
-        print(f"User '{username}' has been reset successfully.")
-        return 0
-    except IOError:
-        print(f"Error: Failed to reset user '{username}' in '{USERS_FILE}'.")
-        return 1
+    print(f"User '{username}' has been reset successfully.")
+    return 0
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -11,6 +11,7 @@ import datetime
 from pathlib import Path
 from init_paths import *
 from paths import *
+from storage import get_store, migrate_from_json, StoreError
 
 def run_command(command, capture_output=True, check=False):
     """Run a shell command and return its output"""
@@ -97,6 +98,12 @@ def main():
                 shutil.rmtree(existing_backup_dir, ignore_errors=True)
                 return 1
         
+        try:
+            migrate_from_json(get_store(), USERS_FILE, replace=True)
+        except StoreError as e:
+            print(f"Error: Could not load the restored users into the user store: {e}")
+            return 1
+        
         config_file = os.path.join(target_dir, "config.json")
         
         if os.path.isfile(config_file):
@@ -10,6 +10,11 @@ from functools import lru_cache
 from hysteria2_api import Hysteria2Client
 from init_paths import *
 from paths import *
+from storage import get_store
+from server_status import (
+    convert_bytes, convert_speed, format_uptime,
+    parse_cpu_stats, parse_meminfo, parse_network_stats, parse_connection_counts,
+)
 
 
 @lru_cache(maxsize=1)
@@ -29,30 +34,6 @@ def get_secret() -> str:
     return secret
 
 
-def convert_bytes(bytes_val: int) -> str:
-    if bytes_val >= (1 << 40):
-        return f"{bytes_val / (1 << 40):.2f} TB"
-    elif bytes_val >= (1 << 30):
-        return f"{bytes_val / (1 << 30):.2f} GB"
-    elif bytes_val >= (1 << 20):
-        return f"{bytes_val / (1 << 20):.2f} MB"
-    elif bytes_val >= (1 << 10):
-        return f"{bytes_val / (1 << 10):.2f} KB"
-    return f"{bytes_val} B"
-
-
-def convert_speed(bytes_per_second: int) -> str:
-    if bytes_per_second >= (1 << 40):
-        return f"{bytes_per_second / (1 << 40):.2f} TB/s"
-    elif bytes_per_second >= (1 << 30):
-        return f"{bytes_per_second / (1 << 30):.2f} GB/s"
-    elif bytes_per_second >= (1 << 20):
-        return f"{bytes_per_second / (1 << 20):.2f} MB/s"
-    elif bytes_per_second >= (1 << 10):
-        return f"{bytes_per_second / (1 << 10):.2f} KB/s"
-    return f"{int(bytes_per_second)} B/s"
-
-
 async def read_file_async(filepath: str) -> str:
     try:
         async with aiofiles.open(filepath, 'r') as f:
@@ -61,14 +42,6 @@ async def read_file_async(filepath: str) -> str:
         return ""
 
 
-def format_uptime(seconds: float) -> str:
-    seconds = int(seconds)
-    days, remainder = divmod(seconds, 86400)
-    hours, remainder = divmod(remainder, 3600)
-    minutes, _ = divmod(remainder, 60)
-    return f"{days}d {hours}h {minutes}m"
-
-
 async def get_uptime_and_boottime() -> tuple[str, str]:
     try:
         content = await read_file_async("/proc/uptime")
@@ -81,15 +54,6 @@ async def get_uptime_and_boottime() -> tuple[str, str]:
         return "N/A", "N/A"
 
 
-def parse_cpu_stats(content: str) -> tuple[int, int]:
-    if not content:
-        return 0, 0
-    line = content.split('\n')[0]
-    fields = list(map(int, line.strip().split()[1:]))
-    idle, total = fields[3], sum(fields)
-    return idle, total
-
-
 async def get_cpu_usage(interval: float = 0.1) -> float:
     content1 = await read_file_async("/proc/stat")
     idle1, total1 = parse_cpu_stats(content1)
@@ -105,61 +69,11 @@ async def get_cpu_usage(interval: float = 0.1) -> float:
     return round(cpu_usage, 1)
 
 
-def parse_meminfo(content: str) -> tuple[int, int]:
-    if not content:
-        return 0, 0
-    
-    mem_info = {}
-    for line in content.split('\n'):
-        if ':' in line:
-            parts = line.split()
-            if len(parts) >= 2:
-                key = parts[0].rstrip(':')
-                if parts[1].isdigit():
-                    mem_info[key] = int(parts[1])
-
-    mem_total_kb = mem_info.get("MemTotal", 0)
-    mem_free_kb = mem_info.get("MemFree", 0)
-    buffers_kb = mem_info.get("Buffers", 0)
-    cached_kb = mem_info.get("Cached", 0)
-    sreclaimable_kb = mem_info.get("SReclaimable", 0)
-
-    used_kb = mem_total_kb - mem_free_kb - buffers_kb - cached_kb - sreclaimable_kb
-
-    used_kb = max(0, used_kb)
-    return mem_total_kb // 1024, used_kb // 1024
-
-
 async def get_memory_usage() -> tuple[int, int]:
     content = await read_file_async("/proc/meminfo")
     return parse_meminfo(content)
 
 
-def parse_network_stats(content: str) -> tuple[int, int]:
-    if not content:
-        return 0, 0
-    
-    rx_bytes, tx_bytes = 0, 0
-    lines = content.split('\n')
-    
-    for line in lines[2:]:
-        if not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) < 10:
-            continue
-        iface = parts[0].strip().replace(':', '')
-        if iface == 'lo':
-            continue
-        try:
-            rx_bytes += int(parts[1])
-            tx_bytes += int(parts[9])
-        except (IndexError, ValueError):
-            continue
-    
-    return rx_bytes, tx_bytes
-
-
 async def get_network_stats() -> tuple[int, int]:
     content = await read_file_async('/proc/net/dev')
     return parse_network_stats(content)
@@ -175,12 +89,6 @@ async def get_network_speed(interval: float = 0.5) -> tuple[int, int]:
     return int(rx_speed), int(tx_speed)
 
 
-def parse_connection_counts(tcp_content: str, udp_content: str) -> tuple[int, int]:
-    tcp_count = len(tcp_content.split('\n')) - 2 if tcp_content else 0
-    udp_count = len(udp_content.split('\n')) - 2 if udp_content else 0
-    return max(0, tcp_count), max(0, udp_count)
-
-
 async def get_connection_counts() -> tuple[int, int]:
     tcp_task = read_file_async('/proc/net/tcp')
     udp_task = read_file_async('/proc/net/udp')
@@ -207,29 +115,11 @@ async def get_online_user_count(secret: str) -> int:
         return await loop.run_in_executor(executor, get_online_user_count_sync, secret)
 
 
-def parse_total_traffic(content: str) -> tuple[int, int]:
-    if not content:
-        return 0, 0
-    
-    try:
-        users = json.loads(content)
-        total_upload = sum(int(user_data.get("upload_bytes", 0) or 0) for user_data in users.values())
-        total_download = sum(int(user_data.get("download_bytes", 0) or 0) for user_data in users.values())
-        return total_upload, total_download
-    except (json.JSONDecodeError, ValueError, AttributeError):
-        return 0, 0
-
-
 async def get_user_traffic() -> tuple[int, int]:
-    if not USERS_FILE.exists():
-        return 0, 0
-    
     try:
-        async with aiofiles.open(USERS_FILE, 'r') as f:
-            content = await f.read()
-        return parse_total_traffic(content)
+        return await asyncio.to_thread(get_store().traffic_totals)
     except Exception as e:
-        print(f"Error parsing traffic data: {e}", file=sys.stderr)
+        print(f"Error reading traffic data: {e}", file=sys.stderr)
         return 0, 0
 
 
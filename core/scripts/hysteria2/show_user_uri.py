@@ -3,7 +3,6 @@
 import os
 import sys
 import json
-import subprocess
 import argparse
 import re
 import qrcode
@@ -11,6 +10,8 @@ from io import StringIO
 from typing import Tuple, Optional, Dict, List, Any
 from init_paths import *
 from paths import *
+from storage import get_store
+import services_status
 
 def load_env_file(env_file: str) -> Dict[str, str]:
     """Load environment variables from a file into a dictionary."""
@@ -64,15 +65,8 @@ def get_normalsub_domain_and_port() -> Tuple[str, str, str]:
     return domain, port, subpath
 
 def is_service_active(service_name: str) -> bool:
-    """Check if a systemd service is active."""
-    try:
-        result = subprocess.run(
-            ['systemctl', 'is-active', '--quiet', service_name],
-            check=False
-        )
-        return result.returncode == 0
-    except Exception:
-        return False
+    """Check if a systemd service is active (cached; one systemctl call covers every project service)."""
+    return services_status.is_active(service_name)
 
 def generate_uri(username: str, auth_password: str, ip: str, port: str, 
                  obfs_password: str, sha256: str, sni: str, ip_version: int, 
@@ -126,83 +120,144 @@ def get_terminal_width() -> int:
     except (AttributeError, OSError):
         return 80
 
-def display_uri_and_qr(uri: str, label: str, args: argparse.Namespace, terminal_width: int):
-    """Helper function to print URI and its QR code."""
-    if not uri:
-        return
-        
-    print(f"\n{label}:\n{uri}\n")
-    
-    if args.qrcode:
-        print(f"{label} QR Code:\n")
-        qr_code = generate_qr_code(uri)
-        for line in qr_code:
-            print(center_text(line, terminal_width))
-
-def show_uri(args: argparse.Namespace) -> None:
-    """Show URI and optional QR codes for the given username and nodes."""
-    if not os.path.exists(USERS_FILE):
-        print(f"\033[0;31mError:\033[0m Config file {USERS_FILE} not found.")
-        return
-    
-    if not is_service_active("hysteria-server.service"):
-        print("\033[0;31mError:\033[0m Hysteria2 is not active.")
-        return
-    
+def load_uri_settings() -> Dict[str, Any]:
+    """Load the server-wide values shared by every user's URIs (read once per batch)."""
     with open(CONFIG_FILE, 'r') as f:
         config = json.load(f)
-    
-    with open(USERS_FILE, 'r') as f:
-        users = json.load(f)
-    
-    if args.username not in users:
-        print("Invalid username. Please try again.")
-        return
-    
-    auth_password = users[args.username]["password"]
-    port = config["listen"].split(":")[1] if ":" in config["listen"] else config["listen"]
-    sha256 = config.get("tls", {}).get("pinSHA256", "")
-    obfs_password = config.get("obfs", {}).get("salamander", {}).get("password", "")
-    insecure = config.get("tls", {}).get("insecure", True)
-    
+
     ip4, ip6, sni = load_hysteria2_ips()
-    nodes = load_nodes()
-    terminal_width = get_terminal_width()
+    return {
+        "port": config["listen"].split(":")[1] if ":" in config["listen"] else config["listen"],
+        "sha256": config.get("tls", {}).get("pinSHA256", ""),
+        "obfs_password": config.get("obfs", {}).get("salamander", {}).get("password", ""),
+        "insecure": config.get("tls", {}).get("insecure", True),
+        "ip4": ip4,
+        "ip6": ip6,
+        "sni": sni,
+        "nodes": load_nodes(),
+    }
+
+def build_user_uris(username: str, auth_password: str, settings: Dict[str, Any],
+                    ip_version: int = 4, show_all: bool = False) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Return (label, uri, node_name) for the server addresses and external nodes,
+    in display order. node_name is None for the server's own addresses.
+    """
+    uris = []
+
+    def add(label: str, ip: str, ip_v: int, fragment_tag: str, node_name: Optional[str] = None):
+        uri = generate_uri(username, auth_password, ip, settings["port"], settings["obfs_password"],
+                           settings["sha256"], settings["sni"], ip_v, settings["insecure"], fragment_tag)
+        uris.append((label, uri, node_name))
 
-    if args.all or args.ip_version == 4:
-        if ip4 and ip4 != "None":
-            uri = generate_uri(args.username, auth_password, ip4, port, 
-                                 obfs_password, sha256, sni, 4, insecure, f"{args.username}-IPv4")
-            display_uri_and_qr(uri, "IPv4", args, terminal_width)
-            
-    if args.all or args.ip_version == 6:
-        if ip6 and ip6 != "None":
-            uri = generate_uri(args.username, auth_password, ip6, port, 
-                                 obfs_password, sha256, sni, 6, insecure, f"{args.username}-IPv6")
-            display_uri_and_qr(uri, "IPv6", args, terminal_width)
-
-    for node in nodes:
+    if show_all or ip_version == 4:
+        if settings["ip4"] and settings["ip4"] != "None":
+            add("IPv4", settings["ip4"], 4, f"{username}-IPv4")
+
+    if show_all or ip_version == 6:
+        if settings["ip6"] and settings["ip6"] != "None":
+            add("IPv6", settings["ip6"], 6, f"{username}-IPv6")
+
+    for node in settings["nodes"]:
         node_name = node.get("name")
         node_ip = node.get("ip")
         if not node_name or not node_ip:
             continue
-            
+
         ip_v = 4 if '.' in node_ip else 6
-        
-        if args.all or args.ip_version == ip_v:
-            uri = generate_uri(args.username, auth_password, node_ip, port, 
-                                 obfs_password, sha256, sni, ip_v, insecure, f"{args.username}-{node_name}")
-            display_uri_and_qr(uri, f"Node: {node_name} (IPv{ip_v})", args, terminal_width)
-
-    if args.singbox and is_service_active("hysteria-singbox.service"):
-        domain, port = get_singbox_domain_and_port()
-        if domain and port:
-            print(f"\nSingbox Sublink:\nhttps://{domain}:{port}/sub/singbox/{args.username}/{args.ip_version}#{args.username}\n")
-    
-    if args.normalsub and is_service_active("hysteria-normal-sub.service"):
-        domain, port, subpath = get_normalsub_domain_and_port()
-        if domain and port:
-            print(f"\nNormal-SUB Sublink:\nhttps://{domain}:{port}/{subpath}/sub/normal/{auth_password}#Hysteria2\n")
+
+        if show_all or ip_version == ip_v:
+            add(f"Node: {node_name} (IPv{ip_v})", node_ip, ip_v, f"{username}-{node_name}", node_name)
+
+    return uris
+
+def get_singbox_sublink(username: str, ip_version: int) -> Optional[str]:
+    if not is_service_active("hysteria-singbox.service"):
+        return None
+    domain, port = get_singbox_domain_and_port()
+    if domain and port:
+        return f"https://{domain}:{port}/sub/singbox/{username}/{ip_version}#{username}"
+    return None
+
+def get_normalsub_sublink(auth_password: str) -> Optional[str]:
+    if not is_service_active("hysteria-normal-sub.service"):
+        return None
+    domain, port, subpath = get_normalsub_domain_and_port()
+    if domain and port:
+        return f"https://{domain}:{port}/{subpath}/sub/normal/{auth_password}#Hysteria2"
+    return None
+
+def render_uri_and_qr(uri: str, label: str, qrcode: bool, terminal_width: int) -> List[str]:
+    """Helper function to format a URI and its QR code."""
+    if not uri:
+        return []
+
+    lines = [f"\n{label}:\n{uri}\n"]
+
+    if qrcode:
+        lines.append(f"{label} QR Code:\n")
+        lines.extend(center_text(line, terminal_width) for line in generate_qr_code(uri))
+    return lines
+
+def render_user_uri(username: str, qrcode: bool = False, ip_version: int = 4, show_all: bool = False,
+                    singbox: bool = False, normalsub: bool = False) -> str:
+    """Return the text shown by `show-user-uri` for the given username and nodes."""
+    if not is_service_active("hysteria-server.service"):
+        return "\033[0;31mError:\033[0m Hysteria2 is not active."
+
+    settings = load_uri_settings()
+
+    user = get_store().get(username)
+    if user is None:
+        return "Invalid username. Please try again."
+
+    auth_password = user["password"]
+    terminal_width = get_terminal_width()
+
+    lines = []
+    for label, uri, _ in build_user_uris(username, auth_password, settings, ip_version, show_all):
+        lines.extend(render_uri_and_qr(uri, label, qrcode, terminal_width))
+
+    if singbox and (sublink := get_singbox_sublink(username, ip_version)):
+        lines.append(f"\nSingbox Sublink:\n{sublink}\n")
+
+    if normalsub and (sublink := get_normalsub_sublink(auth_password)):
+        lines.append(f"\nNormal-SUB Sublink:\n{sublink}\n")
+
+    return "\n".join(lines)
+
+def user_uri_data(usernames: List[str]) -> List[Dict[str, Any]]:
+    """
+    Return the structured URI information that wrapper_uri.py extracts from
+    `show-user-uri -a -n -s`, for several users at once.
+    """
+    server_active = is_service_active("hysteria-server.service")
+    settings = load_uri_settings() if server_active else None
+    store = get_store()
+
+    results = []
+    for username in usernames:
+        user = store.get(username) if server_active else None
+        if server_active and user is None:
+            results.append({"username": username, "error": "User not found"})
+            continue
+
+        data = {"username": username, "ipv4": None, "ipv6": None, "nodes": [], "normal_sub": None}
+        if user is not None:
+            for label, uri, node_name in build_user_uris(username, user["password"], settings, show_all=True):
+                if node_name:
+                    data["nodes"].append({"name": node_name, "uri": uri})
+                elif label == "IPv4":
+                    data["ipv4"] = uri
+                else:
+                    data["ipv6"] = uri
+            data["normal_sub"] = get_normalsub_sublink(user["password"])
+        results.append(data)
+    return results
+
+def show_uri(args: argparse.Namespace) -> None:
+    """Show URI and optional QR codes for the given username and nodes."""
+    print(render_user_uri(args.username, args.qrcode, args.ip_version, args.all, args.singbox, args.normalsub))
 
 def main():
     """Main function to parse arguments and show URIs."""
@@ -1,21 +1,39 @@
 import os
+import sys
 import json
-import subprocess
 import re
 import time
 import shlex
 import base64
+import hashlib
+import copy
+import signal
+import asyncio
+import argparse
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass, field
 from io import BytesIO
+from pathlib import Path
 
 from aiohttp import web
 from aiohttp.web_middlewares import middleware
 from urllib.parse import unquote, parse_qs, urlparse, urljoin
 from dotenv import load_dotenv
 import qrcode
+import qrcode.image.svg
 from jinja2 import Environment, FileSystemLoader
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'hysteria2'))
+from paths import CONFIG_FILE, CONFIG_ENV, NODES_JSON_PATH, EXTRA_CONFIG_PATH
+from storage import get_store, StoreError
+from show_user_uri import load_uri_settings, build_user_uris
+from compression import CompressedBodyCache
+from rate_limit import TokenBucketLimiter, SharedTokenBucketLimiter, client_address, parse_trusted_proxies, DEFAULT_MAX_KEYS, DEFAULT_TRUSTED_PROXIES
+
 load_dotenv()
 
 
@@ -27,33 +45,28 @@ class AppConfig:
     aiohttp_listen_port: int
     sni_file: str
     singbox_template_path: str
-    hysteria_cli_path: str
     users_json_path: str
     nodes_json_path: str
     extra_config_path: str
     rate_limit: int
     rate_limit_window: int
+    token_rate_limit: int
+    rate_limit_max_keys: int
+    trusted_proxies: Tuple
     sni: str
     template_dir: str
     subpath: str
-
-
-class RateLimiter:
-    def __init__(self, limit: int, window: int):
-        self.limit = limit
-        self.window = window
-        self.store: Dict[str, Tuple[int, float]] = {}
-
-    def check_limit(self, client_ip: str) -> bool:
-        current_time = time.monotonic()
-        requests, last_request_time = self.store.get(client_ip, (0, 0))
-        if current_time - last_request_time < self.window:
-            if requests >= self.limit:
-                return False
-        else:
-            requests = 0
-        self.store[client_ip] = (requests + 1, current_time)
-        return True
+    qr_cache_bytes: int
+    qr_endpoint: bool
+    singbox_cache_bytes: int
+    max_concurrent_requests: int
+    request_timeout: float
+    blocking_threads: int
+    compression: bool
+    gzip_level: int
+    brotli_quality: int
+    compress_min_bytes: int
+    compression_cache_bytes: int
 
 
 @dataclass
@@ -75,6 +88,25 @@ class UserInfo:
     account_creation_date: str
     expiration_days: int
     blocked: bool = False
+    # Changes whenever any field a response is rendered from changes.
+    content_version: str = ''
+
+    @classmethod
+    def from_store(cls, username: str, user: Dict[str, Any]) -> 'UserInfo':
+        info = cls(
+            username=username,
+            password=user.get('password', ''),
+            upload_bytes=user.get('upload_bytes', 0) or 0,
+            download_bytes=user.get('download_bytes', 0) or 0,
+            max_download_bytes=user.get('max_download_bytes', 0) or 0,
+            account_creation_date=user.get('account_creation_date', '') or '',
+            expiration_days=user.get('expiration_days', 0) or 0,
+            blocked=bool(user.get('blocked', False))
+        )
+        fields = (info.username, info.password, info.upload_bytes, info.download_bytes, info.max_download_bytes,
+                  info.account_creation_date, info.expiration_days, info.blocked)
+        info.content_version = hashlib.blake2b(repr(fields).encode(), digest_size=8).hexdigest()
+        return info
 
     @property
     def total_usage(self) -> int:
@@ -137,16 +169,16 @@ class Utils:
         return shlex.quote(value)
 
     @staticmethod
-    def generate_qrcode_base64(data: str) -> str:
-        if not data:
-            return None
-        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    def render_qrcode(data: str, fmt: str = 'png', box_size: int = 10) -> bytes:
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=4)
         qr.add_data(data)
         qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
         buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        return "data:image/png;base64," + base64.b64encode(buffered.getvalue()).decode()
+        if fmt == 'svg':
+            qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffered)
+        else:
+            qr.make_image(fill_color="black", back_color="white").save(buffered, format="PNG")
+        return buffered.getvalue()
 
     @staticmethod
     def human_readable_bytes(bytes_value: int) -> str:
@@ -171,96 +203,190 @@ class Utils:
             return False
 
 
-class HysteriaCLI:
-    def __init__(self, cli_path: str, users_json_path: str):
-        self.cli_path = cli_path
-        self.users_json_path = users_json_path
+class QRCodeCache:
+    """Bounded LRU of rendered QR images keyed by (payload, box size, format).
 
-    def _run_command(self, args: List[str]) -> str:
-        try:
-            command = ['python3', self.cli_path] + args
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            if process.returncode != 0:
-                if "User not found" in stderr:
-                    return None
-                else:
-                    print(f"Hysteria CLI error: {stderr}")
-                    raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
-            return stdout.strip()
-        except subprocess.CalledProcessError as e:
-            print(f"Hysteria CLI error: {e}")
-            raise
-
-    def get_user_details_from_json(self, username: str) -> Optional[Dict[str, Any]]:
-        try:
-            with open(self.users_json_path, 'r') as f:
-                users_data = json.load(f)
-            return users_data.get(username)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error reading user details from {self.users_json_path}: {e}")
-            return None
-        except Exception as e:
-            print(f"An unexpected error occurred while reading users file: {e}")
-            return None
-
-    def get_username_by_password(self, password_token: str) -> Optional[str]:
-        try:
-            with open(self.users_json_path, 'r') as f:
-                users_data = json.load(f)
-            for username, details in users_data.items():
-                if details.get('password') == password_token:
-                    return username
-            return None
-        except FileNotFoundError:
-            print(f"Error: Users file not found at {self.users_json_path}")
-            return None
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode JSON from {self.users_json_path}")
-            return None
-        except Exception as e:
-            print(f"An unexpected error occurred while reading users file: {e}")
-            return None
+    Images are grouped under their payload's digest, which is also what the
+    /{subpath}/qr/{token}/{digest}.{png,svg} endpoint is addressed by. Each group is
+    charged the length of its payload and images; the least recently used
+    groups are dropped once max_bytes is exceeded.
+    """
 
-    def get_user_info(self, username: str) -> Optional[UserInfo]:
-        raw_info_str = self._run_command(['get-user', '-u', username])
-        if raw_info_str is None:
-            return None
+    CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
 
-        user_details = self.get_user_details_from_json(username)
-        if not user_details or 'password' not in user_details:
-            print(f"Warning: Password for user '{username}' could not be fetched from {self.users_json_path}. Cannot create UserInfo.")
-            return None
+    def __init__(self, max_bytes: int, box_size: int = 10):
+        self.max_bytes = max_bytes
+        self.box_size = box_size
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # digest -> (payload, {(box_size, fmt): image})
+        self._entries: 'OrderedDict[str, Tuple[str, Dict[Tuple[int, str], bytes]]]' = OrderedDict()
 
+    @staticmethod
+    def digest(payload: str) -> str:
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def register(self, payload: str) -> str:
+        """Makes a payload servable by digest without rendering it yet"""
+        digest = self.digest(payload)
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+        else:
+            self._entries[digest] = (payload, {})
+            self._charge(len(payload))
+        return digest
+
+    def payload(self, digest: str) -> Optional[str]:
+        entry = self._entries.get(digest)
+        return entry[0] if entry else None
+
+    def lookup(self, payload: str, fmt: str = 'png', box_size: Optional[int] = None) -> Optional[bytes]:
+        """Returns the cached image; on a miss the caller renders it and hands it to store()"""
+        digest = self.register(payload)
+        image = self._entries[digest][1].get((box_size or self.box_size, fmt))
+        if image is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return image
+
+    def store(self, payload: str, image: bytes, fmt: str = 'png', box_size: Optional[int] = None) -> None:
+        digest = self.register(payload)
+        images = self._entries[digest][1]
+        key = (box_size or self.box_size, fmt)
+        if key not in images:
+            images[key] = image
+            self._charge(len(image))
+
+    def _charge(self, size: int) -> None:
+        self.current_bytes += size
+        # The entry just touched is the newest and is kept even if it alone exceeds the budget.
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            payload, images = self._entries.popitem(last=False)[1]
+            self.current_bytes -= len(payload) + sum(len(image) for image in images.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'bytes': self.current_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+class UserDirectory:
+    """Users indexed by subscription token, and the server settings their URIs are built from.
+
+    Both live in memory. refresh() checks the store's change token and the
+    stat of config.json, .configs.env, nodes.json and extra.json, and reads
+    again only what changed (when only traffic moved, just the users the
+    store's traffic_changes() reports); the server calls it from a worker
+    thread every refresh_interval seconds, so a request costs a dict lookup
+    plus string formatting and never touches the disk.
+
+    settings_version changes with any of those files; together with a user's
+    content_version it identifies everything a subscription response contains.
+    """
+
+    def __init__(self, extra_config_path: str, refresh_interval: float = 1.0):
+        self.extra_config_path = extra_config_path
+        self.settings_files = (CONFIG_FILE, CONFIG_ENV, NODES_JSON_PATH, Path(extra_config_path))
+        self.refresh_interval = refresh_interval
+        self.extra_uris: List[str] = []
+        self.settings_version = ''
+        self._by_token: Dict[str, UserInfo] = {}
+        # Every username the store returned, with its subscription token ('' when it has none).
+        self._tokens: Dict[str, str] = {}
+        self._store_token: Any = None
+        self._settings: Optional[Dict[str, Any]] = None
+        self._settings_stat: Optional[Tuple] = None
+        self._checked_at = float('-inf')
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        self._refresh_users(force)
+        self._refresh_settings(force)
+
+    def _refresh_users(self, force: bool) -> None:
         try:
-            raw_info = json.loads(raw_info_str)
-            return UserInfo(
-                username=username,
-                password=user_details['password'],
-                upload_bytes=raw_info.get('upload_bytes', 0),
-                download_bytes=raw_info.get('download_bytes', 0),
-                max_download_bytes=raw_info.get('max_download_bytes', 0),
-                account_creation_date=raw_info.get('account_creation_date', ''),
-                expiration_days=raw_info.get('expiration_days', 0),
-                blocked=user_details.get('blocked', False)
-            )
-        except json.JSONDecodeError as e:
-            print(f"JSONDecodeError: {e}, Raw output: {raw_info_str}")
-            return None
+            store = get_store()
+            token = store.change_token()
+            if not force and token is not None and token == self._store_token:
+                return
+            changes = store.traffic_changes(self._store_token) if not force and token is not None else None
+            if changes is not None and self._apply_traffic_changes(changes):
+                self._store_token = token
+                return
+            by_token, tokens = {}, {}
+            for username, user in store.items():
+                tokens[username] = user.get('password') or ''
+                if tokens[username]:
+                    by_token.setdefault(tokens[username], UserInfo.from_store(username, user))
+        except StoreError as e:
+            print(f"Error reading the user store, keeping the previous users: {e}")
+            return
+        self._by_token, self._tokens, self._store_token = by_token, tokens, token
+
+    def _apply_traffic_changes(self, changes: Dict[str, Dict[str, Any]]) -> bool:
+        """Replaces the touched users; False if one is new or changed its token, so a reload is needed."""
+        if any((user.get('password') or '') != self._tokens.get(username) for username, user in changes.items()):
+            return False
+        for username, user in changes.items():
+            info = self._by_token.get(self._tokens[username])
+            if info is not None and info.username == username:
+                self._by_token[info.password] = UserInfo.from_store(username, user)
+        return True
 
-    def get_all_uris(self, username: str) -> List[str]:
-        output = self._run_command(['show-user-uri', '-u', username, '-a'])
-        if not output:
+    def _settings_files_stat(self) -> Tuple:
+        stats = []
+        for path in self.settings_files:
+            try:
+                st = os.stat(path)
+                stats.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def _refresh_settings(self, force: bool) -> None:
+        stat = self._settings_files_stat()
+        if not force and stat == self._settings_stat:
+            return
+        try:
+            self._settings = load_uri_settings()
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"Error loading the Hysteria2 server settings: {e}")
+            self._settings = None
+        self.extra_uris = self._load_extra_configs()
+        self._settings_stat = stat
+        self.settings_version = hashlib.blake2b(repr(stat).encode(), digest_size=8).hexdigest()
+
+    def _load_extra_configs(self) -> List[str]:
+        if not os.path.exists(self.extra_config_path):
+            return []
+        try:
+            with open(self.extra_config_path, 'r') as f:
+                content = f.read()
+                if not content:
+                    return []
+                configs = json.loads(content)
+                if isinstance(configs, list):
+                    return [str(c['uri']) for c in configs if 'uri' in c]
+                return []
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Warning: Could not read or parse extra configs from {self.extra_config_path}: {e}")
             return []
-        return re.findall(r'hy2://.*', output)
 
-    def get_all_labeled_uris(self, username: str) -> List[Dict[str, str]]:
-        output = self._run_command(['show-user-uri', '-u', username, '-a'])
-        if not output:
+    def get_user_by_token(self, password_token: str) -> Optional[UserInfo]:
+        return self._by_token.get(password_token)
+
+    def get_all_labeled_uris(self, user_info: UserInfo) -> List[Dict[str, str]]:
+        if self._settings is None:
             return []
-        
-        matches = re.findall(r"^(.*?):\s*(hy2://.*)$", output, re.MULTILINE)
-        return [{'label': label.strip(), 'uri': uri} for label, uri in matches]
+        return [{'label': label, 'uri': uri}
+                for label, uri, _ in build_user_uris(user_info.username, user_info.password, self._settings, show_all=True)]
+
+    def get_all_uris(self, user_info: UserInfo) -> List[str]:
+        return [item['uri'] for item in self.get_all_labeled_uris(user_info)]
 
 
 class UriParser:
@@ -290,24 +416,118 @@ class UriParser:
 
 
 class SingboxConfigGenerator:
-    def __init__(self, hysteria_cli: HysteriaCLI, default_sni: str):
-        self.hysteria_cli = hysteria_cli
+    """Renders sing-box subscriptions from a template compiled once.
+
+    The template is serialized a single time with placeholders where the
+    per-user values go (the tag lists of the "select" and "auto" outbounds and
+    the hysteria2 outbounds themselves) and split into constant text
+    fragments, so a request only serializes its own outbounds. The output is
+    byte-for-byte what json.dumps(config, indent=4, sort_keys=True) gives for
+    the merged config. Rendered bodies are kept in a bounded LRU under the
+    caller's key and the effective SNI.
+    """
+
+    SELECT_SLOT = '__singbox_select_tags__'
+    AUTO_SLOT = '__singbox_auto_tags__'
+    OUTBOUNDS_SLOT = '__singbox_outbounds__'
+    _SLOT_PATTERN = re.compile(r'"(__singbox_(?:select_tags|auto_tags|outbounds)__)"')
+
+    def __init__(self, default_sni: str, cache_bytes: int = 32 * 1024 * 1024):
         self.default_sni = default_sni
-        self._template_cache = None
         self.template_path = None
+        self.cache_bytes = cache_bytes
+        self._compiled: Optional[List[Tuple[str, Optional[str], str]]] = None
+        self._cache: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+        self._cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
 
     def set_template_path(self, path: str):
         self.template_path = path
-        self._template_cache = None
+        self._compiled = None
+        self._cache.clear()
+        self._cached_bytes = 0
 
-    def get_template(self) -> Dict[str, Any]:
-        if self._template_cache is None:
-            try:
-                with open(self.template_path, 'r') as f:
-                    self._template_cache = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError, IOError) as e:
-                raise RuntimeError(f"Error loading Singbox template: {e}") from e
-        return self._template_cache.copy()
+    def _load_template(self) -> Dict[str, Any]:
+        try:
+            with open(self.template_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError) as e:
+            raise RuntimeError(f"Error loading Singbox template: {e}") from e
+
+    def _compile(self) -> List[Tuple[str, Optional[str], str]]:
+        """Splits the serialized template into (text, slot, indent) pieces; the last piece has no slot"""
+        template = copy.deepcopy(self._load_template())
+        outbounds = [out for out in template['outbounds'] if out.get('type') != 'hysteria2']
+        for outbound in outbounds:
+            if outbound.get('tag') == 'select':
+                outbound['outbounds'] = self.SELECT_SLOT
+            elif outbound.get('tag') == 'auto':
+                outbound['outbounds'] = self.AUTO_SLOT
+        template['outbounds'] = outbounds + [self.OUTBOUNDS_SLOT]
+        text = json.dumps(template, indent=4, sort_keys=True)
+
+        pieces, position = [], 0
+        for match in self._SLOT_PATTERN.finditer(text):
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line = text[line_start:match.start()]
+            indent = line[:len(line) - len(line.lstrip(' '))]
+            pieces.append((text[position:match.start()], match.group(1), indent))
+            position = match.end()
+        pieces.append((text[position:], None, ''))
+        return pieces
+
+    def get_cached(self, cache_key: Tuple, fragment: str) -> Optional[bytes]:
+        key = (cache_key, fragment or self.default_sni)
+        body = self._cache.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return body
+
+    def render(self, all_uris: List[str], username: str, fragment: str,
+               cache_key: Optional[Tuple] = None) -> Optional[bytes]:
+        """Returns the encoded config for the URIs, or None if none of them could be parsed"""
+        if self._compiled is None:
+            self._compiled = self._compile()
+
+        hysteria_outbounds = [outbound for outbound in
+                              (self.generate_config_from_uri(uri, username, fragment) for uri in all_uris) if outbound]
+        if not hysteria_outbounds:
+            return None
+        all_tags = [out['tag'] for out in hysteria_outbounds]
+
+        parts = []
+        for text, slot, indent in self._compiled:
+            parts.append(text)
+            if slot == self.SELECT_SLOT:
+                value = json.dumps(["auto"] + all_tags, indent=4)
+            elif slot == self.AUTO_SLOT:
+                value = json.dumps(all_tags, indent=4)
+            elif slot == self.OUTBOUNDS_SLOT:
+                value = ",\n".join(json.dumps(out, indent=4, sort_keys=True) for out in hysteria_outbounds)
+            else:
+                continue
+            parts.append(value.replace('\n', '\n' + indent))
+        body = ''.join(parts).encode()
+
+        if cache_key is not None:
+            self._store((cache_key, fragment or self.default_sni), body)
+        return body
+
+    def _store(self, key: Tuple, body: bytes) -> None:
+        if key in self._cache:
+            self._cached_bytes -= len(self._cache.pop(key))
+        self._cache[key] = body
+        self._cached_bytes += len(body)
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            self._cached_bytes -= len(self._cache.popitem(last=False)[1])
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._cache), 'bytes': self._cached_bytes,
+                'hits': self.hits, 'misses': self.misses}
 
     def generate_config_from_uri(self, uri: str, username: str, fragment: str) -> Optional[Dict[str, Any]]:
         if not uri:
@@ -350,61 +570,15 @@ class SingboxConfigGenerator:
             }
         }
 
-    def combine_configs(self, all_uris: List[str], username: str, fragment: str) -> Optional[Dict[str, Any]]:
-        if not all_uris:
-            return None
-        
-        combined_config = self.get_template()
-        combined_config['outbounds'] = [out for out in combined_config['outbounds'] if out.get('type') != 'hysteria2']
-
-        hysteria_outbounds = []
-        for uri in all_uris:
-            outbound = self.generate_config_from_uri(uri, username, fragment)
-            if outbound:
-                hysteria_outbounds.append(outbound)
-
-        if not hysteria_outbounds:
-            return None
-
-        all_tags = [out['tag'] for out in hysteria_outbounds]
-
-        for outbound in combined_config['outbounds']:
-            if outbound.get('tag') == 'select':
-                outbound['outbounds'] = ["auto"] + all_tags
-            elif outbound.get('tag') == 'auto':
-                outbound['outbounds'] = all_tags
-
-        combined_config['outbounds'].extend(hysteria_outbounds)
-        return combined_config
-
 
 class SubscriptionManager:
-    def __init__(self, hysteria_cli: HysteriaCLI, config: AppConfig):
-        self.hysteria_cli = hysteria_cli
+    def __init__(self, users: UserDirectory, config: AppConfig):
+        self.users = users
         self.config = config
 
-    def _get_extra_configs(self) -> List[str]:
-        if not os.path.exists(self.config.extra_config_path):
-            return []
-        try:
-            with open(self.config.extra_config_path, 'r') as f:
-                content = f.read()
-                if not content:
-                    return []
-                configs = json.loads(content)
-                if isinstance(configs, list):
-                    return [str(c['uri']) for c in configs if 'uri' in c]
-                return []
-        except (json.JSONDecodeError, IOError, KeyError) as e:
-            print(f"Warning: Could not read or parse extra configs from {self.config.extra_config_path}: {e}")
-            return []
-
-    def get_normal_subscription(self, username: str, user_agent: str) -> str:
-        user_info = self.hysteria_cli.get_user_info(username)
-        if user_info is None:
-            return "User not found"
-            
-        all_uris = self.hysteria_cli.get_all_uris(username)
+    def get_normal_subscription(self, user_info: UserInfo, user_agent: str) -> str:
+        username = user_info.username
+        all_uris = self.users.get_all_uris(user_info)
 
         processed_uris = []
         for uri in all_uris:
@@ -416,7 +590,7 @@ class SubscriptionManager:
                     uri = uri.replace(f'pinSHA256=sha256/{match.group(1)}', f'pinSHA256={formatted}')
             processed_uris.append(uri)
         
-        extra_uris = self._get_extra_configs()
+        extra_uris = self.users.extra_uris
         all_processed_uris = processed_uris + extra_uris
 
         if not all_processed_uris:
@@ -443,16 +617,30 @@ class TemplateRenderer:
 
 
 class HysteriaServer:
-    def __init__(self):
-        self.config = self._load_config()
-        self.rate_limiter = RateLimiter(self.config.rate_limit, self.config.rate_limit_window)
-        self.hysteria_cli = HysteriaCLI(self.config.hysteria_cli_path, self.config.users_json_path)
-        self.singbox_generator = SingboxConfigGenerator(self.hysteria_cli, self.config.sni)
+    def __init__(self, config: Optional[AppConfig] = None, limiters: Optional[Tuple[Any, Any]] = None):
+        self.config = config or self._load_config()
+        self.rate_limiter, self.token_limiter = limiters or self.create_rate_limiters(self.config)
+        self.users = UserDirectory(self.config.extra_config_path)
+        self.users.refresh(force=True)
+        self.singbox_generator = SingboxConfigGenerator(self.config.sni, self.config.singbox_cache_bytes)
         self.singbox_generator.set_template_path(self.config.singbox_template_path)
-        self.subscription_manager = SubscriptionManager(self.hysteria_cli, self.config)
+        self.subscription_manager = SubscriptionManager(self.users, self.config)
         self.template_renderer = TemplateRenderer(self.config.template_dir, self.config)
+        self.qr_cache = QRCodeCache(self.config.qr_cache_bytes)
+        self.compressed_bodies = CompressedBodyCache(
+            self.config.compression_cache_bytes, self.config.gzip_level, self.config.brotli_quality,
+            self.config.compress_min_bytes) if self.config.compression else None
+        self.etag_hits = 0
+        self.etag_misses = 0
+        # Disk reads and QR rendering run here so they never stall the event loop.
+        self.executor = ThreadPoolExecutor(max_workers=self.config.blocking_threads,
+                                           thread_name_prefix='normalsub')
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
         self.app = web.Application(middlewares=[
             self._invalid_endpoint_middleware,
+            self._concurrency_middleware,
             self._rate_limit_middleware,
             self._noindex_middleware
         ])
@@ -462,44 +650,84 @@ class HysteriaServer:
         base_path = f'/{safe_subpath}'
         self.app.router.add_get(f'{base_path}/sub/normal/{{password_token}}', self.handle)
         self.app.router.add_get(f'{base_path}/robots.txt', self.robots_handler)
+        if self.config.qr_endpoint:
+            self.app.router.add_get(f'{base_path}/qr/{{password_token:[a-zA-Z0-9]+}}/{{digest:[0-9a-f]{{32}}}}.{{fmt:png|svg}}',
+                                    self.handle_qr)
         self.app.router.add_route('*', f'{base_path}/{{tail:.*}}', self.handle_404_subpath)
+        self.app.on_startup.append(self._start_refresher)
+        self.app.on_cleanup.append(self._stop_refresher)
+        self.app.on_shutdown.append(self._log_stats)
 
-    def _load_config(self) -> AppConfig:
+    @staticmethod
+    def create_rate_limiters(config: AppConfig, shared: bool = False) -> Tuple[Any, Any]:
+        """Returns the (per address, per token) limiters; shared ones must be created before forking workers"""
+        limiter_class = SharedTokenBucketLimiter if shared else TokenBucketLimiter
+        rate_limiter = limiter_class(config.rate_limit, config.rate_limit_window, config.rate_limit_max_keys)
+        # Optional second limit per subscription token, whichever address the requests come from.
+        token_limiter = limiter_class(config.token_rate_limit, config.rate_limit_window,
+                                      config.rate_limit_max_keys) if config.token_rate_limit > 0 else None
+        return rate_limiter, token_limiter
+
+    @classmethod
+    def _load_config(cls) -> AppConfig:
         domain = os.getenv('HYSTERIA_DOMAIN', 'localhost')
         external_port = int(os.getenv('HYSTERIA_PORT', '443'))
         aiohttp_listen_address = os.getenv('AIOHTTP_LISTEN_ADDRESS', '127.0.0.1')
         aiohttp_listen_port = int(os.getenv('AIOHTTP_LISTEN_PORT', '33261'))
         
         subpath = os.getenv('SUBPATH', '').strip().strip("/")
-        if not subpath or not self.is_valid_subpath(subpath):
+        if not subpath or not cls.is_valid_subpath(subpath):
             raise ValueError(
                 f"Invalid or empty SUBPATH: '{subpath}'. Subpath must be non-empty and contain only alphanumeric characters.")
 
-        sni_file = '/etc/hysteria/.configs.env'
-        singbox_template_path = '/etc/hysteria/core/scripts/normalsub/singbox.json'
-        hysteria_cli_path = '/etc/hysteria/core/cli.py'
+        sni_file = str(CONFIG_ENV)
+        singbox_template_path = os.path.join(os.path.dirname(__file__), 'singbox.json')
         users_json_path = os.getenv('HYSTERIA_USERS_JSON_PATH', '/etc/hysteria/users.json')
-        nodes_json_path = '/etc/hysteria/nodes.json'
-        extra_config_path = '/etc/hysteria/extra.json'
+        nodes_json_path = str(NODES_JSON_PATH)
+        extra_config_path = str(EXTRA_CONFIG_PATH)
         rate_limit = 100
         rate_limit_window = 60
+        token_rate_limit = int(os.getenv('NORMALSUB_TOKEN_RATE_LIMIT', '0'))
+        rate_limit_max_keys = int(os.getenv('NORMALSUB_RATE_LIMIT_KEYS', str(DEFAULT_MAX_KEYS)))
+        trusted_proxies = parse_trusted_proxies(os.getenv('HYSTERIA_TRUSTED_PROXIES', DEFAULT_TRUSTED_PROXIES))
         template_dir = os.path.dirname(__file__)
-
-        sni = self._load_sni_from_env(sni_file)
+        qr_cache_bytes = int(os.getenv('NORMALSUB_QR_CACHE_MB', '16')) * 1024 * 1024
+        qr_endpoint = os.getenv('NORMALSUB_QR_ENDPOINT', 'true').strip().lower() in ('1', 'true', 'yes')
+        singbox_cache_bytes = int(os.getenv('NORMALSUB_SINGBOX_CACHE_MB', '32')) * 1024 * 1024
+        max_concurrent_requests = int(os.getenv('NORMALSUB_MAX_CONCURRENT', '256'))
+        request_timeout = float(os.getenv('NORMALSUB_REQUEST_TIMEOUT', '10'))
+        blocking_threads = int(os.getenv('NORMALSUB_BLOCKING_THREADS', '4'))
+        compression = os.getenv('NORMALSUB_COMPRESSION', 'true').strip().lower() in ('1', 'true', 'yes')
+        gzip_level = int(os.getenv('NORMALSUB_GZIP_LEVEL', '6'))
+        brotli_quality = int(os.getenv('NORMALSUB_BROTLI_QUALITY', '5'))
+        compress_min_bytes = int(os.getenv('NORMALSUB_COMPRESS_MIN_BYTES', '1024'))
+        compression_cache_bytes = int(os.getenv('NORMALSUB_COMPRESSION_CACHE_MB', '32')) * 1024 * 1024
+
+        sni = cls._load_sni_from_env(sni_file)
         return AppConfig(domain=domain, external_port=external_port,
                          aiohttp_listen_address=aiohttp_listen_address,
                          aiohttp_listen_port=aiohttp_listen_port,
                          sni_file=sni_file,
                          singbox_template_path=singbox_template_path,
-                         hysteria_cli_path=hysteria_cli_path,
                          users_json_path=users_json_path,
                          nodes_json_path=nodes_json_path,
                          extra_config_path=extra_config_path,
                          rate_limit=rate_limit, rate_limit_window=rate_limit_window,
+                         token_rate_limit=token_rate_limit, rate_limit_max_keys=rate_limit_max_keys,
+                         trusted_proxies=trusted_proxies,
                          sni=sni, template_dir=template_dir,
-                         subpath=subpath)
+                         subpath=subpath,
+                         qr_cache_bytes=qr_cache_bytes, qr_endpoint=qr_endpoint,
+                         singbox_cache_bytes=singbox_cache_bytes,
+                         max_concurrent_requests=max_concurrent_requests,
+                         request_timeout=request_timeout,
+                         blocking_threads=blocking_threads,
+                         compression=compression, gzip_level=gzip_level, brotli_quality=brotli_quality,
+                         compress_min_bytes=compress_min_bytes,
+                         compression_cache_bytes=compression_cache_bytes)
 
-    def _load_sni_from_env(self, sni_file: str) -> str:
+    @staticmethod
+    def _load_sni_from_env(sni_file: str) -> str:
         try:
             with open(sni_file, 'r') as f:
                 for line in f:
@@ -509,7 +737,8 @@ class HysteriaServer:
             print("Warning: SNI file not found. Using default SNI.")
         return "bts.com"
 
-    def is_valid_subpath(self, subpath: str) -> bool:
+    @staticmethod
+    def is_valid_subpath(subpath: str) -> bool:
         return bool(re.match(r"^[a-zA-Z0-9]+$", subpath))
 
     def validate_and_escape_subpath(self, subpath: str) -> str:
@@ -517,15 +746,35 @@ class HysteriaServer:
             raise ValueError(f"Invalid subpath: {subpath}")
         return re.escape(subpath)
 
+    @middleware
+    async def _concurrency_middleware(self, request: web.Request, handler):
+        # Shed load immediately rather than queueing without bound behind slow requests.
+        if self.in_flight >= self.config.max_concurrent_requests:
+            self.rejected += 1
+            return web.Response(status=503, text="Server busy, try again later.", headers={'Retry-After': '1'})
+        self.in_flight += 1
+        try:
+            return await asyncio.wait_for(handler(request), self.config.request_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return web.Response(status=503, text="Request timed out.", headers={'Retry-After': '1'})
+        finally:
+            self.in_flight -= 1
+
     @middleware
     async def _rate_limit_middleware(self, request: web.Request, handler):
-        client_ip_hdr = request.headers.get('X-Forwarded-For', request.headers.get('X-Real-IP'))
-        client_ip = client_ip_hdr.split(',')[0].strip() if client_ip_hdr else request.remote
-        
-        if client_ip and not self.rate_limiter.check_limit(client_ip):
-            return web.Response(status=429, text="Rate limit exceeded.")
+        forwarded_for = request.headers.get('X-Forwarded-For', request.headers.get('X-Real-IP'))
+        client_ip = client_address(request.remote, forwarded_for, self.config.trusted_proxies)
+
+        if client_ip and not self.rate_limiter.allow(client_ip):
+            return self._too_many_requests(self.rate_limiter, client_ip)
         return await handler(request)
 
+    @staticmethod
+    def _too_many_requests(limiter: TokenBucketLimiter, key: str) -> web.Response:
+        retry_after = max(1, round(limiter.retry_after(key)))
+        return web.Response(status=429, text="Rate limit exceeded.", headers={'Retry-After': str(retry_after)})
+
     @middleware
     async def _invalid_endpoint_middleware(self, request: web.Request, handler):
         expected_prefix = f'/{self.config.subpath}/'
@@ -549,43 +798,91 @@ class HysteriaServer:
                  return web.Response(status=400, text="Error: Missing 'password_token' parameter.")
             
             password_token = Utils.sanitize_input(password_token_raw, r'^[a-zA-Z0-9]+$')
+            if self.token_limiter is not None and not self.token_limiter.allow(password_token):
+                return self._too_many_requests(self.token_limiter, password_token)
 
-            username = self.hysteria_cli.get_username_by_password(password_token)
-            if username is None:
-                return web.Response(status=404, text="User not found for the provided token.")
-
-            user_info = self.hysteria_cli.get_user_info(username)
+            user_info = self.users.get_user_by_token(password_token)
             if user_info is None:
-                return web.Response(status=404, text=f"User '{username}' details not found.")
-
-            if user_info.blocked:
-                return await self._handle_blocked_user(request, user_info)
+                return web.Response(status=404, text="User not found for the provided token.")
+            username = user_info.username
 
             user_agent = request.headers.get('User-Agent', '').lower()
-            if any(browser in user_agent for browser in ['chrome', 'firefox', 'safari', 'edge', 'opera']):
-                return await self._handle_html(request, username, user_info)
             fragment = request.query.get('fragment', '')
-            if not user_agent.startswith('hiddifynext') and ('singbox' in user_agent or 'sing' in user_agent):
-                return await self._handle_singbox(username, fragment, user_info)
-            return await self._handle_normalsub(request, username, user_info)
+            etag = self._etag(user_info, user_agent, fragment)
+            if self._etag_matches(request, etag):
+                self.etag_hits += 1
+                response = web.Response(status=304, headers={'ETag': etag})
+                if self.compressed_bodies is not None:
+                    response.headers['Vary'] = 'Accept-Encoding'
+                return response
+            self.etag_misses += 1
+
+            if user_info.blocked:
+                response = await self._handle_blocked_user(request, user_info)
+            elif self._client_kind(user_agent) == 'html':
+                response = await self._handle_html(request, username, user_info)
+            elif self._client_kind(user_agent) == 'singbox':
+                response = await self._handle_singbox(username, fragment, user_info)
+            else:
+                response = await self._handle_normalsub(request, username, user_info)
+            if response.status == 200:
+                response.headers['ETag'] = etag
+                await self._compress(request, response)
+            return response
         except ValueError as e:
             return web.Response(status=400, text=f"Error: {e}")
         except Exception as e:
             print(f"Internal Server Error: {e}")
             return web.Response(status=500, text="Error: Internal server error")
 
+    @staticmethod
+    def _client_kind(user_agent: str) -> str:
+        if any(browser in user_agent for browser in ['chrome', 'firefox', 'safari', 'edge', 'opera']):
+            return 'html'
+        if not user_agent.startswith('hiddifynext') and ('singbox' in user_agent or 'sing' in user_agent):
+            return 'singbox'
+        return 'normal'
+
+    def _etag(self, user_info: UserInfo, user_agent: str, fragment: str) -> str:
+        """Strong ETag for everything the response depends on: user, server settings and response variant"""
+        kind = self._client_kind(user_agent)
+        if kind == 'singbox':
+            variant = f"singbox:{fragment}"
+        elif kind == 'normal':
+            variant = f"normal:{'v2ray' in user_agent and 'ng' in user_agent}"
+        else:
+            variant = kind
+        key = f"{user_info.content_version}:{self.users.settings_version}:{variant}"
+        return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+    @staticmethod
+    def _etag_matches(request: web.Request, etag: str) -> bool:
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+        candidates = (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+        return any(tag == etag or tag == '*' for tag in candidates)
+
+    def etag_stats(self) -> Dict[str, Any]:
+        total = self.etag_hits + self.etag_misses
+        return {'hits': self.etag_hits, 'misses': self.etag_misses,
+                'hit_rate': round(self.etag_hits / total, 4) if total else 0.0}
+
     async def _handle_blocked_user(self, request: web.Request, user_info: UserInfo) -> web.Response:
         fake_uri = "hysteria2://x@end.com:443?sni=support.me#⛔Account-Expired⚠️"
         user_agent = request.headers.get('User-Agent', '').lower()
 
-        if any(browser in user_agent for browser in ['chrome', 'firefox', 'safari', 'edge', 'opera']):
+        if self._client_kind(user_agent) == 'html':
             context = self._get_blocked_template_context(fake_uri, user_info)
             return web.Response(text=self.template_renderer.render(context), content_type='text/html')
 
         fragment = request.query.get('fragment', '')
-        if not user_agent.startswith('hiddifynext') and ('singbox' in user_agent or 'sing' in user_agent):
-            combined_config = self.singbox_generator.combine_configs([fake_uri], "blocked", fragment)
-            return web.Response(text=json.dumps(combined_config, indent=4, sort_keys=True), content_type='application/json')
+        if self._client_kind(user_agent) == 'singbox':
+            body = self.singbox_generator.get_cached(('blocked',), fragment)
+            if body is None:
+                body = self.singbox_generator.render([fake_uri], "blocked", fragment, ('blocked',))
+            return web.Response(body=body, content_type='application/json', charset='utf-8')
         
         return web.Response(text=fake_uri, content_type='text/plain')
 
@@ -613,29 +910,25 @@ class HysteriaServer:
         return web.Response(text=self.template_renderer.render(context), content_type='text/html')
 
     async def _handle_singbox(self, username: str, fragment: str, user_info: UserInfo) -> web.Response:
-        all_uris = self.hysteria_cli.get_all_uris(username)
-        if not all_uris:
+        # The config only depends on the credentials and the server settings, not on usage.
+        cache_key = (username, user_info.password, self.users.settings_version)
+        body = self.singbox_generator.get_cached(cache_key, fragment)
+        if body is None:
+            all_uris = self.users.get_all_uris(user_info)
+            body = self.singbox_generator.render(all_uris, username, fragment, cache_key) if all_uris else None
+        if body is None:
             return web.Response(status=404, text=f"Error: No valid URIs found for user {username}.")
-        combined_config = self.singbox_generator.combine_configs(all_uris, username, fragment)
-        return web.Response(text=json.dumps(combined_config, indent=4, sort_keys=True), content_type='application/json')
+        return web.Response(body=body, content_type='application/json', charset='utf-8')
 
     async def _handle_normalsub(self, request: web.Request, username: str, user_info: UserInfo) -> web.Response:
         user_agent = request.headers.get('User-Agent', '').lower()
-        subscription = self.subscription_manager.get_normal_subscription(username, user_agent)
-        if subscription == "User not found":
-            return web.Response(status=404, text=f"User '{username}' not found.")
+        subscription = self.subscription_manager.get_normal_subscription(user_info, user_agent)
         return web.Response(text=subscription, content_type='text/plain')
 
     async def _get_template_context(self, username: str, user_info: UserInfo) -> TemplateContext:
-        labeled_uris = self.hysteria_cli.get_all_labeled_uris(username)
-        port_str = f":{self.config.external_port}" if self.config.external_port not in [80, 443, 0] else ""
-        base_url = f"https://{self.config.domain}{port_str}"
-
-        if not Utils.is_valid_url(base_url):
-            print(f"Warning: Constructed base URL '{base_url}' might be invalid. Check domain and port config.")
-        
-        sub_link = f"{base_url}/{self.config.subpath}/sub/normal/{user_info.password}"
-        sublink_qrcode = Utils.generate_qrcode_base64(sub_link)
+        labeled_uris = self.users.get_all_labeled_uris(user_info)
+        sub_link = self._sub_link(user_info)
+        sublink_qrcode = await self._qrcode_src(sub_link, user_info)
         
         local_uris = []
         node_uris = []
@@ -644,7 +937,7 @@ class HysteriaServer:
             node_uri = NodeURI(
                 label=item['label'], 
                 uri=item['uri'], 
-                qrcode=Utils.generate_qrcode_base64(item['uri'])
+                qrcode=await self._qrcode_src(item['uri'], user_info)
             )
             if item['label'].startswith('Node:'):
                 node_uris.append(node_uri)
@@ -663,6 +956,101 @@ class HysteriaServer:
             node_uris=node_uris
         )
 
+    async def _compress(self, request: web.Request, response: web.Response) -> None:
+        """Swaps the body for a cached gzip/brotli copy when the client accepts one"""
+        if self.compressed_bodies is None:
+            return
+        response.headers['Vary'] = 'Accept-Encoding'
+        body = response.body
+        encoding = self.compressed_bodies.negotiate(request.headers.get('Accept-Encoding'), len(body))
+        if encoding is None:
+            return
+        key = self.compressed_bodies.key(body)
+        data = self.compressed_bodies.lookup(key, encoding)
+        if data is None:
+            data = self.compressed_bodies.store(
+                key, encoding, body, await self._run_blocking(self.compressed_bodies.compress, body, encoding))
+        if data:
+            response.body = data
+            response.headers['Content-Encoding'] = encoding
+
+    def _sub_link(self, user_info: UserInfo) -> str:
+        port_str = f":{self.config.external_port}" if self.config.external_port not in [80, 443, 0] else ""
+        base_url = f"https://{self.config.domain}{port_str}"
+
+        if not Utils.is_valid_url(base_url):
+            print(f"Warning: Constructed base URL '{base_url}' might be invalid. Check domain and port config.")
+
+        return f"{base_url}/{self.config.subpath}/sub/normal/{user_info.password}"
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _qrcode(self, payload: str, fmt: str = 'png') -> bytes:
+        image = self.qr_cache.lookup(payload, fmt)
+        if image is None:
+            image = await self._run_blocking(Utils.render_qrcode, payload, fmt, self.qr_cache.box_size)
+            self.qr_cache.store(payload, image, fmt)
+        return image
+
+    async def _qrcode_src(self, payload: str, user_info: UserInfo) -> Optional[str]:
+        """Image URL for a QR code, or an inline data URI when the QR endpoint is disabled"""
+        if not payload:
+            return None
+        if not self.config.qr_endpoint:
+            return "data:image/png;base64," + base64.b64encode(await self._qrcode(payload)).decode()
+        return f"/{self.config.subpath}/qr/{user_info.password}/{self.qr_cache.register(payload)}.png"
+
+    def _register_user_qr_payloads(self, password_token: str) -> None:
+        # The page may have been rendered by another worker (or before a restart),
+        # so rebuild the payloads of the user the URL belongs to.
+        user_info = self.users.get_user_by_token(password_token)
+        if user_info is None or user_info.blocked:
+            return
+        self.qr_cache.register(self._sub_link(user_info))
+        for item in self.users.get_all_labeled_uris(user_info):
+            self.qr_cache.register(item['uri'])
+
+    async def handle_qr(self, request: web.Request) -> web.Response:
+        digest = request.match_info['digest']
+        payload = self.qr_cache.payload(digest)
+        if payload is None:
+            self._register_user_qr_payloads(request.match_info['password_token'])
+            payload = self.qr_cache.payload(digest)
+        if payload is None:
+            return web.Response(status=404, text="QR code not found.")
+        fmt = request.match_info['fmt']
+        return web.Response(
+            body=await self._qrcode(payload, fmt),
+            content_type=QRCodeCache.CONTENT_TYPES[fmt],
+            headers={'Cache-Control': 'private, max-age=31536000, immutable'}
+        )
+
+    async def _refresh_users(self) -> None:
+        while True:
+            await asyncio.sleep(self.users.refresh_interval)
+            try:
+                await self._run_blocking(self.users.refresh)
+            except Exception as e:
+                print(f"Warning: user directory refresh failed: {e}")
+
+    async def _start_refresher(self, app: web.Application) -> None:
+        app['refresher'] = asyncio.create_task(self._refresh_users())
+
+    async def _stop_refresher(self, app: web.Application) -> None:
+        app['refresher'].cancel()
+        try:
+            await app['refresher']
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=False)
+
+    async def _log_stats(self, app: web.Application) -> None:
+        print(f"Conditional GET: {self.etag_stats()}, QR cache: {self.qr_cache.stats()}, "
+              f"sing-box cache: {self.singbox_generator.stats()}, rate limiter: {self.rate_limiter.stats()}, "
+              f"compression: {self.compressed_bodies.stats() if self.compressed_bodies else 'off'}, "
+              f"rejected: {self.rejected}, timed out: {self.timed_out}")
+
     async def robots_handler(self, request: web.Request) -> web.Response:
         return web.Response(text="User-agent: *\nDisallow: /", content_type="text/plain")
 
@@ -670,15 +1058,105 @@ class HysteriaServer:
         print(f"404 Not Found (within subpath, unhandled by specific routes): {request.path}")
         return web.Response(status=404, text="Not Found within Subpath")
 
-    def run(self):
+    def run(self, reuse_port: bool = False):
         print(f"Starting Hysteria Normalsub server on {self.config.aiohttp_listen_address}:{self.config.aiohttp_listen_port}")
         print(f"External access via Caddy should be at https://{self.config.domain}:{self.config.external_port}/{self.config.subpath}/sub/normal/<USER_PASSWORD>")
         web.run_app(
             self.app,
             host=self.config.aiohttp_listen_address,
-            port=self.config.aiohttp_listen_port
+            port=self.config.aiohttp_listen_port,
+            reuse_port=reuse_port
         )
 
+
+class WorkerSupervisor:
+    """Forks HysteriaServer workers that share the listen port through SO_REUSEPORT.
+
+    Each worker opens the store itself and keeps its own read-only user
+    directory and caches (QR image URLs carry the user's token, so any
+    worker can serve them). The rate limiters are created here, before the
+    fork, in shared memory, so a client's limit holds whichever worker its
+    connections land on. A worker that exits while the supervisor is still
+    running is restarted, with a growing delay if it keeps crashing.
+    """
+
+    MIN_BACKOFF = 0.5
+    MAX_BACKOFF = 30.0
+    # A worker that stayed up this long is considered healthy again.
+    STABLE_AFTER = 10.0
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.config = HysteriaServer._load_config()
+        self.limiters = HysteriaServer.create_rate_limiters(self.config, shared=True)
+        self.children: Dict[int, int] = {}
+        self.started_at: Dict[int, float] = {}
+        self.backoff: Dict[int, float] = {}
+        self.stopping = False
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                HysteriaServer(self.config, self.limiters).run(reuse_port=True)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = index
+        self.started_at[index] = time.monotonic()
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _restart_delay(self, index: int) -> float:
+        if time.monotonic() - self.started_at[index] >= self.STABLE_AFTER:
+            self.backoff[index] = self.MIN_BACKOFF
+        else:
+            self.backoff[index] = min(self.MAX_BACKOFF, self.backoff.get(index, self.MIN_BACKOFF / 2) * 2)
+        return self.backoff[index]
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index)
+        print(f"Supervisor {os.getpid()} started {self.workers} workers: {sorted(self.children)}")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            delay = self._restart_delay(index)
+            print(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; "
+                  f"restarting in {delay:.1f}s")
+            time.sleep(delay)
+            if not self.stopping:
+                self._spawn(index)
+        return 0
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hysteria2 Normal-SUB subscription server')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('NORMALSUB_WORKERS', '1')),
+                        help='Worker processes sharing the listen port (default: NORMALSUB_WORKERS or 1)')
+    args = parser.parse_args()
+    if args.workers > 1:
+        sys.exit(WorkerSupervisor(args.workers).run())
     server = HysteriaServer()
     server.run()
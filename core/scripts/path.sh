@@ -1,5 +1,6 @@
 CLI_PATH="/etc/hysteria/core/cli.py"
 USERS_FILE="/etc/hysteria/users.json"
+USERS_DB="/etc/hysteria/users.db"
 TRAFFIC_FILE="/etc/hysteria/traffic_data.json"
 CONFIG_FILE="/etc/hysteria/config.json"
 CONFIG_ENV="/etc/hysteria/.configs.env"
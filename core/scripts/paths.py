@@ -1,14 +1,19 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path("/etc/hysteria")
 
 CLI_PATH = BASE_DIR / "core/cli.py"
 USERS_FILE = BASE_DIR / "users.json"
+USERS_DB = BASE_DIR / "users.db"
+TRAFFIC_HISTORY_DB = BASE_DIR / "traffic_history.db"
+AUTH_SNAPSHOT = BASE_DIR / "auth.snapshot"
 TRAFFIC_FILE = BASE_DIR / "traffic_data.json"
-CONFIG_FILE = BASE_DIR / "config.json"
-CONFIG_ENV = BASE_DIR / ".configs.env"
-NODES_JSON_PATH = BASE_DIR / "nodes.json"
-EXTRA_CONFIG_PATH = BASE_DIR / "extra.json"
+# Server settings files; the overrides let tools run against a copy (core/benchmarks).
+CONFIG_FILE = Path(os.getenv("HYSTERIA_CONFIG_PATH", BASE_DIR / "config.json"))
+CONFIG_ENV = Path(os.getenv("HYSTERIA_CONFIG_ENV_PATH", BASE_DIR / ".configs.env"))
+NODES_JSON_PATH = Path(os.getenv("HYSTERIA_NODES_JSON_PATH", BASE_DIR / "nodes.json"))
+EXTRA_CONFIG_PATH = Path(os.getenv("HYSTERIA_EXTRA_CONFIG_PATH", BASE_DIR / "extra.json"))
 TELEGRAM_ENV = BASE_DIR / "core/scripts/telegrambot/.env"
 SINGBOX_ENV = BASE_DIR / "core/scripts/singbox/.env"
 NORMALSUB_ENV = BASE_DIR / "core/scripts/normalsub/.env"
@@ -0,0 +1,184 @@
+"""Packed quota and expiry evaluation shared by traffic.py and hysteria2/kick.py.
+
+Limits are parsed once per user into parallel arrays (array module, viewed
+through NumPy when it is installed), so finding every user to block is a
+single pass over machine integers instead of one datetime parse per user.
+Long-running callers go further with due_changes(): expiries come off a
+min-heap and quotas are only compared for users whose counters moved.
+"""
+
+import sys
+import heapq
+import datetime
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KICK_BATCH_SIZE = 50
+# Stored for users that can never be blocked (already blocked, no limit, no creation date).
+NEVER_BYTES = sys.maxsize
+NEVER_TIME = float('inf')
+
+
+def expiry_timestamp(user_data):
+    """Returns the epoch second at which the account expires, or None if it cannot expire"""
+    expiration_days = user_data.get('expiration_days', 0) or 0
+    account_creation_date = user_data.get('account_creation_date')
+    if not account_creation_date or expiration_days <= 0:
+        return None
+    try:
+        creation_date = datetime.datetime.fromisoformat(account_creation_date.replace('Z', '+00:00'))
+        return (creation_date + datetime.timedelta(days=expiration_days)).timestamp()
+    except Exception:
+        return None
+
+
+def user_limits(user_data):
+    """Returns the (byte limit, expiry epoch) pair the evaluator compares against"""
+    if user_data.get('blocked', False):
+        return NEVER_BYTES, NEVER_TIME
+
+    # Historical rule: only users with both a traffic limit and an expiry are enforced.
+    max_download_bytes = user_data.get('max_download_bytes', 0) or 0
+    expires_at = expiry_timestamp(user_data)
+    if max_download_bytes <= 0 or expires_at is None:
+        return NEVER_BYTES, NEVER_TIME
+    return max_download_bytes, expires_at
+
+
+def user_usage(user_data):
+    return (user_data.get('upload_bytes', 0) or 0) + (user_data.get('download_bytes', 0) or 0)
+
+
+def batches(usernames, size=KICK_BATCH_SIZE):
+    """Splits a kick list into the batch size the Hysteria2 API is called with"""
+    for i in range(0, len(usernames), size):
+        yield usernames[i:i + size]
+
+
+class QuotaTable:
+    """Per-user byte limits, usage and expiry epochs in packed arrays.
+
+    Rows are appended as users appear and never move, so callers can keep
+    the table across traffic ticks and update usage in place; a removed
+    user's row is disarmed rather than deleted.
+
+    Alongside the arrays the table keeps a min-heap of (expiry, row) and
+    the set of rows whose usage or limits changed since the last
+    due_changes() call. Heap entries are invalidated lazily: an entry only
+    counts while it still matches the row's current expiry.
+    """
+
+    def __init__(self):
+        self.usernames = []
+        self.index = {}
+        self.used = array('q')
+        self.limit = array('q')
+        self.expires = array('d')
+        self._expiry_heap = []
+        self._changed = set()
+
+    @classmethod
+    def from_users(cls, users_data):
+        table = cls()
+        for username, user_data in users_data.items():
+            table.set_user(username, user_data)
+        return table
+
+    def __len__(self):
+        return len(self.usernames)
+
+    def set_user(self, username, user_data):
+        """Adds a user or refreshes their limits and usage from a store entry"""
+        limit, expires_at = user_limits(user_data)
+        used = user_usage(user_data)
+        row = self.index.get(username)
+        if row is None:
+            self.index[username] = len(self.usernames)
+            self.usernames.append(username)
+            self.used.append(used)
+            self.limit.append(limit)
+            self.expires.append(expires_at)
+            row = self.index[username]
+        else:
+            if (self.used[row], self.limit[row], self.expires[row]) == (used, limit, expires_at):
+                return
+            self.used[row] = used
+            self.limit[row] = limit
+            self.expires[row] = expires_at
+        self._changed.add(row)
+        if expires_at != NEVER_TIME:
+            self._push_expiry(expires_at, row)
+
+    def _push_expiry(self, expires_at, row):
+        heapq.heappush(self._expiry_heap, (expires_at, row))
+        # Stale entries pile up as users are edited; rebuild once they dominate.
+        if len(self._expiry_heap) > 2 * len(self.usernames) + 64:
+            self._expiry_heap = [(expires_at, row) for row, expires_at in enumerate(self.expires)
+                                 if expires_at != NEVER_TIME]
+            heapq.heapify(self._expiry_heap)
+
+    def remove(self, username):
+        row = self.index.get(username)
+        if row is not None:
+            self.limit[row] = NEVER_BYTES
+            self.expires[row] = NEVER_TIME
+            self._changed.discard(row)
+
+    def add_usage(self, traffic):
+        """Adds (upload, download) deltas; unknown identities are ignored since they have no limits"""
+        index, used, changed = self.index, self.used, self._changed
+        for username, (upload, download) in traffic.items():
+            row = index.get(username)
+            if row is not None and (upload or download):
+                used[row] += upload + download
+                changed.add(row)
+
+    def mark_blocked(self, usernames):
+        for username in usernames:
+            self.remove(username)
+
+    def due(self, now=None):
+        """Returns every user over their limit or past expiry, in table order"""
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        if not self.usernames:
+            return []
+
+        if np is not None:
+            used = np.frombuffer(self.used, dtype=np.int64)
+            limit = np.frombuffer(self.limit, dtype=np.int64)
+            expires = np.frombuffer(self.expires, dtype=np.float64)
+            rows = np.flatnonzero((used >= limit) | (expires <= now)).tolist()
+            del used, limit, expires  # release the buffer views so the arrays can grow again
+            return [self.usernames[row] for row in rows]
+
+        return [username for username, used, limit, expires
+                in zip(self.usernames, self.used, self.limit, self.expires)
+                if used >= limit or expires <= now]
+
+    def due_batches(self, now=None, size=KICK_BATCH_SIZE):
+        return list(batches(self.due(now), size))
+
+    def due_changes(self, now=None):
+        """Returns users that expired or went over quota since the previous call.
+
+        Only heap entries up to ``now`` are popped and only the rows touched
+        by add_usage() or set_user() are compared against their limits, so
+        a tick costs O(k log n) for k due users instead of O(n).
+        """
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        rows = set()
+
+        heap, expires = self._expiry_heap, self.expires
+        while heap and heap[0][0] <= now:
+            expires_at, row = heapq.heappop(heap)
+            if expires[row] == expires_at:
+                rows.add(row)
+
+        used, limit = self.used, self.limit
+        rows.update(row for row in self._changed if used[row] >= limit[row])
+        self._changed.clear()
+        return [self.usernames[row] for row in sorted(rows)]
@@ -0,0 +1,205 @@
+"""Token-bucket rate limiting shared by the subscription servers (normalsub and singbox).
+
+Buckets live in a fixed-capacity LRU, so memory stays flat however many
+distinct clients show up; a key that was evicted simply starts over with a
+full bucket. The same limiter works for client addresses and for
+subscription tokens. SharedTokenBucketLimiter keeps the buckets in shared
+memory for servers that fork several workers.
+"""
+
+import mmap
+import time
+import hashlib
+import ipaddress
+import multiprocessing
+from collections import OrderedDict
+
+DEFAULT_MAX_KEYS = 65536
+# Peers whose X-Forwarded-For is believed: the local reverse proxy (Caddy).
+DEFAULT_TRUSTED_PROXIES = '127.0.0.0/8,::1/128'
+
+
+class TokenBucketLimiter:
+    """Allows bursts of ``limit`` requests per key, refilled at limit/window tokens per second.
+
+    Each bucket is a [tokens, updated_at] pair refilled lazily when its key
+    is seen again; the least recently seen key is dropped once more than
+    ``max_keys`` are tracked.
+    """
+
+    def __init__(self, limit, window, max_keys=DEFAULT_MAX_KEYS, clock=time.monotonic):
+        if limit <= 0 or window <= 0:
+            raise ValueError("limit and window must be positive")
+        self.limit = float(limit)
+        self.rate = limit / window
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key, cost=1.0):
+        """Takes ``cost`` tokens from the key's bucket; returns False if it does not hold that many"""
+        now = self.clock()
+        buckets = self._buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [self.limit, now]
+            if len(buckets) > self.max_keys:
+                buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            buckets.move_to_end(key)
+            bucket[0] = min(self.limit, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return True
+        self.limited += 1
+        return False
+
+    def retry_after(self, key, cost=1.0):
+        """Seconds until the key's bucket holds ``cost`` tokens again"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.limit, bucket[0] + (self.clock() - bucket[1]) * self.rate)
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def stats(self):
+        return {'keys': len(self._buckets), 'allowed': self.allowed,
+                'limited': self.limited, 'evicted': self.evicted}
+
+
+class SharedTokenBucketLimiter:
+    """TokenBucketLimiter whose buckets are shared by processes forked after it was created.
+
+    The buckets sit in an anonymous shared mapping laid out as a
+    set-associative table: a key hashes to one set of ``WAYS`` slots, and a
+    new key takes an empty slot or else the least recently seen one in its
+    set. Memory is fixed at creation. Each set is guarded by one of a few
+    process-shared locks. The counters in stats() only cover the calling
+    process.
+    """
+
+    WAYS = 8
+    # Words per slot: key hash (0 marks an empty slot), tokens, updated_at.
+    _SLOT_WORDS = 3
+
+    def __init__(self, limit, window, max_keys=DEFAULT_MAX_KEYS, clock=time.monotonic, lock_count=16):
+        if limit <= 0 or window <= 0:
+            raise ValueError("limit and window must be positive")
+        self.limit = float(limit)
+        self.rate = limit / window
+        self.sets = max(1, -(-max_keys // self.WAYS))
+        self.max_keys = self.sets * self.WAYS
+        self.clock = clock
+        self._map = mmap.mmap(-1, self.max_keys * self._SLOT_WORDS * 8)
+        self._hashes = memoryview(self._map).cast('Q')
+        self._values = memoryview(self._map).cast('d')
+        self._locks = [multiprocessing.Lock() for _ in range(lock_count)]
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return sum(1 for word in self._hashes[::self._SLOT_WORDS] if word)
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def _find(self, key_hash, first):
+        """Returns (slot, victim): the key's slot if present, otherwise the slot to reuse for it"""
+        hashes, values = self._hashes, self._values
+        victim, oldest = first, float('inf')
+        for slot in range(first, first + self.WAYS):
+            word = slot * self._SLOT_WORDS
+            stored = hashes[word]
+            if stored == key_hash:
+                return slot, None
+            if stored == 0:
+                if oldest >= 0:
+                    victim, oldest = slot, -1.0
+            elif values[word + 2] < oldest:
+                victim, oldest = slot, values[word + 2]
+        return None, victim
+
+    def allow(self, key, cost=1.0):
+        """Takes ``cost`` tokens from the key's bucket; returns False if it does not hold that many"""
+        key_hash = self._hash(key)
+        set_index = key_hash % self.sets
+        hashes, values = self._hashes, self._values
+        with self._locks[set_index % len(self._locks)]:
+            now = self.clock()
+            slot, victim = self._find(key_hash, set_index * self.WAYS)
+            if slot is None:
+                word = victim * self._SLOT_WORDS
+                if hashes[word]:
+                    self.evicted += 1
+                hashes[word] = key_hash
+                tokens = self.limit
+            else:
+                word = slot * self._SLOT_WORDS
+                tokens = min(self.limit, values[word + 1] + (now - values[word + 2]) * self.rate)
+            allowed = tokens >= cost
+            values[word + 1] = tokens - cost if allowed else tokens
+            values[word + 2] = now
+
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return allowed
+
+    def retry_after(self, key, cost=1.0):
+        """Seconds until the key's bucket holds ``cost`` tokens again"""
+        key_hash = self._hash(key)
+        set_index = key_hash % self.sets
+        with self._locks[set_index % len(self._locks)]:
+            slot, _ = self._find(key_hash, set_index * self.WAYS)
+            if slot is None:
+                return 0.0
+            word = slot * self._SLOT_WORDS
+            tokens = min(self.limit, self._values[word + 1] + (self.clock() - self._values[word + 2]) * self.rate)
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def stats(self):
+        return {'keys': len(self), 'allowed': self.allowed,
+                'limited': self.limited, 'evicted': self.evicted}
+
+
+def parse_trusted_proxies(value=DEFAULT_TRUSTED_PROXIES):
+    """Parses a comma-separated list of addresses or CIDR networks"""
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in value.split(',') if item.strip())
+
+
+def _is_trusted(address, trusted_proxies):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_address(remote, forwarded_for, trusted_proxies):
+    """Returns the address a request should be limited by.
+
+    X-Forwarded-For is only believed when the peer itself is a trusted proxy,
+    and then only from the right: the right-most hop that is not a trusted
+    proxy is the client, anything left of it was supplied by that client.
+    """
+    if not remote or not forwarded_for or not _is_trusted(remote, trusted_proxies):
+        return remote
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else remote
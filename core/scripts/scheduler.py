@@ -10,8 +10,11 @@ import datetime
 from pathlib import Path
 from paths import *
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from traffic import TrafficCollector, compact_traffic_journal  # noqa: E402
+
 logging.basicConfig(
-    level=logging.WARNING,
+    level=os.getenv("HYSTERIA_SCHEDULER_LOG_LEVEL", "WARNING").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler("/var/log/hysteria_scheduler.log"),
@@ -25,6 +28,11 @@ BASE_DIR = Path("/etc/hysteria")
 VENV_ACTIVATE = BASE_DIR / "hysteria2_venv/bin/activate"
 # CLI_PATH = BASE_DIR / "core/cli.py"
 LOCK_FILE = "/tmp/hysteria_scheduler.lock"
+TRAFFIC_COMPACT_MINUTES = int(os.getenv("HYSTERIA_TRAFFIC_COMPACT_MINUTES", "10"))
+# Seconds between traffic polls; the collector keeps its state in memory, so sub-minute polling is cheap.
+TRAFFIC_INTERVAL_SECONDS = max(1, int(os.getenv("HYSTERIA_TRAFFIC_INTERVAL", "15")))
+
+collector = None
 
 def acquire_lock():
     try:
@@ -66,16 +74,28 @@ def run_command(command, log_success=False):
         return False
 
 def check_traffic_status():
-    lock_fd = acquire_lock()
-    if not lock_fd:
+    global collector
+    try:
+        if collector is None:
+            collector = TrafficCollector()
+        stats = collector.tick()
+    except Exception as e:
+        logger.error(f"Traffic tick failed: {e}")
         return
-        
+
+    message = ("Traffic tick: fetch {fetch_ms}ms, apply {apply_ms}ms, history {history_ms}ms, enforce {enforce_ms}ms, "
+               "total {total_ms}ms ({users} users, {active} active, {online} online, {blocked} blocked)").format(**stats)
+    if stats["total_ms"] >= TRAFFIC_INTERVAL_SECONDS * 1000:
+        logger.warning(f"{message} exceeded the {TRAFFIC_INTERVAL_SECONDS}s interval")
+    else:
+        logger.info(message)
+
+def compact_traffic():
     try:
-        success = run_command(f"python3 {CLI_PATH} traffic-status --no-gui", log_success=False)
-        if not success:
-            pass
-    finally:
-        release_lock(lock_fd)
+        folded = compact_traffic_journal()
+        logger.info(f"Compacted {folded} traffic journal records")
+    except Exception:
+        logger.exception("Traffic journal compaction failed")
 
 def backup_hysteria():
     lock_fd = acquire_lock()
@@ -91,7 +111,8 @@ def backup_hysteria():
 def main():
     logger.info("Starting Hysteria Scheduler")
     
-    schedule.every(1).minutes.do(check_traffic_status)
+    schedule.every(TRAFFIC_INTERVAL_SECONDS).seconds.do(check_traffic_status)
+    schedule.every(TRAFFIC_COMPACT_MINUTES).minutes.do(compact_traffic)
     schedule.every(6).hours.do(backup_hysteria)
     
     backup_hysteria()
@@ -0,0 +1,408 @@
+"""Server status sampling shared by the webpanel dashboard and hysteria2/server_info.py.
+
+ServerStatusSampler reads /proc on a fixed interval in a background thread
+and keeps the samples in a ring buffer. CPU usage and network speeds are
+deltas between consecutive samples, so a caller never has to sleep to get
+them, and the online-user count and user-traffic totals are refreshed on
+their own, slower schedules. latest() returns the newest snapshot at once.
+
+The thread only samples while someone holds it with acquire() (the
+webpanel's live dashboard stream); otherwise it idles and latest() samples
+on demand when the newest snapshot is too old.
+"""
+
+import sys
+import json
+import time
+import threading
+from collections import deque
+from typing import NamedTuple
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_HISTORY = 900
+DEFAULT_ONLINE_INTERVAL = 10.0
+# The totals are re-read sooner when the user store reports a change.
+DEFAULT_TRAFFIC_INTERVAL = 60.0
+
+
+# region Parsing
+
+def parse_cpu_stats(content: str) -> tuple[int, int]:
+    """Returns (idle, total) jiffies from the aggregate line of /proc/stat"""
+    if not content:
+        return 0, 0
+    line = content.split('\n')[0]
+    fields = list(map(int, line.strip().split()[1:]))
+    idle, total = fields[3], sum(fields)
+    return idle, total
+
+
+def parse_meminfo(content: str) -> tuple[int, int]:
+    """Returns (total, used) memory in MB from /proc/meminfo"""
+    if not content:
+        return 0, 0
+
+    mem_info = {}
+    for line in content.split('\n'):
+        if ':' in line:
+            parts = line.split()
+            if len(parts) >= 2:
+                key = parts[0].rstrip(':')
+                if parts[1].isdigit():
+                    mem_info[key] = int(parts[1])
+
+    mem_total_kb = mem_info.get("MemTotal", 0)
+    mem_free_kb = mem_info.get("MemFree", 0)
+    buffers_kb = mem_info.get("Buffers", 0)
+    cached_kb = mem_info.get("Cached", 0)
+    sreclaimable_kb = mem_info.get("SReclaimable", 0)
+
+    used_kb = mem_total_kb - mem_free_kb - buffers_kb - cached_kb - sreclaimable_kb
+
+    used_kb = max(0, used_kb)
+    return mem_total_kb // 1024, used_kb // 1024
+
+
+def parse_network_stats(content: str) -> tuple[int, int]:
+    """Returns (rx, tx) bytes of every interface except lo from /proc/net/dev"""
+    if not content:
+        return 0, 0
+
+    rx_bytes, tx_bytes = 0, 0
+    lines = content.split('\n')
+
+    for line in lines[2:]:
+        if not line.strip():
+            continue
+        parts = line.split()
+        if len(parts) < 10:
+            continue
+        iface = parts[0].strip().replace(':', '')
+        if iface == 'lo':
+            continue
+        try:
+            rx_bytes += int(parts[1])
+            tx_bytes += int(parts[9])
+        except (IndexError, ValueError):
+            continue
+
+    return rx_bytes, tx_bytes
+
+
+def parse_connection_counts(tcp_content: str, udp_content: str) -> tuple[int, int]:
+    tcp_count = len(tcp_content.split('\n')) - 2 if tcp_content else 0
+    udp_count = len(udp_content.split('\n')) - 2 if udp_content else 0
+    return max(0, tcp_count), max(0, udp_count)
+
+# endregion
+
+# region Formatting
+
+def convert_bytes(bytes_val: int) -> str:
+    if bytes_val >= (1 << 40):
+        return f"{bytes_val / (1 << 40):.2f} TB"
+    elif bytes_val >= (1 << 30):
+        return f"{bytes_val / (1 << 30):.2f} GB"
+    elif bytes_val >= (1 << 20):
+        return f"{bytes_val / (1 << 20):.2f} MB"
+    elif bytes_val >= (1 << 10):
+        return f"{bytes_val / (1 << 10):.2f} KB"
+    return f"{bytes_val} B"
+
+
+def convert_speed(bytes_per_second: int) -> str:
+    if bytes_per_second >= (1 << 40):
+        return f"{bytes_per_second / (1 << 40):.2f} TB/s"
+    elif bytes_per_second >= (1 << 30):
+        return f"{bytes_per_second / (1 << 30):.2f} GB/s"
+    elif bytes_per_second >= (1 << 20):
+        return f"{bytes_per_second / (1 << 20):.2f} MB/s"
+    elif bytes_per_second >= (1 << 10):
+        return f"{bytes_per_second / (1 << 10):.2f} KB/s"
+    return f"{int(bytes_per_second)} B/s"
+
+
+def format_uptime(seconds: float) -> str:
+    seconds = int(seconds)
+    days, remainder = divmod(seconds, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{days}d {hours}h {minutes}m"
+
+# endregion
+
+
+class StatusSample(NamedTuple):
+    timestamp: float
+    uptime_seconds: float
+    cpu_percent: float
+    mem_total_mb: int
+    mem_used_mb: int
+    rx_bytes: int
+    tx_bytes: int
+    download_bytes_per_sec: int
+    upload_bytes_per_sec: int
+    tcp_connections: int
+    udp_connections: int
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _count_entries(path):
+    """Counts the socket entries of a /proc/net table without decoding it"""
+    try:
+        with open(path, 'rb') as f:
+            lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(65536), b''))
+    except OSError:
+        return 0
+    return max(0, lines - 1)
+
+
+def hysteria_online_counter(config_file, api_base_url):
+    """Returns a callable counting the connections the Hysteria2 traffic API reports online.
+
+    The secret is read on first use (and again after a failure), so the
+    counter can be created before Hysteria2 is installed.
+    """
+    client = None
+
+    def count():
+        nonlocal client
+        if client is None:
+            from hysteria2_api import Hysteria2Client
+            with open(config_file) as f:
+                secret = json.load(f).get('trafficStats', {}).get('secret')
+            if not secret:
+                raise ValueError(f'trafficStats.secret not found in {config_file}')
+            client = Hysteria2Client(base_url=api_base_url, secret=secret)
+        try:
+            online = client.get_online_clients()
+        except Exception:
+            client = None
+            raise
+        return sum(user.connections for user in online.values() if user.is_online)
+    return count
+
+
+class ServerStatusSampler:
+    """Samples /proc every ``interval`` seconds into a ring buffer of ``history`` samples.
+
+    ``store`` is a storage.UserStore whose traffic totals are reported; they
+    are re-read when its change_token() moves and at least every
+    ``traffic_interval`` seconds. ``online_counter`` is a callable returning
+    the number of online connections, called every ``online_interval``
+    seconds. Both are optional; a failing source keeps its last value.
+
+    Listeners added with add_listener() are called from the sampler thread
+    with each new snapshot; they must not block.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, history=DEFAULT_HISTORY, store=None, online_counter=None,
+                 online_interval=DEFAULT_ONLINE_INTERVAL, traffic_interval=DEFAULT_TRAFFIC_INTERVAL, proc='/proc'):
+        self.interval = interval
+        self.store = store
+        self.online_counter = online_counter
+        self.online_interval = online_interval
+        self.traffic_interval = traffic_interval
+        self.proc = proc
+        self.samples = deque(maxlen=history)
+        self.online_users = 0
+        self.user_upload = 0
+        self.user_download = 0
+        self._cpu = None
+        self._online_at = 0.0
+        self._traffic_at = 0.0
+        self._traffic_token = None
+        self._errors = set()
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._demand = 0
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _warn(self, source, error):
+        # Once per source until it recovers, so a dead API does not flood the log.
+        if source not in self._errors:
+            self._errors.add(source)
+            print(f"Warning: server status {source} unavailable: {error}", file=sys.stderr)
+
+    def _refresh_online(self, now):
+        if self.online_counter is None or now - self._online_at < self.online_interval:
+            return
+        self._online_at = now
+        try:
+            self.online_users = int(self.online_counter())
+            self._errors.discard('online users')
+        except Exception as e:
+            self._warn('online users', e)
+
+    def _refresh_traffic(self, now):
+        if self.store is None:
+            return
+        try:
+            token = self.store.change_token()
+            if token is not None and token == self._traffic_token and now - self._traffic_at < self.traffic_interval:
+                return
+            self.user_upload, self.user_download = self.store.traffic_totals()
+            self._traffic_token, self._traffic_at = token, now
+            self._errors.discard('user traffic')
+        except Exception as e:
+            self._warn('user traffic', e)
+
+    def sample(self):
+        """Takes one sample now and returns it; the background thread calls this every interval"""
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        now = time.time()
+        idle, total = parse_cpu_stats(_read(f'{self.proc}/stat'))
+        mem_total, mem_used = parse_meminfo(_read(f'{self.proc}/meminfo'))
+        rx, tx = parse_network_stats(_read(f'{self.proc}/net/dev'))
+        try:
+            uptime = float(_read(f'{self.proc}/uptime').split()[0])
+        except (IndexError, ValueError):
+            uptime = 0.0
+
+        previous = self.samples[-1] if self.samples else None
+        # The first sample has nothing to diff against: report the average since boot.
+        last_idle, last_total = self._cpu or (0, 0)
+        total_delta = total - last_total
+        cpu = round(100.0 * (1 - (idle - last_idle) / total_delta), 1) if total_delta > 0 else 0.0
+        self._cpu = (idle, total)
+        elapsed = now - previous.timestamp if previous else 0
+        if previous and elapsed > 0 and rx >= previous.rx_bytes and tx >= previous.tx_bytes:
+            download_rate = int((rx - previous.rx_bytes) / elapsed)
+            upload_rate = int((tx - previous.tx_bytes) / elapsed)
+        else:
+            download_rate = upload_rate = 0
+
+        sample = StatusSample(
+            timestamp=now,
+            uptime_seconds=uptime,
+            cpu_percent=cpu,
+            mem_total_mb=mem_total,
+            mem_used_mb=mem_used,
+            rx_bytes=rx,
+            tx_bytes=tx,
+            download_bytes_per_sec=download_rate,
+            upload_bytes_per_sec=upload_rate,
+            tcp_connections=_count_entries(f'{self.proc}/net/tcp'),
+            udp_connections=_count_entries(f'{self.proc}/net/udp'),
+        )
+        self._refresh_online(now)
+        self._refresh_traffic(now)
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    def _notify(self):
+        snapshot = self.latest()
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                self._warn('listener', e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._wake:
+                # Idle, without touching /proc, until a subscriber shows up.
+                self._wake.wait_for(lambda: self._demand > 0 or self._stop.is_set())
+            next_at = time.monotonic()
+            while self._demand > 0 and not self._stop.is_set():
+                try:
+                    self.sample()
+                    self._notify()
+                except Exception as e:
+                    self._warn('sampler', e)
+                next_at += self.interval
+                # Skip missed ticks instead of bursting to catch up.
+                next_at = max(next_at, time.monotonic())
+                with self._wake:
+                    self._wake.wait_for(lambda: self._demand == 0 or self._stop.is_set(),
+                                        next_at - time.monotonic())
+
+    def start(self):
+        """Takes a first sample synchronously, then starts the daemon thread that samples while acquired"""
+        if self._thread is not None:
+            return self
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='server-status-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def acquire(self):
+        """Asks the thread to sample every interval until the matching release()"""
+        with self._wake:
+            self._demand += 1
+            self._wake.notify_all()
+
+    def release(self):
+        with self._wake:
+            self._demand = max(0, self._demand - 1)
+            self._wake.notify_all()
+
+    @property
+    def active(self):
+        return self._demand > 0
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def history(self, since=None):
+        """Returns the buffered samples, oldest first, optionally only those taken after ``since``"""
+        with self._lock:
+            samples = list(self.samples)
+        if since is not None:
+            samples = [sample for sample in samples if sample.timestamp > since]
+        return samples
+
+    def latest(self, max_age=None):
+        """Returns the newest snapshot as a dict, or None before the first sample.
+
+        With ``max_age`` (seconds) a snapshot older than that is replaced by
+        a fresh sample first, which is how callers get current figures while
+        nothing holds the thread.
+        """
+        with self._lock:
+            sample = self.samples[-1] if self.samples else None
+        if max_age is not None and (sample is None or time.time() - sample.timestamp > max_age):
+            with self._sample_lock:
+                with self._lock:
+                    sample = self.samples[-1] if self.samples else None
+                # Another caller may have sampled while this one waited for the lock.
+                if sample is None or time.time() - sample.timestamp > max_age:
+                    sample = self._sample()
+        if sample is None:
+            return None
+        return {
+            **sample._asdict(),
+            'boot_time': sample.timestamp - sample.uptime_seconds,
+            'online_users': self.online_users,
+            'user_upload_bytes': self.user_upload,
+            'user_download_bytes': self.user_download,
+        }
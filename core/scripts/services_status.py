@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Cached systemd service states shared by the CLI, webpanel, Telegram bot and show_user_uri.py.
+
+Every unit is fetched with a single `systemctl show` call instead of one
+`systemctl is-active` per unit, and the answer is kept in a small cache file
+that all processes share for CACHE_TTL seconds. Start/stop actions run
+through cli_api (and runbot.py) call invalidate(), so the next query sees
+their effect at once. systemctl is looked up on PATH, so tests can put a fake
+one in front of the real one.
+
+Run directly, it prints the states of SERVICES (or of the units given as
+arguments) as a JSON object, like services_status.sh used to.
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Reported by get_services_status(), in this order; services_status.sh keeps the same list for menu.sh.
+SERVICES = (
+    'hysteria-server.service',
+    'hysteria-scheduler.service',
+    'hysteria-auth.service',
+    'hysteria-webpanel.service',
+    'hysteria-caddy.service',
+    'hysteria-telegram-bot.service',
+    'hysteria-normal-sub.service',
+    'hysteria-caddy-normalsub.service',
+    'hysteria-ip-limit.service',
+    'wg-quick@wgcf.service',
+)
+# Fetched along with every query: one systemctl call costs the same for one unit or a dozen.
+KNOWN_UNITS = SERVICES + ('hysteria-singbox.service',)
+
+CACHE_TTL = float(os.getenv('HYSTERIA_SERVICES_STATUS_TTL', '5'))
+CACHE_FILE = Path(os.getenv('HYSTERIA_SERVICES_STATUS_CACHE', '/run/hysteria/services_status.json'))
+SYSTEMCTL_TIMEOUT = 10
+
+
+def parse_show_output(output: str, units: Iterable[str]) -> Dict[str, str]:
+    """Maps each unit to its ActiveState from `systemctl show --property=Id,ActiveState` output.
+
+    systemctl prints one block per unit, in argument order, separated by a
+    blank line. Blocks are matched by Id where it names a requested unit and
+    by position otherwise (an alias reports the Id of the unit it points to).
+    """
+    units = list(units)
+    blocks = []
+    for chunk in output.strip().split('\n\n'):
+        properties = {}
+        for line in chunk.splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                properties[key.strip()] = value.strip()
+        blocks.append(properties)
+
+    states = {}
+    for position, properties in enumerate(blocks):
+        unit = properties.get('Id')
+        if unit not in units:
+            if len(blocks) != len(units):
+                continue
+            unit = units[position]
+        states[unit] = properties.get('ActiveState') or 'unknown'
+    return states
+
+
+def query_states(units: Iterable[str]) -> Optional[Dict[str, str]]:
+    """Asks systemctl for the ActiveState of every unit at once; None if systemctl cannot be run"""
+    units = list(units)
+    try:
+        result = subprocess.run(
+            ['systemctl', 'show', '--property=Id,ActiveState', '--', *units],
+            capture_output=True, text=True, timeout=SYSTEMCTL_TIMEOUT, check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    states = parse_show_output(result.stdout, units)
+    # A unit systemd has never heard of still gets a block, but be safe.
+    return {unit: states.get(unit, 'inactive') for unit in units}
+
+
+class ServiceStatusCache:
+    """ActiveState lookups cached for ``ttl`` seconds in ``cache_file``.
+
+    Without a cache file (or when it cannot be written) the cache lives in
+    this process only. Failed queries are not cached and report units as
+    'unknown'.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, cache_file: Optional[Path] = CACHE_FILE):
+        self.ttl = ttl
+        self.cache_file = Path(cache_file) if cache_file is not None else None
+        self._memory = (0.0, {})
+        # Cleared when the cache file cannot be written, so this process falls back to its memory.
+        self._shared = cache_file is not None
+
+    def _load(self):
+        if not self._shared:
+            return self._memory
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+            return float(data['at']), dict(data['states'])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing means another process invalidated it.
+            return 0.0, {}
+
+    def _save(self, at: float, states: Dict[str, str]):
+        self._memory = (at, states)
+        if not self._shared:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.cache_file.with_name(f'.{self.cache_file.name}.{os.getpid()}')
+            with open(temp, 'w') as f:
+                json.dump({'at': at, 'states': states}, f)
+            os.replace(temp, self.cache_file)
+        except OSError:
+            self._shared = False
+
+    def states(self, units: Iterable[str] = SERVICES, fresh: bool = False) -> Dict[str, str]:
+        """Returns {unit: ActiveState}; ``fresh`` skips the cache (e.g. right after starting a unit)"""
+        units = list(units)
+        now = time.time()
+        at, cached = (0.0, {}) if fresh else self._load()
+        if now - at > self.ttl or any(unit not in cached for unit in units):
+            wanted = list(dict.fromkeys([*units, *KNOWN_UNITS]))
+            queried = query_states(wanted)
+            if queried is None:
+                return {unit: 'unknown' for unit in units}
+            self._save(now, queried)
+            cached = queried
+        return {unit: cached[unit] for unit in units}
+
+    def statuses(self, units: Iterable[str] = SERVICES, fresh: bool = False) -> Dict[str, bool]:
+        """Returns {unit: is active}"""
+        return {unit: state == 'active' for unit, state in self.states(units, fresh).items()}
+
+    def is_active(self, unit: str, fresh: bool = False) -> bool:
+        return self.states([unit], fresh)[unit] == 'active'
+
+    def invalidate(self):
+        """Drops the cached states, for this and every other process"""
+        self._memory = (0.0, {})
+        if self.cache_file is not None:
+            try:
+                self.cache_file.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: could not invalidate {self.cache_file}: {e}", file=sys.stderr)
+
+
+_cache = ServiceStatusCache()
+
+
+def statuses(units: Iterable[str] = SERVICES, fresh: bool = False) -> Dict[str, bool]:
+    return _cache.statuses(units, fresh)
+
+
+def is_active(unit: str, fresh: bool = False) -> bool:
+    return _cache.is_active(unit, fresh)
+
+
+def invalidate():
+    _cache.invalidate()
+
+
+if __name__ == '__main__':
+    print(json.dumps(statuses(sys.argv[1:] or SERVICES), indent=2))
@@ -1,15 +1,20 @@
 import os
+import sys
 import ssl
 import json
 import subprocess
+from pathlib import Path
 from aiohttp import web
 from aiohttp.web_middlewares import middleware
 from urllib.parse import unquote, parse_qs
 import re
-import time
 import shlex
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from compression import CompressedBodyCache, DEFAULT_GZIP_LEVEL, DEFAULT_BROTLI_QUALITY, DEFAULT_MIN_SIZE
+from rate_limit import TokenBucketLimiter, client_address, parse_trusted_proxies, DEFAULT_MAX_KEYS, DEFAULT_TRUSTED_PROXIES
+
 load_dotenv()
 
 # Environment variables
@@ -34,26 +39,28 @@ SNI = load_sni_from_env()
 
 RATE_LIMIT = 100
 RATE_LIMIT_WINDOW = 60
+# This server terminates TLS itself, so X-Forwarded-For is only honoured from these peers.
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv('HYSTERIA_TRUSTED_PROXIES', DEFAULT_TRUSTED_PROXIES))
+
+rate_limiter = TokenBucketLimiter(RATE_LIMIT, RATE_LIMIT_WINDOW,
+                                  int(os.getenv('SINGBOX_RATE_LIMIT_KEYS', str(DEFAULT_MAX_KEYS))))
 
-rate_limit_store = {}
+# Configs are compressed once per distinct body and encoding, then served from memory.
+compressed_bodies = CompressedBodyCache(
+    int(os.getenv('SINGBOX_COMPRESSION_CACHE_MB', '16')) * 1024 * 1024,
+    int(os.getenv('SINGBOX_GZIP_LEVEL', str(DEFAULT_GZIP_LEVEL))),
+    int(os.getenv('SINGBOX_BROTLI_QUALITY', str(DEFAULT_BROTLI_QUALITY))),
+    int(os.getenv('SINGBOX_COMPRESS_MIN_BYTES', str(DEFAULT_MIN_SIZE))),
+) if os.getenv('SINGBOX_COMPRESSION', 'true').strip().lower() in ('1', 'true', 'yes') else None
 
 @middleware
 async def rate_limit_middleware(request, handler):
-    client_ip = request.headers.get('X-Forwarded-For', request.remote)
-    current_time = time.time()
-
-    if client_ip in rate_limit_store:
-        requests, last_request_time = rate_limit_store[client_ip]
-        if current_time - last_request_time < RATE_LIMIT_WINDOW:
-            if requests >= RATE_LIMIT:
-                return web.Response(status=429, text="Rate limit exceeded.")
-        if current_time - last_request_time >= RATE_LIMIT_WINDOW:
-            rate_limit_store[client_ip] = (1, current_time)
-        else:
-            rate_limit_store[client_ip] = (requests + 1, last_request_time)
-    else:
-        rate_limit_store[client_ip] = (1, current_time)
-    
+    client_ip = client_address(request.remote, request.headers.get('X-Forwarded-For'), TRUSTED_PROXIES)
+
+    if client_ip and not rate_limiter.allow(client_ip):
+        retry_after = max(1, round(rate_limiter.retry_after(client_ip)))
+        return web.Response(status=429, text="Rate limit exceeded.", headers={'Retry-After': str(retry_after)})
+
     return await handler(request)
 
 def sanitize_input(value, pattern):
@@ -79,7 +86,14 @@ async def handle(request):
         config = generate_singbox_config(username, ip_version, fragment)
         config_json = json.dumps(config, indent=4, sort_keys=True)
         
-        return web.Response(text=config_json, content_type='application/json')
+        if compressed_bodies is None:
+            return web.Response(text=config_json, content_type='application/json')
+        body, encoding = compressed_bodies.encode(config_json.encode('utf-8'), request.headers.get('Accept-Encoding'))
+        response = web.Response(body=body, content_type='application/json', charset='utf-8',
+                                headers={'Vary': 'Accept-Encoding'})
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
     except ValueError as e:
         return web.Response(status=400, text=f"Error: {str(e)}")
     except Exception as e:
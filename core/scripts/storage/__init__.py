@@ -0,0 +1,162 @@
+'''
+Pluggable user store.
+
+The active backend is chosen with the HYSTERIA_USER_STORE environment
+variable ("sqlite", the default, or "json" for the legacy whole-file
+users.json). The first time the SQLite backend is opened on a host that
+still has only users.json, the file is imported automatically.
+
+Traffic ticks are appended to a journal next to the store and folded in
+by compact(); set HYSTERIA_TRAFFIC_JOURNAL=false to write them directly.
+
+Per-user traffic history lives in a separate database returned by
+get_history(); set HYSTERIA_TRAFFIC_HISTORY=false to stop recording it.
+
+Committed writes also refresh auth.snapshot, the compact user list read
+by the auth servers (set HYSTERIA_AUTH_SNAPSHOT=false to skip it), and on
+the SQLite backend the users.json export for the shell scripts that still
+read it (HYSTERIA_USERS_JSON_EXPORT=false turns it off). Both are rebuilt
+by a background writer HYSTERIA_DERIVED_DELAY seconds (default 1) after a
+burst of writes, never inside a commit; call flush_derived() when a change
+must be visible to the auth servers before acting on it.
+'''
+
+import os
+import sys
+import fcntl
+import threading
+from pathlib import Path
+from typing import Optional
+
+from paths import USERS_FILE, USERS_DB, TRAFFIC_HISTORY_DB, AUTH_SNAPSHOT
+from .base import UserStore, StoreError, UserExistsError, UserNotFoundError, USER_FIELDS
+from .json_store import JSONUserStore, write_users_json
+from .sqlite_store import SQLiteUserStore
+from .migrate import migrate_from_json, load_users_json
+from .journal import TrafficJournal, JournaledUserStore, JournalTail, DEFAULT_MAX_BYTES
+from .derived import DerivedFileWriter, DEFAULT_DELAY as DEFAULT_DERIVED_DELAY
+from .auth_snapshot import write_auth_snapshot, read_auth_snapshot, read_version as read_auth_snapshot_version
+from .history import TrafficHistory, DEFAULT_MAX_BYTES as DEFAULT_HISTORY_MAX_BYTES
+from .user_index import UserIndex, ListFilters, UserPage
+from .export import export_users, EXPORT_FORMATS, EXPORT_FIELDS, CONTENT_TYPES as EXPORT_CONTENT_TYPES
+
+__all__ = [
+    'UserStore', 'StoreError', 'UserExistsError', 'UserNotFoundError', 'USER_FIELDS',
+    'JSONUserStore', 'SQLiteUserStore', 'write_users_json',
+    'migrate_from_json', 'load_users_json', 'open_store', 'get_store',
+    'TrafficJournal', 'JournaledUserStore', 'JournalTail',
+    'TrafficHistory', 'get_history', 'history_enabled',
+    'DerivedFileWriter',
+    'write_auth_snapshot', 'read_auth_snapshot', 'read_auth_snapshot_version', 'auth_snapshot_path',
+    'UserIndex', 'ListFilters', 'UserPage',
+    'export_users', 'EXPORT_FORMATS', 'EXPORT_FIELDS', 'EXPORT_CONTENT_TYPES',
+]
+
+_store: Optional[UserStore] = None
+_store_lock = threading.Lock()
+_history: Optional[TrafficHistory] = None
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _remove_database(db_path: Path):
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(f'{db_path}{suffix}')
+        except FileNotFoundError:
+            pass
+
+
+def open_store(backend: Optional[str] = None, db_path: Optional[Path] = None,
+               json_path: Optional[Path] = None, journal: Optional[bool] = None) -> UserStore:
+    '''Opens a new store instance. Most callers want the shared one from get_store().'''
+    store = _open_backend(backend, db_path, json_path)
+    if _env_flag('HYSTERIA_AUTH_SNAPSHOT', 'true'):
+        store.auth_snapshot_path = auth_snapshot_path(db_path)
+        if not store.auth_snapshot_path.exists():
+            store.write_auth_snapshot()
+    if journal is None:
+        journal = _env_flag('HYSTERIA_TRAFFIC_JOURNAL', 'true')
+    outer = store
+    if journal:
+        default_path = store.path.with_name('traffic.journal')
+        journal_path = Path(os.getenv('HYSTERIA_TRAFFIC_JOURNAL_PATH', str(default_path)))
+        max_bytes = int(os.getenv('HYSTERIA_TRAFFIC_JOURNAL_MAX_BYTES', str(DEFAULT_MAX_BYTES)))
+        outer = JournaledUserStore(store, TrafficJournal(journal_path, max_bytes))
+
+    export_path = getattr(store, 'export_path', None)
+    if export_path or store.auth_snapshot_path:
+        # Reads go through the journal so quota flags and the export carry current counters.
+        delay = float(os.getenv('HYSTERIA_DERIVED_DELAY', str(DEFAULT_DERIVED_DELAY)))
+        store.derived = DerivedFileWriter(outer, export_path=export_path,
+                                          snapshot_path=store.auth_snapshot_path, delay=delay)
+    return outer
+
+
+def auth_snapshot_path(db_path: Optional[Path] = None) -> Path:
+    '''Where the auth snapshot is written: next to users.db unless HYSTERIA_AUTH_SNAPSHOT_PATH is set.'''
+    db_path = Path(db_path or os.getenv('HYSTERIA_USERS_DB_PATH', str(USERS_DB)))
+    return Path(os.getenv('HYSTERIA_AUTH_SNAPSHOT_PATH', str(db_path.with_name(AUTH_SNAPSHOT.name))))
+
+
+def _open_backend(backend: Optional[str], db_path: Optional[Path], json_path: Optional[Path]) -> UserStore:
+    backend = (backend or os.getenv('HYSTERIA_USER_STORE', 'sqlite')).strip().lower()
+    json_path = Path(json_path or os.getenv('HYSTERIA_USERS_JSON_PATH', str(USERS_FILE)))
+
+    if backend == 'json':
+        return JSONUserStore(json_path)
+    if backend != 'sqlite':
+        raise StoreError(f"Unknown user store backend '{backend}'. Use 'sqlite' or 'json'.")
+
+    db_path = Path(db_path or os.getenv('HYSTERIA_USERS_DB_PATH', str(USERS_DB)))
+    export_path = json_path if _env_flag('HYSTERIA_USERS_JSON_EXPORT', 'true') else None
+
+    if db_path.exists():
+        return SQLiteUserStore(db_path, export_path=export_path)
+
+    # First start on this host: serialize the one-time import between processes.
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(db_path.with_name(f'.{db_path.name}.migrate.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        needs_migration = not db_path.exists() and json_path.exists()
+        store = SQLiteUserStore(db_path, export_path=export_path)
+        if needs_migration:
+            try:
+                migrate_from_json(store, json_path)
+                store.set_meta('migrated_from', str(json_path))
+            except StoreError as e:
+                store.close()
+                _remove_database(db_path)
+                print(f"Warning: {e}. Falling back to the users.json store.", file=sys.stderr)
+                return JSONUserStore(json_path)
+        return store
+
+
+def get_store() -> UserStore:
+    '''Returns the process-wide store, opening it on first use.'''
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = open_store()
+        return _store
+
+
+def history_enabled() -> bool:
+    return _env_flag('HYSTERIA_TRAFFIC_HISTORY', 'true')
+
+
+def get_history() -> TrafficHistory:
+    '''Returns the process-wide traffic history database, opening it on first use.'''
+    global _history
+    with _store_lock:
+        if _history is None:
+            # Kept next to users.db so a relocated store takes its history along.
+            db_path = Path(os.getenv('HYSTERIA_USERS_DB_PATH', str(USERS_DB)))
+            default_path = db_path.with_name(TRAFFIC_HISTORY_DB.name)
+            path = Path(os.getenv('HYSTERIA_TRAFFIC_HISTORY_PATH', str(default_path)))
+            max_mb = os.getenv('HYSTERIA_TRAFFIC_HISTORY_MAX_MB')
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_HISTORY_MAX_BYTES
+            _history = TrafficHistory(path, max_bytes)
+        return _history
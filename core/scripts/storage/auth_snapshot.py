@@ -0,0 +1,134 @@
+'''
+Minimal user snapshot for the auth servers (auth/user_auth.go and
+hysteria2/auth_server.py).
+
+Layout, UTF-8 text:
+
+    #hysteria-auth 1 <version> <count>
+    <username>\t<password>\t<flags>\t<expires_at>
+    ...
+
+``version`` is a content hash, so a consumer only has to read the first
+line to know whether anything changed. ``flags`` is a bitmask of FLAG_*
+and ``expires_at`` an epoch second (0 when the account never expires).
+Backslash, tab, CR and LF inside a field are written as \\\\, \\t, \\r and \\n.
+'''
+
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+FORMAT_VERSION = 1
+MAGIC = '#hysteria-auth'
+FLAG_BLOCKED = 1
+FLAG_UNLIMITED = 2
+FLAG_QUOTA_EXCEEDED = 4
+
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\r': '\\r', '\n': '\\n'}
+_UNESCAPES = {'\\': '\\', 't': '\t', 'r': '\r', 'n': '\n'}
+
+
+def _escape(value: str) -> str:
+    if not any(char in value for char in _ESCAPES):
+        return value
+    return ''.join(_ESCAPES.get(char, char) for char in value)
+
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    out, chars = [], iter(value)
+    for char in chars:
+        out.append(_UNESCAPES.get(next(chars, ''), '') if char == '\\' else char)
+    return ''.join(out)
+
+
+def _expiry_epoch(user: Dict[str, Any]) -> int:
+    # Local midnight of the creation date plus expiration_days, the rule
+    # hysteria2/auth_server.py always applied. The Go server used to parse the
+    # date as UTC midnight, so on hosts not running in UTC its expiry moves by
+    # the UTC offset.
+    expiration_days = int(user.get('expiration_days', 0) or 0)
+    creation_date = user.get('account_creation_date')
+    if expiration_days <= 0 or not creation_date:
+        return 0
+    try:
+        created = datetime.strptime(creation_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return 0
+    return int((created + timedelta(days=expiration_days)).timestamp())
+
+
+def auth_entry(user: Dict[str, Any]) -> Tuple[str, int, int]:
+    '''Returns the (password, flags, expires_at) triple stored for a user.'''
+    flags = 0
+    if user.get('blocked'):
+        flags |= FLAG_BLOCKED
+    if user.get('unlimited_user'):
+        flags |= FLAG_UNLIMITED
+    max_bytes = int(user.get('max_download_bytes', 0) or 0)
+    used = int(user.get('upload_bytes', 0) or 0) + int(user.get('download_bytes', 0) or 0)
+    if max_bytes > 0 and used >= max_bytes:
+        flags |= FLAG_QUOTA_EXCEEDED
+    return str(user.get('password') or ''), flags, _expiry_epoch(user)
+
+
+def read_version(path: Path) -> Optional[str]:
+    '''Returns the version from the header line, or None if the file is missing or invalid.'''
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            header = f.readline().split()
+    except FileNotFoundError:
+        return None
+    if len(header) != 4 or header[0] != MAGIC or header[1] != str(FORMAT_VERSION):
+        return None
+    return header[2]
+
+
+def write_auth_snapshot(path: Path, users: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+    '''
+    Atomically writes the snapshot for the given (username, user) pairs.
+    Returns False without touching the file when its content is unchanged.
+    '''
+    lines = []
+    for username, user in users:
+        password, flags, expires_at = auth_entry(user)
+        lines.append(f'{_escape(username)}\t{_escape(password)}\t{flags}\t{expires_at}\n')
+    lines.sort()
+    body = ''.join(lines).encode('utf-8')
+    version = hashlib.blake2b(body, digest_size=12).hexdigest()
+
+    path = Path(path)
+    if read_version(path) == version:
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(f'{MAGIC} {FORMAT_VERSION} {version} {len(lines)}\n'.encode('utf-8'))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return True
+
+
+def read_auth_snapshot(path: Path) -> Tuple[Optional[str], Dict[str, Tuple[str, int, int]]]:
+    '''Returns (version, {username: (password, flags, expires_at)}); version is None if the file is unusable.'''
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            header = f.readline().split()
+            if len(header) != 4 or header[0] != MAGIC or header[1] != str(FORMAT_VERSION):
+                return None, {}
+            entries = {}
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 4:
+                    continue
+                entries[_unescape(fields[0])] = (_unescape(fields[1]), int(fields[2]), int(fields[3]))
+    except FileNotFoundError:
+        return None, {}
+    return header[2], entries
@@ -0,0 +1,220 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .auth_snapshot import write_auth_snapshot
+
+# Columns every backend understands. Anything else found in a user entry is
+# kept verbatim so that third-party fields survive a round trip.
+USER_FIELDS = (
+    'password',
+    'max_download_bytes',
+    'expiration_days',
+    'account_creation_date',
+    'blocked',
+    'unlimited_user',
+    'token',
+    'upload_bytes',
+    'download_bytes',
+    'status',
+)
+BOOL_FIELDS = ('blocked', 'unlimited_user')
+INT_FIELDS = ('max_download_bytes', 'expiration_days', 'upload_bytes', 'download_bytes')
+
+
+class StoreError(Exception):
+    '''Base class for user store errors.'''
+    pass
+
+
+class UserExistsError(StoreError):
+    '''Raised when a user (or its unique password/token) already exists.'''
+    pass
+
+
+class UserNotFoundError(StoreError):
+    '''Raised when the requested user does not exist.'''
+    pass
+
+
+class UserStore:
+    '''
+    Interface shared by all user store backends.
+
+    Users are exchanged as plain dicts shaped exactly like the entries of
+    the legacy users.json file, so callers never need to know which
+    backend is active.
+    '''
+
+    name = 'base'
+    # When set, a minimal auth snapshot is kept for the auth servers (rewritten by ``derived``).
+    auth_snapshot_path: Optional[Path] = None
+    # Rebuilds the files derived from the users (see derived.py) off the commit path.
+    derived = None
+
+    # region Read
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_by_password(self, password: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def get_by_token(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.items())
+
+    def scan(self, since: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any], Optional[float]]]:
+        '''
+        Streams (username, user, updated_at) for the users modified at or
+        after ``since`` (epoch seconds; None for everybody). updated_at is
+        None when the backend does not track it, and such users are always
+        included.
+        '''
+        for username, user in self.items():
+            yield username, user, None
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def traffic_totals(self) -> Tuple[int, int]:
+        '''Returns the (upload, download) byte totals of all users.'''
+        raise NotImplementedError
+
+    def change_token(self) -> Any:
+        '''
+        Returns an opaque value that changes whenever any process commits a
+        write. Long-running readers compare it to decide whether a cached
+        copy of the users is still current; None means "unknown, re-read".
+        '''
+        return None
+
+    def traffic_changes(self, token: Any) -> Optional[Dict[str, Dict[str, Any]]]:
+        '''
+        When everything committed since ``token`` (an earlier change_token())
+        only moved traffic counters and online status, returns the users
+        whose values changed, as get() returns them now. None when that
+        cannot be told cheaply; the caller then re-reads everything.
+        '''
+        return None
+
+    # endregion
+
+    # region Write
+
+    @contextmanager
+    def transaction(self):
+        '''Groups several writes into one atomic commit.'''
+        raise NotImplementedError
+        yield
+
+    @property
+    def in_transaction(self) -> bool:
+        '''True while this process is inside transaction().'''
+        raise NotImplementedError
+
+    def add(self, username: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def add_many(self, users: Dict[str, Dict[str, Any]]) -> int:
+        raise NotImplementedError
+
+    def update(self, username: str, changes: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def rename(self, old_username: str, new_username: str) -> None:
+        raise NotImplementedError
+
+    def remove(self, username: str) -> bool:
+        raise NotImplementedError
+
+    def replace_all(self, users: Dict[str, Dict[str, Any]]) -> None:
+        '''Drops every user and loads the given mapping instead (used by restore).'''
+        raise NotImplementedError
+
+    def apply_traffic(self, traffic: Dict[str, Tuple[int, int]], online: Dict[str, bool]) -> None:
+        '''
+        Adds per-user (upload, download) deltas and refreshes the online flag.
+
+        Mirrors the historical traffic.py semantics: everybody not reported
+        online is marked Offline, and identities reported by the Hysteria2
+        API that are missing from the store get a bare traffic-only entry.
+        '''
+        raise NotImplementedError
+
+    def add_traffic(self, traffic: Dict[str, Tuple[int, int]]) -> int:
+        '''
+        Adds (upload, download) deltas to the named users only. Unlike
+        apply_traffic() nobody's status changes and unknown names are
+        skipped. Returns the number of users updated.
+        '''
+        with self.transaction():
+            updated = 0
+            for username, (upload, download) in traffic.items():
+                user = self.get(username)
+                if user is None:
+                    continue
+                updated += self.update(username, {
+                    'upload_bytes': int(user.get('upload_bytes', 0) or 0) + upload,
+                    'download_bytes': int(user.get('download_bytes', 0) or 0) + download,
+                })
+            return updated
+
+    def set_blocked(self, usernames: Iterable[str], blocked: bool = True) -> int:
+        with self.transaction():
+            return sum(1 for username in usernames if self.update(username, {'blocked': blocked}))
+
+    # endregion
+
+    def _committed(self) -> None:
+        '''Called after an outermost commit that changed users.'''
+        if self.derived is not None:
+            self.derived.mark_dirty()
+
+    def flush_derived(self) -> bool:
+        '''Rewrites the derived files now if a committed change is still pending; False if that failed.'''
+        return self.derived.flush() if self.derived is not None else True
+
+    def export_json(self, path=None) -> None:
+        '''Writes the whole store in the legacy users.json layout.'''
+        raise NotImplementedError
+
+    def write_auth_snapshot(self, users: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+        '''Rewrites the auth snapshot if one is configured and its content changed.'''
+        if self.auth_snapshot_path is None:
+            return False
+        return write_auth_snapshot(self.auth_snapshot_path, (users if users is not None else self.all()).items())
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        '''Reads a bookkeeping value stored alongside the users.'''
+        raise NotImplementedError
+
+    def set_meta(self, key: str, value: str) -> None:
+        '''Writes a bookkeeping value; it is committed together with the current transaction.'''
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+def normalize_user(data: Dict[str, Any]) -> Dict[str, Any]:
+    '''Coerces known fields to the types users.json has always used.'''
+    user = dict(data)
+    for key in BOOL_FIELDS:
+        if key in user and user[key] is not None:
+            value = user[key]
+            if isinstance(value, str):
+                value = value.strip().lower() == 'true'
+            user[key] = bool(value)
+    for key in INT_FIELDS:
+        if key in user and user[key] is not None:
+            user[key] = int(user[key])
+    return user
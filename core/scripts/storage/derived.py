@@ -0,0 +1,91 @@
+'''
+Background writer for the files derived from the user store: the legacy
+users.json export and the auth snapshot.
+
+Both are rebuilt from a full read of the store, so they are never written
+inside a commit. A committed write only calls mark_dirty(); a daemon thread
+waits ``delay`` seconds so a burst of writes is folded into one rebuild,
+then rewrites both files from a single read, without holding the store
+lock. flush() does the same synchronously: callers that need the auth
+servers to see a change before acting on it (blocking users, then kicking
+them) call it, and it runs at interpreter exit so short-lived CLI processes
+never leave a stale file behind.
+'''
+
+import os
+import sys
+import time
+import atexit
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .auth_snapshot import write_auth_snapshot
+from .json_store import write_users_json
+
+DEFAULT_DELAY = 1.0
+
+
+class DerivedFileWriter:
+    '''Debounced rebuilder of users.json (``export_path``) and auth.snapshot (``snapshot_path``).'''
+
+    def __init__(self, source, export_path: Optional[Path] = None, snapshot_path: Optional[Path] = None,
+                 delay: float = DEFAULT_DELAY):
+        # The store users are read from (the journaled wrapper when there is one).
+        self.source = source
+        self.export_path = Path(export_path) if export_path else None
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        '''Schedules a rebuild; called after every commit that changed users.'''
+        with self._cond:
+            self._pending = True
+            # A forked worker inherits the flag but not the thread.
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='store-derived-files', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let the rest of the burst land before reading everything.
+            time.sleep(self.delay)
+            if not self.flush():
+                # The rebuild failed: back off before retrying.
+                time.sleep(max(self.delay, 5.0))
+
+    def flush(self) -> bool:
+        '''
+        Rebuilds the files now if a change is pending. Returns True when
+        the pending change has been written (or there was none).
+        '''
+        with self._write_lock:
+            with self._cond:
+                if not self._pending:
+                    return True
+                # Cleared before reading: a commit that lands during the
+                # rebuild sets it again and gets its own pass.
+                self._pending = False
+            try:
+                users = self.source.all()
+                if self.export_path:
+                    write_users_json(self.export_path, users)
+                if self.snapshot_path:
+                    write_auth_snapshot(self.snapshot_path, users.items())
+            except Exception as e:
+                with self._cond:
+                    self._pending = True
+                print(f"Warning: could not rewrite the store's derived files: {e}", file=sys.stderr)
+                return False
+            return True
@@ -0,0 +1,314 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .base import StoreError
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Finest to coarsest: (name, bucket width in seconds, retention in seconds or None for forever).
+RESOLUTIONS = (
+    ('minute', MINUTE, DAY),
+    ('hour', HOUR, 30 * DAY),
+    ('day', DAY, None),
+)
+RESOLUTION_SECONDS = {name: width for name, width, _ in RESOLUTIONS}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Upper bound on buckets per series when the resolution is picked automatically.
+MAX_POINTS = 1500
+PRUNE_INTERVAL = HOUR
+
+SCHEMA = ['''
+    CREATE TABLE IF NOT EXISTS series (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE
+    )
+'''] + [statement for name, _, _ in RESOLUTIONS for statement in (f'''
+    CREATE TABLE IF NOT EXISTS traffic_{name} (
+        bucket INTEGER NOT NULL,
+        series_id INTEGER NOT NULL,
+        upload_bytes INTEGER NOT NULL,
+        download_bytes INTEGER NOT NULL,
+        PRIMARY KEY (bucket, series_id)
+    ) WITHOUT ROWID
+''', f'''
+    CREATE INDEX IF NOT EXISTS idx_traffic_{name}_series ON traffic_{name}(series_id, bucket)
+''', f'''
+    CREATE TABLE IF NOT EXISTS total_{name} (
+        bucket INTEGER PRIMARY KEY,
+        upload_bytes INTEGER NOT NULL,
+        download_bytes INTEGER NOT NULL
+    )
+''')]
+
+
+def _floor(timestamp: int, width: int) -> int:
+    return timestamp - timestamp % width
+
+
+def _ceil(timestamp: int, width: int) -> int:
+    return -(-timestamp // width) * width
+
+
+class TrafficHistory:
+    '''
+    Per-user traffic time-series in its own SQLite file (WAL mode).
+
+    Every recorded tick is added to the current minute, hour and day bucket
+    of each active user in one transaction, so the rollups are always up to
+    date and never need a separate aggregation pass. prune() drops minute
+    buckets older than a day and hour buckets older than 30 days; day
+    buckets are kept until the file grows past ``max_bytes``, after which
+    the oldest buckets are dropped first.
+
+    Range queries read the coarsest buckets that cover the range exactly:
+    whole days from the day table and only the ragged edges from the hour
+    and minute tables, so their cost depends on the number of days, not on
+    the number of ticks.
+    '''
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._series_ids: Dict[str, int] = {}
+        self._next_prune = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        # Must be set before the first table exists for freed pages to be reclaimable.
+        self._conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=30000')
+        with self._transaction():
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    # region Internals
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _series_id_map(self, usernames: Iterable[str]) -> Dict[str, int]:
+        '''Returns ids for the given users, creating series rows as needed. Caller holds a transaction.'''
+        missing = [username for username in usernames if username not in self._series_ids]
+        if missing:
+            self._conn.executemany('INSERT OR IGNORE INTO series (username) VALUES (?)',
+                                   [(username,) for username in missing])
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT username, id FROM series WHERE username IN ({','.join('?' * len(chunk))})", chunk)
+                self._series_ids.update(rows.fetchall())
+        return self._series_ids
+
+    def _size(self) -> int:
+        page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+        pages = self._conn.execute('PRAGMA page_count').fetchone()[0]
+        free = self._conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return (pages - free) * page_size
+
+    @staticmethod
+    def _plan(start: int, end: int) -> List[Tuple[str, int, int]]:
+        '''Splits [start, end) into (resolution, start, end) segments, coarsest buckets first.'''
+        segments = []
+        day_start, day_end = _ceil(start, DAY), _floor(end, DAY)
+        if day_start < day_end:
+            segments.append(('day', day_start, day_end))
+            edges = [(start, day_start), (day_end, end)]
+        else:
+            edges = [(start, end)]
+
+        for edge_start, edge_end in edges:
+            hour_start, hour_end = _ceil(edge_start, HOUR), _floor(edge_end, HOUR)
+            if hour_start < hour_end:
+                segments.append(('hour', hour_start, hour_end))
+                segments += [('minute', edge_start, hour_start), ('minute', hour_end, edge_end)]
+            else:
+                segments.append(('minute', edge_start, edge_end))
+        return [segment for segment in segments if segment[1] < segment[2]]
+
+    @staticmethod
+    def finest_resolution(start: int, now: Optional[int] = None) -> str:
+        '''The finest resolution whose retention still covers ``start``.'''
+        now = int(now if now is not None else time.time())
+        for name, width, retention in RESOLUTIONS:
+            if retention is None or start >= _floor(now, width) - retention:
+                return name
+        return RESOLUTIONS[-1][0]
+
+    @classmethod
+    def align(cls, start: int, end: int, resolution: str) -> Tuple[int, int]:
+        width = RESOLUTION_SECONDS[resolution]
+        return _floor(int(start), width), _ceil(int(end), width)
+
+    # endregion
+
+    def record(self, traffic: Dict[str, Tuple[int, int]], timestamp: Optional[float] = None) -> int:
+        '''
+        Adds one tick of (upload, download) deltas. Users without traffic are
+        skipped. Returns the number of users recorded.
+        '''
+        traffic = {username: (up, down) for username, (up, down) in traffic.items() if up or down}
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        if traffic:
+            try:
+                with self._transaction():
+                    ids = self._series_id_map(traffic)
+                    for name, width, _ in RESOLUTIONS:
+                        bucket = _floor(timestamp, width)
+                        self._conn.executemany(
+                            f'INSERT INTO traffic_{name} (bucket, series_id, upload_bytes, download_bytes) '
+                            f'VALUES (?, ?, ?, ?) ON CONFLICT (bucket, series_id) DO UPDATE SET '
+                            f'upload_bytes = upload_bytes + excluded.upload_bytes, '
+                            f'download_bytes = download_bytes + excluded.download_bytes',
+                            [(bucket, ids[username], up, down) for username, (up, down) in traffic.items()])
+                        self._conn.execute(
+                            f'INSERT INTO total_{name} (bucket, upload_bytes, download_bytes) VALUES (?, ?, ?) '
+                            f'ON CONFLICT (bucket) DO UPDATE SET '
+                            f'upload_bytes = upload_bytes + excluded.upload_bytes, '
+                            f'download_bytes = download_bytes + excluded.download_bytes',
+                            (bucket, sum(up for up, _ in traffic.values()), sum(down for _, down in traffic.values())))
+            except sqlite3.Error as e:
+                self._series_ids.clear()
+                raise StoreError(f'Failed to record traffic history: {e}')
+
+        if timestamp >= self._next_prune:
+            self.prune(timestamp)
+        return len(traffic)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        '''Applies retention and the size limit. Returns the number of deleted buckets.'''
+        now = int(now if now is not None else time.time())
+        deleted = 0
+        try:
+            with self._transaction():
+                for name, width, retention in RESOLUTIONS:
+                    if retention is not None:
+                        cutoff = _floor(now, width) - retention
+                        cursor = self._conn.execute(f'DELETE FROM traffic_{name} WHERE bucket < ?', (cutoff,))
+                        deleted += cursor.rowcount
+                        self._conn.execute(f'DELETE FROM total_{name} WHERE bucket < ?', (cutoff,))
+
+                # Over budget: give up the short-lived tiers first (oldest minutes,
+                # then hours) so the long-retention day buckets survive longest.
+                for name, _, _ in RESOLUTIONS:
+                    while self.max_bytes and self._size() > self.max_bytes:
+                        oldest = self._conn.execute(f'SELECT MIN(bucket) FROM traffic_{name}').fetchone()[0]
+                        if oldest is None:
+                            break
+                        cursor = self._conn.execute(f'DELETE FROM traffic_{name} WHERE bucket <= ?', (oldest,))
+                        deleted += cursor.rowcount
+                        self._conn.execute(f'DELETE FROM total_{name} WHERE bucket <= ?', (oldest,))
+            if deleted:
+                with self._lock:
+                    self._conn.execute('PRAGMA incremental_vacuum')
+        except sqlite3.Error as e:
+            raise StoreError(f'Failed to prune traffic history: {e}')
+        self._next_prune = now + PRUNE_INTERVAL
+        return deleted
+
+    def series(self, start: float, end: float, usernames: Optional[Iterable[str]] = None,
+               resolution: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        '''
+        Returns per-bucket (timestamp, upload, download) points between start
+        and end, or the sum over all users when ``usernames`` is None. Only
+        buckets with traffic are listed. When ``resolution`` is omitted the
+        finest one that is still retained and yields at most MAX_POINTS
+        buckets is used; the range is widened to whole buckets.
+        '''
+        start, end = int(start), int(end)
+        if end <= start:
+            raise ValueError('The end of the range must be after its start.')
+        if resolution is None:
+            finest = self.finest_resolution(start, now)
+            names = [name for name, _, _ in RESOLUTIONS]
+            candidates = names[names.index(finest):]
+            resolution = next((name for name in candidates
+                               if (end - start) / RESOLUTION_SECONDS[name] <= MAX_POINTS), candidates[-1])
+        elif resolution not in RESOLUTION_SECONDS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Use one of: {', '.join(RESOLUTION_SECONDS)}.")
+
+        start, end = self.align(start, end, resolution)
+        result: Dict[str, Any] = {'resolution': resolution, 'start': start, 'end': end}
+        with self._lock:
+            if usernames is None:
+                rows = self._conn.execute(
+                    f'SELECT bucket, upload_bytes, download_bytes FROM total_{resolution} '
+                    f'WHERE bucket >= ? AND bucket < ? ORDER BY bucket', (start, end))
+                result['total'] = [list(row) for row in rows]
+                return result
+
+            series: Dict[str, List[List[int]]] = {}
+            for username in dict.fromkeys(usernames):
+                rows = self._conn.execute(
+                    f'SELECT t.bucket, t.upload_bytes, t.download_bytes FROM traffic_{resolution} t '
+                    f'JOIN series s ON s.id = t.series_id '
+                    f'WHERE s.username = ? AND t.bucket >= ? AND t.bucket < ? ORDER BY t.bucket',
+                    (username, start, end))
+                series[username] = [list(row) for row in rows]
+        result['series'] = series
+        return result
+
+    def top(self, start: float, end: float, limit: Optional[int] = 20,
+            usernames: Optional[Iterable[str]] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        '''
+        Returns users ordered by total traffic in [start, end), highest first.
+
+        The range is widened to the finest resolution still retained for
+        ``start`` and then answered from day, hour and minute buckets
+        without double counting.
+        '''
+        start, end = int(start), int(end)
+        if end <= start:
+            raise ValueError('The end of the range must be after its start.')
+        start, end = self.align(start, end, self.finest_resolution(start, now))
+
+        plan = self._plan(start, end)
+        union = ' UNION ALL '.join(
+            f'SELECT series_id, upload_bytes, download_bytes FROM traffic_{name} WHERE bucket >= ? AND bucket < ?'
+            for name, _, _ in plan)
+        params: List[Any] = [value for _, lo, hi in plan for value in (lo, hi)]
+        # Sum per series id first and resolve names only for the rows that are returned.
+        inner = f'SELECT series_id, SUM(upload_bytes) AS up, SUM(download_bytes) AS down FROM ({union})'
+        if usernames is not None:
+            usernames = list(dict.fromkeys(usernames))
+            inner += f" WHERE series_id IN (SELECT id FROM series WHERE username IN ({','.join('?' * len(usernames))}))"
+            params += usernames
+        inner += ' GROUP BY series_id ORDER BY up + down DESC, series_id'
+        if limit:
+            inner += ' LIMIT ?'
+            params.append(int(limit))
+        sql = f'SELECT s.username, t.up, t.down FROM ({inner}) t JOIN series s ON s.id = t.series_id ORDER BY t.up + t.down DESC, s.username'
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return {
+            'start': start,
+            'end': end,
+            'users': [
+                {'username': username, 'upload_bytes': up, 'download_bytes': down, 'total_bytes': up + down}
+                for username, up, down in rows
+            ],
+        }
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,562 @@
+import os
+import json
+import time
+import fcntl
+import uuid
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import UserStore, StoreError
+
+JOURNAL_VERSION = 1
+APPLIED_SEQ_KEY = 'traffic_journal_seq'
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+COUNTER_FIELDS = ('upload_bytes', 'download_bytes', 'status')
+
+
+@dataclass
+class JournalRecord:
+    seq: int
+    timestamp: int
+    traffic: Dict[str, Tuple[int, int]]
+    online: List[str]
+
+
+@dataclass
+class JournalTail:
+    '''The records a store has not folded in yet, summed per user.'''
+    last_seq: int = 0
+    records: int = 0
+    traffic: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # Users reported online by the newest record; None when there is no record.
+    online: Optional[frozenset] = None
+    # Every identity the tail reported online at some point.
+    seen_online: frozenset = frozenset()
+    # Time of the newest record; 0 when there is no record.
+    last_timestamp: int = 0
+
+    def online_map(self) -> Dict[str, bool]:
+        if self.online is None:
+            return {}
+        return {username: username in self.online for username in self.seen_online}
+
+
+class TrafficJournal:
+    '''
+    Append-only log of per-tick traffic deltas.
+
+    The file starts with a header line carrying a random generation id and
+    the sequence number the store had already applied when the file was
+    created. Every tick appends one compact JSON line and fsyncs once, so a
+    tick costs O(active users) no matter how many users exist. Appends,
+    reads and rotation are serialized with flock on a sibling lock file.
+    '''
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f'.{self.path.name}.lock')
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._held = []
+        self._reset()
+
+    # region Internals
+
+    def _reset(self):
+        self._generation: Optional[str] = None
+        self._base_seq = 0
+        self._offset = 0
+        self._records: List[JournalRecord] = []
+        self._signature = None
+        self._cache_key = None
+        self._cache: Optional[JournalTail] = None
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    @contextmanager
+    def _flock(self, mode: int):
+        with self._lock:
+            if self._lock_depth == 0:
+                self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a')
+                fcntl.flock(self._lock_file, mode)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    @staticmethod
+    def _header(base_seq: int) -> bytes:
+        header = {'journal': JOURNAL_VERSION, 'gen': uuid.uuid4().hex, 'base': base_seq}
+        return (json.dumps(header, separators=(',', ':')) + '\n').encode()
+
+    @staticmethod
+    def _encode(record: JournalRecord) -> bytes:
+        return (json.dumps({
+            's': record.seq,
+            't': record.timestamp,
+            'd': {username: [up, down] for username, (up, down) in record.traffic.items()},
+            'o': record.online,
+        }, separators=(',', ':')) + '\n').encode()
+
+    def _catch_up(self):
+        '''Parses whatever was appended since the last call. Caller holds the file lock.'''
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return
+        if signature is None:
+            self._reset()
+            return
+
+        with open(self.path, 'rb') as f:
+            header_line = f.readline()
+            try:
+                header = json.loads(header_line)
+                generation = header['gen']
+            except (ValueError, KeyError, TypeError):
+                raise StoreError(f'{self.path} has an invalid journal header.')
+
+            if generation != self._generation or signature[1] < self._offset:
+                self._reset()
+                self._generation = generation
+                self._base_seq = int(header.get('base', 0))
+                self._offset = len(header_line)
+
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # A torn write from a crash; the next append cuts it off.
+                    break
+                self._offset += len(line)
+                try:
+                    entry = json.loads(line)
+                    record = JournalRecord(
+                        seq=int(entry['s']),
+                        timestamp=int(entry.get('t', 0)),
+                        traffic={username: (int(up), int(down)) for username, (up, down) in entry.get('d', {}).items()},
+                        online=list(entry.get('o', [])),
+                    )
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._records.append(record)
+        self._signature = self._stat_signature()
+
+    # endregion
+
+    def acquire(self):
+        '''
+        Locks the journal exclusively until release(). Unlike a ``with``
+        block this lets the caller keep the lock across a store commit.
+        '''
+        self._lock.acquire()
+        context = self._flock(fcntl.LOCK_EX)
+        context.__enter__()
+        self._held.append(context)
+
+    def release(self):
+        try:
+            self._held.pop().__exit__(None, None, None)
+        finally:
+            self._lock.release()
+
+    @property
+    def last_seq(self) -> int:
+        return self._records[-1].seq if self._records else self._base_seq
+
+    def size(self) -> int:
+        signature = self._stat_signature()
+        return signature[1] if signature else 0
+
+    def append(self, traffic: Dict[str, Tuple[int, int]], online: Iterable[str], applied_seq: int = 0) -> int:
+        '''
+        Appends one tick and fsyncs it. ``applied_seq`` is the last sequence
+        number the store has folded in; numbering continues after it even if
+        the journal file was lost. Returns the new record's sequence number.
+        '''
+        with self._flock(fcntl.LOCK_EX):
+            self._catch_up()
+            if self._generation is None:
+                self.rotate(applied_seq)
+
+            seq = max(self.last_seq, applied_seq) + 1
+            record = JournalRecord(seq, int(time.time()), dict(traffic), sorted(online))
+            line = self._encode(record)
+
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._offset)
+                f.seek(self._offset)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._offset += len(line)
+            self._records.append(record)
+            self._signature = self._stat_signature()
+            return seq
+
+    def tail(self, applied_seq: int = 0) -> JournalTail:
+        '''Sums the records newer than ``applied_seq``.'''
+        with self._lock:
+            if self._stat_signature() != self._signature:
+                with self._flock(fcntl.LOCK_SH):
+                    self._catch_up()
+
+            key = (self._generation, self.last_seq, applied_seq)
+            if key == self._cache_key:
+                return self._cache
+
+            tail = JournalTail(last_seq=max(self.last_seq, applied_seq))
+            traffic: Dict[str, List[int]] = {}
+            seen_online = set()
+            for record in self._records:
+                if record.seq <= applied_seq:
+                    continue
+                tail.records += 1
+                for username, (up, down) in record.traffic.items():
+                    totals = traffic.setdefault(username, [0, 0])
+                    totals[0] += up
+                    totals[1] += down
+                seen_online.update(record.online)
+                tail.online = frozenset(record.online)
+                tail.last_timestamp = record.timestamp
+            tail.traffic = {username: (up, down) for username, (up, down) in traffic.items()}
+            tail.seen_online = frozenset(seen_online)
+
+            self._cache_key, self._cache = key, tail
+            return tail
+
+    def touched_since(self, seq: int) -> Optional[set]:
+        '''
+        Returns the users whose summed counters or online status can differ
+        between the tail as of record ``seq`` and the tail now: everyone with
+        traffic in a newer record plus everyone online in record ``seq`` or
+        in the newest one. None if record ``seq`` is no longer in the file.
+        '''
+        with self._lock:
+            if self._stat_signature() != self._signature:
+                with self._flock(fcntl.LOCK_SH):
+                    self._catch_up()
+            before = next((record for record in self._records if record.seq == seq), None)
+            if before is None:
+                return None
+            touched = set(before.online)
+            for record in self._records:
+                if record.seq > seq:
+                    touched.update(record.traffic)
+            touched.update(self._records[-1].online)
+            return touched
+
+    def rotate(self, base_seq: int):
+        '''
+        Atomically replaces the journal with an empty one that starts after
+        ``base_seq``. Records newer than ``base_seq`` are carried over.
+        '''
+        with self._flock(fcntl.LOCK_EX):
+            self._catch_up()
+            carried = [record for record in self._records if record.seq > base_seq]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(self._header(base_seq))
+                for record in carried:
+                    f.write(self._encode(record))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._catch_up()
+
+
+class JournaledUserStore(UserStore):
+    '''
+    Wraps a store so that traffic ticks go to a TrafficJournal instead of
+    rewriting user rows.
+
+    Reads return the wrapped store's values plus the journal tail, so callers
+    always see current totals. compact() folds the tail into the store in one
+    transaction and records the last folded sequence number in the store's
+    meta, which makes folding idempotent if the process dies before the
+    journal is rotated. Writes that rename or remove users or overwrite their
+    counters compact first, so pending deltas are never attached to the
+    wrong user.
+    '''
+
+    def __init__(self, store: UserStore, journal: TrafficJournal):
+        self.store = store
+        self.journal = journal
+        self.name = store.name
+        self._lock = threading.RLock()
+        # Set when the journal outgrew max_bytes inside a transaction.
+        self._compact_due = False
+
+    @property
+    def derived(self):
+        return self.store.derived
+
+    # region Internals
+
+    def _applied_seq(self) -> int:
+        return int(self.store.get_meta(APPLIED_SEQ_KEY, '0') or 0)
+
+    def _tail(self) -> JournalTail:
+        return self.journal.tail(self._applied_seq())
+
+    @staticmethod
+    def _overlay(username: str, user: Optional[Dict[str, Any]], tail: JournalTail) -> Optional[Dict[str, Any]]:
+        if user is None or tail.records == 0:
+            return user
+        up, down = tail.traffic.get(username, (0, 0))
+        user = dict(user)
+        if up or down:
+            user['upload_bytes'] = int(user.get('upload_bytes', 0) or 0) + up
+            user['download_bytes'] = int(user.get('download_bytes', 0) or 0) + down
+        user['status'] = 'Online' if username in tail.online else 'Offline'
+        return user
+
+    @staticmethod
+    def _tail_only_user(username: str, tail: JournalTail) -> Dict[str, Any]:
+        up, down = tail.traffic.get(username, (0, 0))
+        return {
+            'upload_bytes': up,
+            'download_bytes': down,
+            'status': 'Online' if username in tail.online else 'Offline',
+        }
+
+    def _tail_only_users(self, tail: JournalTail) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Identities the Hysteria2 API reported that are not in the store yet,
+        # shown the same way apply_traffic() would store them.
+        for username in sorted(set(tail.traffic) | tail.seen_online):
+            if self.store.exists(username):
+                continue
+            yield username, self._tail_only_user(username, tail)
+
+    # endregion
+
+    @contextmanager
+    def transaction(self):
+        with self.store.transaction():
+            yield self
+        if self._compact_due and not self.store.in_transaction:
+            self.compact()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.store.in_transaction
+
+    # region Read
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        user = self.store.get(username)
+        return self._overlay(username, user, self._tail())
+
+    def get_by_password(self, password: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        match = self.store.get_by_password(password)
+        if match is None:
+            return None
+        return match[0], self._overlay(match[0], match[1], self._tail())
+
+    def get_by_token(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        match = self.store.get_by_token(token)
+        if match is None:
+            return None
+        return match[0], self._overlay(match[0], match[1], self._tail())
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        return self.store.exists(username, ignore_case)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        tail = self._tail()
+        for username, user in self.store.items():
+            yield username, self._overlay(username, user, tail)
+        if tail.records:
+            yield from self._tail_only_users(tail)
+
+    def scan(self, since: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any], Optional[float]]]:
+        tail = self._tail()
+        if not tail.records:
+            yield from self.store.scan(since)
+            return
+        # Users the tail changes count as modified when its newest record was
+        # written (rounded up: record times are whole seconds). If that is
+        # inside the window the wrapped store's own filter would hide them, so
+        # every row is read and filtered here instead.
+        touched_at = tail.last_timestamp + 1
+        widen = since is not None and touched_at >= since
+        for username, user, updated_at in self.store.scan(None if widen else since):
+            overlaid = self._overlay(username, user, tail)
+            if overlaid != user:
+                updated_at = max(updated_at or 0, touched_at)
+            if since is None or updated_at is None or updated_at >= since:
+                yield username, overlaid, updated_at
+        if widen or since is None:
+            for username, user in self._tail_only_users(tail):
+                yield username, user, touched_at
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def traffic_totals(self) -> Tuple[int, int]:
+        upload, download = self.store.traffic_totals()
+        for up, down in self._tail().traffic.values():
+            upload += up
+            download += down
+        return upload, download
+
+    def change_token(self) -> Any:
+        inner = self.store.change_token()
+        if inner is None:
+            return None
+        return inner, self._tail().last_seq
+
+    def traffic_changes(self, token: Any) -> Optional[Dict[str, Dict[str, Any]]]:
+        # Only journal records since the token: the users they touched, read
+        # by primary key. Costs O(tail), not O(users).
+        if not isinstance(token, tuple) or len(token) != 2 or token[0] is None:
+            return None
+        inner, seq = token
+        if inner != self.store.change_token():
+            return None
+        tail = self._tail()
+        if tail.last_seq == seq:
+            return {}
+        if seq <= self._applied_seq():
+            # The token predates the tail, when statuses came from the rows.
+            return None
+        touched = self.journal.touched_since(seq)
+        if touched is None:
+            return None
+        changes = {}
+        for username in touched:
+            user = self.store.get(username)
+            if user is None:
+                if username not in tail.traffic and username not in tail.seen_online:
+                    continue
+                changes[username] = self._tail_only_user(username, tail)
+            else:
+                changes[username] = self._overlay(username, user, tail)
+        return changes
+
+    # endregion
+
+    # region Write
+
+    def add(self, username: str, data: Dict[str, Any]) -> None:
+        self.store.add(username, data)
+
+    def add_many(self, users: Dict[str, Dict[str, Any]]) -> int:
+        return self.store.add_many(users)
+
+    def update(self, username: str, changes: Dict[str, Any]) -> bool:
+        with self.store.transaction():
+            if any(key in changes for key in COUNTER_FIELDS):
+                self.compact()
+            return self.store.update(username, changes)
+
+    def rename(self, old_username: str, new_username: str) -> None:
+        with self.store.transaction():
+            self.compact()
+            self.store.rename(old_username, new_username)
+
+    def remove(self, username: str) -> bool:
+        with self.store.transaction():
+            self.compact()
+            return self.store.remove(username)
+
+    def replace_all(self, users: Dict[str, Dict[str, Any]]) -> None:
+        # A restore brings its own counters: pending deltas belong to the old data set.
+        outermost = not self.store.in_transaction
+        acquired = False
+        try:
+            with self.store.transaction():
+                self.journal.acquire()
+                acquired = True
+                self.store.replace_all(users)
+                last_seq = self._tail().last_seq
+                self.store.set_meta(APPLIED_SEQ_KEY, str(last_seq))
+            if outermost:
+                self.journal.rotate(last_seq)
+        finally:
+            if acquired:
+                self.journal.release()
+
+    def apply_traffic(self, traffic: Dict[str, Tuple[int, int]], online: Dict[str, bool]) -> None:
+        traffic = {username: (up, down) for username, (up, down) in traffic.items() if up or down}
+        self.journal.append(traffic, [username for username, is_online in online.items() if is_online],
+                            self._applied_seq())
+        if self.journal.size() >= self.journal.max_bytes:
+            # Inside a transaction compact() could not rotate the journal:
+            # leave it to the end of the outermost one.
+            if self.store.in_transaction:
+                self._compact_due = True
+            else:
+                self.compact()
+
+    def add_traffic(self, traffic: Dict[str, Tuple[int, int]]) -> int:
+        # Deltas add up, so the tail can stay where it is.
+        return self.store.add_traffic(traffic)
+
+    def compact(self) -> int:
+        '''
+        Folds the journal tail into the wrapped store. Returns the number of
+        records folded.
+
+        The store transaction is opened before the journal is locked (the
+        same order every writer uses), and the journal stays locked until
+        the store has committed and the journal has been rotated, so no
+        concurrent append can be lost. Inside an outer transaction the
+        journal is left in place; the stored sequence number keeps the
+        folded records from being counted twice.
+        '''
+        with self._lock:
+            outermost = not self.store.in_transaction
+            if outermost:
+                self._compact_due = False
+            acquired = False
+            try:
+                with self.store.transaction():
+                    self.journal.acquire()
+                    acquired = True
+                    tail = self._tail()
+                    if tail.records:
+                        self.store.apply_traffic(tail.traffic, tail.online_map())
+                        self.store.set_meta(APPLIED_SEQ_KEY, str(tail.last_seq))
+                if outermost and (tail.records or self.journal.size() >= self.journal.max_bytes):
+                    self.journal.rotate(tail.last_seq)
+            finally:
+                if acquired:
+                    self.journal.release()
+            return tail.records
+
+    # endregion
+
+    def export_json(self, path=None) -> None:
+        self.compact()
+        self.store.export_json(path)
+
+    def write_auth_snapshot(self, users: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+        self.compact()
+        return self.store.write_auth_snapshot(users)
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.store.get_meta(key, default)
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.store.set_meta(key, value)
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,237 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .base import UserStore, UserExistsError, UserNotFoundError, StoreError, normalize_user
+
+
+def write_users_json(path: Path, users: Dict[str, Dict[str, Any]]) -> None:
+    '''Atomically replaces a users.json file (write to a temp file, then rename).'''
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(users, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JSONUserStore(UserStore):
+    '''
+    Legacy backend: the whole users.json file is the database.
+
+    Every operation reads and rewrites the full file, exactly like the
+    scripts used to do. It is kept as a fallback for hosts that cannot use
+    SQLite and as the reference implementation of the store semantics.
+    '''
+
+    name = 'json'
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f'.{self.path.name}.lock')
+        self.meta_path = self.path.with_name(f'.{self.path.name}.meta')
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._data: Optional[Dict[str, Dict[str, Any]]] = None
+        self._meta: Optional[Dict[str, str]] = None
+        self._dirty = False
+        self._meta_dirty = False
+        self._lock_file = None
+
+    # region Internals
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._data is not None:
+            return self._data
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                content = f.read()
+            return json.loads(content) if content.strip() else {}
+        except json.JSONDecodeError as e:
+            raise StoreError(f'{self.path} contains invalid JSON: {e}')
+
+    def _load_meta(self) -> Dict[str, str]:
+        if self._meta is not None:
+            return self._meta
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _writing(self):
+        with self.transaction():
+            yield self._data
+            self._dirty = True
+
+    # endregion
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'w')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self._data = self._load()
+                self._meta = self._load_meta()
+                self._dirty = False
+                self._meta_dirty = False
+            self._depth += 1
+            try:
+                yield self
+                if outermost and self._dirty:
+                    write_users_json(self.path, self._data)
+                    self._committed()
+                if outermost and self._meta_dirty:
+                    write_users_json(self.meta_path, self._meta)
+            finally:
+                self._depth -= 1
+                if outermost:
+                    self._data = None
+                    self._meta = None
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    # region Read
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        user = self._load().get(username)
+        return dict(user) if user is not None else None
+
+    def get_by_password(self, password: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        for username, user in self._load().items():
+            if user.get('password') == password:
+                return username, dict(user)
+        return None
+
+    def get_by_token(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        for username, user in self._load().items():
+            if user.get('token') == token:
+                return username, dict(user)
+        return None
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        users = self._load()
+        if not ignore_case:
+            return username in users
+        username_lower = username.lower()
+        return any(existing.lower() == username_lower for existing in users)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for username, user in self._load().items():
+            yield username, dict(user)
+
+    def scan(self, since: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any], Optional[float]]]:
+        # Users carry no modification times here, but an untouched file means nobody changed.
+        if since is not None and self._data is None:
+            try:
+                if self.path.stat().st_mtime < since:
+                    return
+            except FileNotFoundError:
+                return
+        yield from super().scan(since)
+
+    def count(self) -> int:
+        return len(self._load())
+
+    def traffic_totals(self) -> Tuple[int, int]:
+        users = self._load().values()
+        upload = sum(int(user.get('upload_bytes', 0) or 0) for user in users)
+        download = sum(int(user.get('download_bytes', 0) or 0) for user in users)
+        return upload, download
+
+    def change_token(self) -> Any:
+        signature = []
+        for path in (self.path, self.meta_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    # endregion
+
+    # region Write
+
+    def add(self, username: str, data: Dict[str, Any]) -> None:
+        with self._writing() as users:
+            if username in users:
+                raise UserExistsError(f"User '{username}' already exists.")
+            users[username] = normalize_user(data)
+
+    def add_many(self, users: Dict[str, Dict[str, Any]]) -> int:
+        with self._writing() as existing:
+            for username in users:
+                if username in existing:
+                    raise UserExistsError(f"User '{username}' already exists.")
+            existing.update({username: normalize_user(data) for username, data in users.items()})
+        return len(users)
+
+    def update(self, username: str, changes: Dict[str, Any]) -> bool:
+        with self._writing() as users:
+            if username not in users:
+                return False
+            users[username].update(normalize_user(changes))
+        return True
+
+    def rename(self, old_username: str, new_username: str) -> None:
+        if old_username == new_username:
+            return
+        with self._writing() as users:
+            if old_username not in users:
+                raise UserNotFoundError(f"User '{old_username}' not found.")
+            if new_username in users:
+                raise UserExistsError(f"User '{new_username}' already exists.")
+            users[new_username] = users.pop(old_username)
+
+    def remove(self, username: str) -> bool:
+        with self._writing() as users:
+            return users.pop(username, None) is not None
+
+    def replace_all(self, users: Dict[str, Dict[str, Any]]) -> None:
+        with self._writing() as existing:
+            existing.clear()
+            existing.update({username: normalize_user(data) for username, data in users.items()})
+
+    def apply_traffic(self, traffic: Dict[str, Tuple[int, int]], online: Dict[str, bool]) -> None:
+        with self._writing() as users:
+            for user in users.values():
+                user['status'] = 'Offline'
+            for username, is_online in online.items():
+                users.setdefault(username, {'upload_bytes': 0, 'download_bytes': 0})
+                users[username]['status'] = 'Online' if is_online else 'Offline'
+            for username, (upload, download) in traffic.items():
+                user = users.setdefault(username, {'upload_bytes': 0, 'download_bytes': 0, 'status': 'Offline'})
+                user['upload_bytes'] = user.get('upload_bytes', 0) + upload
+                user['download_bytes'] = user.get('download_bytes', 0) + download
+
+    # endregion
+
+    def export_json(self, path=None) -> None:
+        if path is None or Path(path) == self.path:
+            return
+        write_users_json(Path(path), self._load())
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self._load_meta().get(key, default)
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.transaction():
+            self._meta[key] = value
+            self._meta_dirty = True
@@ -0,0 +1,63 @@
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict
+
+from .base import UserStore, StoreError
+
+
+def load_users_json(path: Path) -> Dict[str, Dict[str, Any]]:
+    '''Reads a users.json file, returning an empty mapping if it is missing or empty.'''
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        content = f.read()
+    if not content.strip():
+        return {}
+    try:
+        users = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise StoreError(f'{path} contains invalid JSON: {e}')
+    if not isinstance(users, dict):
+        raise StoreError(f'{path} does not contain a JSON object of users.')
+    return users
+
+
+def find_duplicates(users: Dict[str, Dict[str, Any]], field: str) -> Dict[str, list[str]]:
+    '''Returns {value: [usernames]} for every value of ``field`` shared by several users.'''
+    counts = Counter(user.get(field) for user in users.values() if user.get(field))
+    return {
+        value: [username for username, user in users.items() if user.get(field) == value]
+        for value, count in counts.items() if count > 1
+    }
+
+
+def migrate_from_json(store: UserStore, json_path: Path, replace: bool = False) -> int:
+    '''
+    Imports a users.json file into ``store`` in a single transaction.
+
+    Duplicate passwords cannot be represented in the indexed store, so they
+    abort the migration instead of silently changing someone's credentials.
+    Duplicate tokens are only used for the web subscription page and are
+    dropped from all but the first user.
+
+    Returns the number of imported users.
+    '''
+    users = load_users_json(json_path)
+
+    duplicate_passwords = find_duplicates(users, 'password')
+    if duplicate_passwords:
+        shared = '; '.join(', '.join(names) for names in duplicate_passwords.values())
+        raise StoreError(f'Cannot migrate {json_path}: these users share a password: {shared}')
+
+    for usernames in find_duplicates(users, 'token').values():
+        for username in usernames[1:]:
+            users[username] = {key: value for key, value in users[username].items() if key != 'token'}
+
+    with store.transaction():
+        if replace:
+            store.replace_all(users)
+        else:
+            store.add_many({username: user for username, user in users.items() if not store.exists(username)})
+    return len(users)
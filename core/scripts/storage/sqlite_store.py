@@ -0,0 +1,337 @@
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .base import UserStore, UserExistsError, UserNotFoundError, StoreError, USER_FIELDS, BOOL_FIELDS, normalize_user
+from .json_store import write_users_json
+
+# Each entry upgrades the schema by one version (PRAGMA user_version).
+MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT,
+        max_download_bytes INTEGER,
+        expiration_days INTEGER,
+        account_creation_date TEXT,
+        blocked INTEGER,
+        unlimited_user INTEGER,
+        token TEXT,
+        upload_bytes INTEGER NOT NULL DEFAULT 0,
+        download_bytes INTEGER NOT NULL DEFAULT 0,
+        status TEXT,
+        extra TEXT
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_users_password ON users(password);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_users_token ON users(token);
+    CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    ''',
+    # Last modification time of each row, for incremental exports. Existing
+    # rows count as modified when the column is added.
+    '''
+    ALTER TABLE users ADD COLUMN updated_at REAL;
+    UPDATE users SET updated_at = CAST(strftime('%s', 'now') AS REAL);
+    CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
+    ''',
+]
+
+COLUMNS = ('username',) + USER_FIELDS + ('extra',)
+SELECT_COLUMNS = ', '.join(COLUMNS)
+# Rows fetched per round trip by scan(); the lock is released in between.
+SCAN_BATCH = 500
+
+
+class SQLiteUserStore(UserStore):
+    '''
+    Indexed SQLite backend (WAL mode).
+
+    Single-user reads and writes touch one row through the primary key or
+    one of the unique password/token indexes, so their cost does not grow
+    with the number of users. When ``export_path`` is set the legacy
+    users.json file is regenerated in the background after committed
+    writes (see derived.py) for consumers that still read it (limit.sh,
+    user.sh).
+    '''
+
+    name = 'sqlite'
+
+    def __init__(self, path: Path, export_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.export_path = Path(export_path) if export_path else None
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=30000')
+        self._migrate()
+
+    # region Internals
+
+    def _migrate(self):
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            for index in range(version, len(MIGRATIONS)):
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for statement in MIGRATIONS[index].split(';'):
+                        if statement.strip():
+                            self._conn.execute(statement)
+                    self._conn.execute(f'PRAGMA user_version={index + 1}')
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+
+    @staticmethod
+    def _row_to_user(row: sqlite3.Row) -> Dict[str, Any]:
+        user: Dict[str, Any] = {}
+        for key in USER_FIELDS:
+            value = row[key]
+            if value is None:
+                continue
+            user[key] = bool(value) if key in BOOL_FIELDS else value
+        if row['extra']:
+            user.update(json.loads(row['extra']))
+        return user
+
+    @staticmethod
+    def _user_to_params(username: str, data: Dict[str, Any]) -> Tuple[Any, ...]:
+        user = normalize_user(data)
+        extra = {key: value for key, value in user.items() if key not in USER_FIELDS}
+        params = [username]
+        for key in USER_FIELDS:
+            value = user.get(key)
+            if key in ('upload_bytes', 'download_bytes') and value is None:
+                value = 0
+            params.append(value)
+        params.append(json.dumps(extra) if extra else None)
+        return tuple(params)
+
+    @staticmethod
+    def _integrity_error(e: sqlite3.IntegrityError, username: str) -> StoreError:
+        message = str(e)
+        if 'users.username' in message:
+            return UserExistsError(f"User '{username}' already exists.")
+        if 'users.password' in message:
+            return UserExistsError(f"Password for user '{username}' is already used by another user.")
+        if 'users.token' in message:
+            return UserExistsError(f"Token for user '{username}' is already used by another user.")
+        return StoreError(f'Integrity error for user {username}: {message}')
+
+    def _query_one(self, sql: str, params: Tuple[Any, ...]) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _execute(self, sql: str, params: Tuple[Any, ...] = ()) -> sqlite3.Cursor:
+        with self.transaction():
+            self._dirty = True
+            return self._conn.execute(sql, params)
+
+    # endregion
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._dirty = False
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self._conn.execute('ROLLBACK')
+                raise
+            self._depth -= 1
+            if outermost:
+                self._conn.execute('COMMIT')
+                if self._dirty:
+                    self._committed()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    # region Read
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._query_one(f'SELECT {SELECT_COLUMNS} FROM users WHERE username = ?', (username,))
+        return self._row_to_user(row) if row else None
+
+    def get_by_password(self, password: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        row = self._query_one(f'SELECT {SELECT_COLUMNS} FROM users WHERE password = ?', (password,))
+        return (row['username'], self._row_to_user(row)) if row else None
+
+    def get_by_token(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        row = self._query_one(f'SELECT {SELECT_COLUMNS} FROM users WHERE token = ?', (token,))
+        return (row['username'], self._row_to_user(row)) if row else None
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        if ignore_case:
+            sql = 'SELECT 1 FROM users WHERE username = ? COLLATE NOCASE LIMIT 1'
+        else:
+            sql = 'SELECT 1 FROM users WHERE username = ? LIMIT 1'
+        return self._query_one(sql, (username,)) is not None
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {SELECT_COLUMNS} FROM users ORDER BY rowid').fetchall()
+        for row in rows:
+            yield row['username'], self._row_to_user(row)
+
+    def scan(self, since: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any], Optional[float]]]:
+        # Keyset paging over rowid: memory stays at one batch and writers are
+        # not blocked for the length of the export. Each row is consistent,
+        # the export as a whole is not a snapshot.
+        condition = '' if since is None else 'AND (updated_at IS NULL OR updated_at >= ?)'
+        sql = f'SELECT rowid, {SELECT_COLUMNS}, updated_at FROM users WHERE rowid > ? {condition} ORDER BY rowid LIMIT ?'
+        last_rowid = 0
+        while True:
+            params = (last_rowid,) + (() if since is None else (since,)) + (SCAN_BATCH,)
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            for row in rows:
+                yield row['username'], self._row_to_user(row), row['updated_at']
+            if len(rows) < SCAN_BATCH:
+                return
+            last_rowid = rows[-1]['rowid']
+
+    def count(self) -> int:
+        return self._query_one('SELECT COUNT(*) FROM users', ())[0]
+
+    def traffic_totals(self) -> Tuple[int, int]:
+        row = self._query_one('SELECT COALESCE(SUM(upload_bytes), 0), COALESCE(SUM(download_bytes), 0) FROM users', ())
+        return int(row[0]), int(row[1])
+
+    def change_token(self) -> Any:
+        # data_version moves on commits by other connections, total_changes on our own.
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0], self._conn.total_changes
+
+    # endregion
+
+    # region Write
+
+    def add(self, username: str, data: Dict[str, Any]) -> None:
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        try:
+            self._execute(f'INSERT INTO users ({SELECT_COLUMNS}, updated_at) VALUES ({placeholders}, ?)',
+                          self._user_to_params(username, data) + (time.time(),))
+        except sqlite3.IntegrityError as e:
+            raise self._integrity_error(e, username)
+
+    def add_many(self, users: Dict[str, Dict[str, Any]]) -> int:
+        with self.transaction():
+            for username, data in users.items():
+                self.add(username, data)
+        return len(users)
+
+    def update(self, username: str, changes: Dict[str, Any]) -> bool:
+        changes = normalize_user(changes)
+        known = {key: value for key, value in changes.items() if key in USER_FIELDS}
+        extra = {key: value for key, value in changes.items() if key not in USER_FIELDS}
+        with self.transaction():
+            if extra:
+                row = self._query_one('SELECT extra FROM users WHERE username = ?', (username,))
+                if row is None:
+                    return False
+                merged = json.loads(row['extra']) if row['extra'] else {}
+                merged.update(extra)
+                known['extra'] = json.dumps(merged)
+            if not known:
+                return self.exists(username)
+            known['updated_at'] = time.time()
+            assignments = ', '.join(f'{key} = ?' for key in known)
+            try:
+                cursor = self._execute(f'UPDATE users SET {assignments} WHERE username = ?',
+                                       tuple(known.values()) + (username,))
+            except sqlite3.IntegrityError as e:
+                raise self._integrity_error(e, username)
+            return cursor.rowcount > 0
+
+    def rename(self, old_username: str, new_username: str) -> None:
+        if old_username == new_username:
+            return
+        with self.transaction():
+            if not self.exists(old_username):
+                raise UserNotFoundError(f"User '{old_username}' not found.")
+            try:
+                self._execute('UPDATE users SET username = ?, updated_at = ? WHERE username = ?',
+                              (new_username, time.time(), old_username))
+            except sqlite3.IntegrityError as e:
+                raise self._integrity_error(e, new_username)
+
+    def remove(self, username: str) -> bool:
+        return self._execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+
+    def replace_all(self, users: Dict[str, Dict[str, Any]]) -> None:
+        with self.transaction():
+            self._execute('DELETE FROM users')
+            self.add_many(users)
+
+    def apply_traffic(self, traffic: Dict[str, Tuple[int, int]], online: Dict[str, bool]) -> None:
+        online_users = [username for username, is_online in online.items() if is_online]
+        now = time.time()
+        with self.transaction():
+            self._execute("UPDATE users SET status = 'Offline', updated_at = ? WHERE status IS NULL OR status != 'Offline'",
+                          (now,))
+            for username in online:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO users (username, upload_bytes, download_bytes, status, updated_at) "
+                    "VALUES (?, 0, 0, 'Offline', ?)",
+                    (username, now))
+            self._conn.executemany("UPDATE users SET status = 'Online', updated_at = ? WHERE username = ?",
+                                   [(now, username) for username in online_users])
+            for username, (upload, download) in traffic.items():
+                cursor = self._conn.execute(
+                    'UPDATE users SET upload_bytes = upload_bytes + ?, download_bytes = download_bytes + ?, '
+                    'updated_at = ? WHERE username = ?',
+                    (upload, download, now, username))
+                if cursor.rowcount == 0:
+                    self._conn.execute(
+                        "INSERT INTO users (username, upload_bytes, download_bytes, status, updated_at) "
+                        "VALUES (?, ?, ?, 'Offline', ?)",
+                        (username, upload, download, now))
+
+    def add_traffic(self, traffic: Dict[str, Tuple[int, int]]) -> int:
+        now = time.time()
+        with self.transaction():
+            # Through _execute so the commit refreshes the derived files (quota flags).
+            return sum(self._execute(
+                'UPDATE users SET upload_bytes = upload_bytes + ?, download_bytes = download_bytes + ?, '
+                'updated_at = ? WHERE username = ?',
+                (upload, download, now, username)).rowcount for username, (upload, download) in traffic.items())
+
+    # endregion
+
+    def export_json(self, path=None) -> None:
+        target = Path(path) if path else self.export_path
+        if target is None:
+            raise StoreError('No export path configured for the SQLite user store.')
+        write_users_json(target, self.all())
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._query_one('SELECT value FROM meta WHERE key = ?', (key,))
+        return row['value'] if row else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.transaction():
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,247 @@
+'''
+Sorted, filterable view of the user store for paged listings (web panel
+and API).
+
+The index is refreshed only when the store's change_token() moves. Each
+sort order is computed once per rebuild and each filtered view once per
+(sort, filters), so paging through a large store costs a slice per request
+instead of a full read, parse and sort. When the store can tell that only
+traffic moved (UserStore.traffic_changes(), e.g. a collector tick going to
+the journal), just the touched rows are replaced: the name and expiry
+orders stay valid and only the usage order and filtered views are redone.
+'''
+
+import time
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .auth_snapshot import auth_entry
+
+SORT_KEYS = ('name', 'usage', 'expiry')
+STATUSES = ('online', 'offline', 'on-hold', 'not-active')
+NEAR_QUOTA_RATIO = 0.9
+MAX_LIMIT = 1000
+# Filtered views kept per index version.
+FILTER_CACHE_SIZE = 32
+
+NEVER = float('inf')
+
+
+class ListFilters(NamedTuple):
+    status: Optional[str] = None
+    blocked: Optional[bool] = None
+    expired: Optional[bool] = None
+    near_quota: Optional[bool] = None
+    prefix: Optional[str] = None
+
+
+class UserPage(NamedTuple):
+    items: List[Tuple[str, Dict[str, Any]]]
+    total: int
+    offset: int
+    limit: int
+    next_cursor: Optional[str]
+
+
+class _Row(NamedTuple):
+    username: str
+    user: Dict[str, Any]
+    name: str
+    used: int
+    quota: int
+    expires_at: float
+    status: str
+    blocked: bool
+
+
+def _row(username: str, user: Dict[str, Any]) -> _Row:
+    _, _, expires_at = auth_entry(user)
+    if not user.get('account_creation_date'):
+        status = 'on-hold'
+    else:
+        status = str(user.get('status') or 'Not Active').strip().lower().replace(' ', '-')
+    return _Row(
+        username=username,
+        user=user,
+        name=username.lower(),
+        used=int(user.get('upload_bytes', 0) or 0) + int(user.get('download_bytes', 0) or 0),
+        quota=int(user.get('max_download_bytes', 0) or 0),
+        expires_at=expires_at or NEVER,
+        status=status,
+        blocked=bool(user.get('blocked')),
+    )
+
+
+def _sort_key(row: _Row, sort: str) -> tuple:
+    if sort == 'usage':
+        return row.used, row.name
+    if sort == 'expiry':
+        return row.expires_at, row.name
+    return (row.name,)
+
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    raw = json.dumps([sort, ['inf' if value == NEVER else value for value in key]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    '''Returns the sort key a cursor points after; raises ValueError if it is not for this sort.'''
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+    if cursor_sort != sort or not isinstance(key, list):
+        raise ValueError('The cursor belongs to a different sort order.')
+    return tuple(NEVER if value == 'inf' else value for value in key)
+
+
+class UserIndex:
+    '''
+    Paged queries over a UserStore (or a fixed set of users when built with
+    from_users()). Safe to share between threads.
+    '''
+
+    def __init__(self, store=None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version: Any = object()
+        self._rows: List[_Row] = []
+        self._positions: Dict[str, int] = {}
+        self._orders: Dict[str, Tuple[List[int], List[tuple]]] = {}
+        self._filtered: 'OrderedDict[tuple, Tuple[List[int], List[tuple]]]' = OrderedDict()
+
+    @classmethod
+    def from_users(cls, users: Dict[str, Dict[str, Any]]) -> 'UserIndex':
+        index = cls()
+        index._load(users.items(), version=None)
+        return index
+
+    def _load(self, items: Iterable[Tuple[str, Dict[str, Any]]], version: Any) -> None:
+        self._rows = [_row(username, user) for username, user in items]
+        self._positions = {row.username: position for position, row in enumerate(self._rows)}
+        self._orders = {}
+        self._filtered.clear()
+        self._version = version
+
+    def _apply_traffic_changes(self, changes: Dict[str, Dict[str, Any]]) -> bool:
+        '''Replaces the touched rows in place; False if a user appeared, so a reload is needed.'''
+        if any(username not in self._positions for username in changes):
+            return False
+        for username, user in changes.items():
+            self._rows[self._positions[username]] = _row(username, user)
+        if changes:
+            # Names and expiry dates did not move; usage and the filters that look at it may have.
+            self._orders.pop('usage', None)
+            self._filtered.clear()
+        return True
+
+    def refresh(self) -> None:
+        '''Brings the index up to date if the store changed since the last query.'''
+        if self.store is None:
+            return
+        token = self.store.change_token()
+        if token is not None and token == self._version:
+            return
+        changes = self.store.traffic_changes(self._version) if token is not None else None
+        if changes is not None and self._apply_traffic_changes(changes):
+            self._version = token
+        else:
+            self._load(self.store.items(), token)
+
+    def _order(self, sort: str) -> Tuple[List[int], List[tuple]]:
+        '''Row positions in ascending sort order, with their sort keys.'''
+        order = self._orders.get(sort)
+        if order is None:
+            keys = [_sort_key(row, sort) for row in self._rows]
+            positions = sorted(range(len(self._rows)), key=keys.__getitem__)
+            order = self._orders[sort] = (positions, [keys[position] for position in positions])
+        return order
+
+    def _matches(self, row: _Row, filters: ListFilters, now: float) -> bool:
+        if filters.prefix and not row.name.startswith(filters.prefix):
+            return False
+        if filters.status is not None and row.status != filters.status:
+            return False
+        if filters.blocked is not None and row.blocked != filters.blocked:
+            return False
+        if filters.expired is not None and (row.expires_at <= now) != filters.expired:
+            return False
+        if filters.near_quota is not None:
+            near = row.quota > 0 and row.used >= row.quota * NEAR_QUOTA_RATIO
+            if near != filters.near_quota:
+                return False
+        return True
+
+    def _view(self, sort: str, filters: ListFilters, now: float) -> Tuple[List[int], List[tuple]]:
+        positions, keys = self._order(sort)
+        if filters == ListFilters():
+            return positions, keys
+        # Whether a user is expired changes with time, so such views expire each minute.
+        cache_key = (sort, filters, int(now // 60) if filters.expired is not None else None)
+        view = self._filtered.get(cache_key)
+        if view is not None:
+            self._filtered.move_to_end(cache_key)
+            return view
+
+        if filters.prefix and sort == 'name':
+            # Names are the sort key here, so the prefix is a contiguous range.
+            start = bisect_left(keys, (filters.prefix,))
+            end = bisect_left(keys, (filters.prefix + '\uffff',))
+            candidates = range(start, end)
+        else:
+            candidates = range(len(positions))
+        rows = self._rows
+        selected = [i for i in candidates if self._matches(rows[positions[i]], filters, now)]
+        view = ([positions[i] for i in selected], [keys[i] for i in selected])
+
+        self._filtered[cache_key] = view
+        if len(self._filtered) > FILTER_CACHE_SIZE:
+            self._filtered.popitem(last=False)
+        return view
+
+    def query(self, filters: ListFilters = ListFilters(), sort: str = 'name', descending: bool = False,
+              offset: int = 0, limit: int = 50, cursor: Optional[str] = None) -> UserPage:
+        '''
+        Returns one page of (username, user) pairs. With a cursor (the
+        next_cursor of a previous page) offset is ignored and the page starts
+        right after the last user of that page, even if users were added or
+        removed in between.
+        '''
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}'. Use one of: {', '.join(SORT_KEYS)}.")
+        if filters.status is not None and filters.status not in STATUSES:
+            raise ValueError(f"Unknown status '{filters.status}'. Use one of: {', '.join(STATUSES)}.")
+        limit = max(1, min(limit, MAX_LIMIT))
+        offset = max(0, offset)
+        if filters.prefix:
+            filters = filters._replace(prefix=filters.prefix.lower())
+
+        with self._lock:
+            self.refresh()
+            positions, keys = self._view(sort, filters, time.time())
+            total = len(positions)
+            if cursor is not None:
+                after = decode_cursor(cursor, sort)
+                if descending:
+                    end = bisect_left(keys, after)
+                    offset = total - end
+                else:
+                    offset = bisect_right(keys, after)
+            if descending:
+                end = total - offset
+                selected = list(range(max(0, end - limit), max(0, end)))[::-1]
+            else:
+                selected = list(range(offset, min(total, offset + limit)))
+            items = [(self._rows[positions[i]].username, self._rows[positions[i]].user) for i in selected]
+            if descending:
+                more = bool(selected) and selected[-1] > 0
+            else:
+                more = bool(selected) and selected[-1] < total - 1
+            next_cursor = encode_cursor(sort, keys[selected[-1]]) if more else None
+        return UserPage(items=items, total=total, offset=offset, limit=limit, next_cursor=next_cursor)
@@ -9,6 +9,7 @@ if str(core_scripts_dir) not in sys.path:
     sys.path.append(str(core_scripts_dir))
 
 from paths import TELEGRAM_ENV
+import services_status
 
 
 
@@ -33,7 +34,7 @@ WantedBy=multi-user.target
 """)
 
 def start_service(api_token, admin_user_ids):
-    if subprocess.run(["systemctl", "is-active", "--quiet", "hysteria-telegram-bot.service"]).returncode == 0:
+    if services_status.is_active("hysteria-telegram-bot.service", fresh=True):
         print("The hysteria-telegram-bot.service is already running.")
         return
 
@@ -43,8 +44,9 @@ def start_service(api_token, admin_user_ids):
     subprocess.run(["systemctl", "daemon-reload"])
     subprocess.run(["systemctl", "enable", "hysteria-telegram-bot.service"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     subprocess.run(["systemctl", "start", "hysteria-telegram-bot.service"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    services_status.invalidate()
 
-    if subprocess.run(["systemctl", "is-active", "--quiet", "hysteria-telegram-bot.service"]).returncode == 0:
+    if services_status.is_active("hysteria-telegram-bot.service", fresh=True):
         print("Hysteria bot setup completed. The service is now running.\n")
     else:
         print("Hysteria bot setup completed. The service failed to start.")
@@ -52,6 +54,7 @@ def start_service(api_token, admin_user_ids):
 def stop_service():
     subprocess.run(["systemctl", "stop", "hysteria-telegram-bot.service"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     subprocess.run(["systemctl", "disable", "hysteria-telegram-bot.service"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    services_status.invalidate()
     TELEGRAM_ENV.unlink(missing_ok=True)
     print("\nHysteria bot service stopped and disabled. .env file removed.")
 
@@ -3,6 +3,7 @@ from .adduser import *
 from .backup import *
 from .command import *
 from .deleteuser import *
+from .bulkedit import *
 from .edituser import *
 from .search import *
 from .serverinfo import *
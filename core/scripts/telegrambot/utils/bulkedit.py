@@ -0,0 +1,53 @@
+import re
+from telebot import types
+from utils.command import *
+from utils.common import *
+
+BULK_ACTIONS = ('delete', 'block', 'unblock', 'extend', 'reset')
+# Telegram rejects longer messages.
+MAX_REPLY_LENGTH = 4000
+
+
+@bot.callback_query_handler(func=lambda call: call.data == "cancel_bulk_edit")
+def handle_cancel_bulk_edit(call):
+    bot.edit_message_text("Operation canceled.", chat_id=call.message.chat.id, message_id=call.message.message_id)
+    create_main_markup(call.message)
+
+@bot.message_handler(func=lambda message: is_admin(message.from_user.id) and message.text == 'Bulk Edit')
+def bulk_edit(message):
+    markup = types.InlineKeyboardMarkup()
+    cancel_button = types.InlineKeyboardButton("❌ Cancel", callback_data="cancel_bulk_edit")
+    markup.add(cancel_button)
+
+    msg = bot.reply_to(message, "Send an action and the usernames, for example:\n"
+                                "delete alice bob\n"
+                                "extend 30 alice bob\n\n"
+                                f"Actions: {', '.join(BULK_ACTIONS)} (extend takes a number of days).",
+                       reply_markup=markup)
+    bot.register_next_step_handler(msg, process_bulk_edit)
+
+def process_bulk_edit(message):
+    words = re.split(r'[\s,]+', (message.text or '').strip())
+    action = words[0].lower() if words else ''
+    if action not in BULK_ACTIONS:
+        bot.reply_to(message, f"Unknown action. Use one of: {', '.join(BULK_ACTIONS)}.")
+        return
+
+    days_option = ''
+    usernames = words[1:]
+    if action == 'extend':
+        if not usernames or not usernames[0].isdigit() or int(usernames[0]) <= 0:
+            bot.reply_to(message, "Extend needs a positive number of days first, e.g. extend 30 alice bob.")
+            return
+        days_option = f" -d {usernames[0]}"
+        usernames = usernames[1:]
+
+    usernames = [username.lower() for username in usernames if username]
+    if not usernames or not all(re.match(r'^[a-z0-9_]+$', username) for username in usernames):
+        bot.reply_to(message, "Please give one or more valid usernames.")
+        return
+
+    bot.send_chat_action(message.chat.id, 'typing')
+    command = f"python3 {CLI_PATH} bulk-edit -a {action} -u {','.join(usernames)}{days_option}"
+    result = run_cli_command(command)
+    bot.reply_to(message, result[:MAX_REPLY_LENGTH])
@@ -2,6 +2,7 @@
 
 import sys
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.staticfiles import StaticFiles
 
@@ -17,6 +18,19 @@ HYSTERIA_CORE_DIR = '/etc/hysteria/core/'
 sys.path.append(HYSTERIA_CORE_DIR)
 
 import routers  # noqa: This import should be after the sys.path modification, because it imports cli_api
+import cli_api  # noqa: Same as above
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''
+    Start the server status sampler with the app, at the configured push interval, and stop it on shutdown.
+    It only samples continuously while a dashboard stream is open.
+    '''
+    sampler = await asyncio.to_thread(cli_api.status_sampler)
+    sampler.interval = CONFIGS.STATUS_PUSH_INTERVAL
+    yield
+    sampler.stop()
 
 
 def create_app() -> FastAPI:
@@ -34,6 +48,7 @@ def create_app() -> FastAPI:
         },
         debug=CONFIGS.DEBUG,
         root_path=f'/{CONFIGS.ROOT_PATH}',
+        lifespan=lifespan,
     )
 
     # Set up static files
@@ -11,6 +11,8 @@ class Configs(BaseSettings):
     EXPIRATION_MINUTES: int
     ROOT_PATH: str
     DECOY_PATH: str | None = None
+    # Seconds between server status samples pushed to live dashboards.
+    STATUS_PUSH_INTERVAL: float = 2.0
 
     class Config:
         env_file = '.env'
@@ -1,9 +1,9 @@
+from typing import Optional
 from pydantic import BaseModel
 
 
-# We can't return bytes because the underlying script is returning human readable values which are hard to parse it
-# It's better to chnage the underlying script to return bytes instead of changing it here
-# Because of this problem we use str type instead of int as type
+# The string fields are preformatted for display (kept for existing clients);
+# the numeric fields carry the same values in raw units.
 class ServerStatusResponse(BaseModel):
     # System Info
     uptime: str
@@ -29,6 +29,19 @@ class ServerStatusResponse(BaseModel):
     user_downloaded_traffic: str
     user_total_traffic: str
 
+    # Raw values
+    sampled_at: Optional[float] = None
+    uptime_seconds: Optional[float] = None
+    cpu_percent: Optional[float] = None
+    ram_used_mb: Optional[int] = None
+    ram_total_mb: Optional[int] = None
+    upload_bytes_per_sec: Optional[int] = None
+    download_bytes_per_sec: Optional[int] = None
+    reboot_uploaded_bytes: Optional[int] = None
+    reboot_downloaded_bytes: Optional[int] = None
+    user_uploaded_bytes: Optional[int] = None
+    user_downloaded_bytes: Optional[int] = None
+
 
 class ServerServicesStatusResponse(BaseModel):
     hysteria_server: bool
@@ -0,0 +1,24 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+# Points are [bucket_start_epoch, upload_bytes, download_bytes]; buckets without traffic are omitted.
+class TrafficHistoryResponse(BaseModel):
+    resolution: str = Field(..., description="Bucket size: minute, hour or day")
+    start: int = Field(..., description="Start of the (bucket-aligned) range in epoch seconds")
+    end: int = Field(..., description="End of the (bucket-aligned) range in epoch seconds, exclusive")
+    series: Optional[dict[str, list[list[int]]]] = Field(None, description="Points per requested user")
+    total: Optional[list[list[int]]] = Field(None, description="Points for all users combined, when no user was requested")
+
+
+class TrafficTopEntry(BaseModel):
+    username: str
+    upload_bytes: int
+    download_bytes: int
+    total_bytes: int
+
+
+class TrafficTopResponse(BaseModel):
+    start: int
+    end: int
+    users: list[TrafficTopEntry]
@@ -1,5 +1,5 @@
 import re
-from typing import Optional, List
+from typing import Literal, Optional, List
 from pydantic import BaseModel, RootModel, Field, field_validator
 
 
@@ -18,6 +18,18 @@ class UserInfoResponse(BaseModel):
 class UserListResponse(RootModel):
     root: dict[str, UserInfoResponse]
 
+
+class UserPageItem(UserInfoResponse):
+    username: str
+
+
+class UserPageResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    next_cursor: Optional[str] = None
+    items: List[UserPageItem]
+
 class UsernamesRequest(BaseModel):
     usernames: List[str]
 
@@ -51,6 +63,29 @@ class AddBulkUsersInputBody(BaseModel):
         return v
 
 
+class BulkEditOperation(BaseModel):
+    action: Literal['delete', 'block', 'unblock', 'extend', 'reset']
+    usernames: List[str] = Field(..., min_length=1)
+    days: Optional[int] = Field(None, gt=0, description='Days to add to the expiration (extend only)')
+
+
+class BulkEditInputBody(BaseModel):
+    operations: List[BulkEditOperation] = Field(..., min_length=1)
+
+
+class BulkEditResult(BaseModel):
+    username: str
+    action: str
+    success: bool
+    detail: str
+
+
+class BulkEditResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkEditResult]
+
+
 class EditUserInputBody(BaseModel):
     new_username: Optional[str] = None
     new_traffic_limit: Optional[int] = None
@@ -1,5 +1,12 @@
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Callable
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 import cli_api
+from server_status import convert_bytes, convert_speed, format_uptime
 from .schema.server import ServerStatusResponse, ServerServicesStatusResponse, VersionCheckResponse, VersionInfoResponse
 
 router = APIRouter()
@@ -12,6 +19,10 @@ async def server_status_api():
 
     This endpoint provides information about the current server status,
     including uptime, CPU usage, RAM usage, online users, and traffic statistics.
+    It answers from the newest sample of the webpanel's sampler, measuring
+    on the spot (in a worker thread, off the event loop) only when no sample
+    was taken within the push interval. Dashboards should prefer the
+    /status/stream endpoint.
 
     Returns:
         ServerStatusResponse: A response model containing server status details.
@@ -22,111 +33,56 @@ async def server_status_api():
     """
 
     try:
-        if res := cli_api.server_info():
-            return __parse_server_status(res)
+        if status := await asyncio.to_thread(cli_api.server_status):
+            return __build_server_status(status)
         raise HTTPException(status_code=404, detail='Server information not available.')
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
 
 
-def __parse_server_status(server_info: str) -> ServerStatusResponse:
+def __build_server_status(status: dict[str, Any]) -> ServerStatusResponse:
     """
-    Parse the server information provided by cli_api.server_info()
-    and return a ServerStatusResponse instance.
+    Build a ServerStatusResponse from a snapshot returned by cli_api.server_status().
 
     Args:
-        server_info (str): The output of cli_api.server_info() as a string.
+        status (dict[str, Any]): The snapshot, in raw units.
 
     Returns:
         ServerStatusResponse: A response model containing server status details.
-
-    Raises:
-        ValueError: If the server information is invalid or incomplete.
     """
-    data = {
-        'uptime': 'N/A',
-        'boot_time': 'N/A',
-        'cpu_usage': '0%',
-        'total_ram': '0MB',
-        'ram_usage': '0MB',
-        'online_users': 0,
-        'upload_speed': '0 B/s',
-        'download_speed': '0 B/s',
-        'tcp_connections': 0,
-        'udp_connections': 0,
-        'reboot_uploaded_traffic': '0 B',
-        'reboot_downloaded_traffic': '0 B',
-        'reboot_total_traffic': '0 B',
-        'user_uploaded_traffic': '0 B',
-        'user_downloaded_traffic': '0 B',
-        'user_total_traffic': '0 B'
-    }
-
-    current_section = 'general'
-
-    for line in server_info.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        if 'Traffic Since Last Reboot' in line:
-            current_section = 'reboot'
-            continue
-        elif 'User Traffic (All Time)' in line:
-            current_section = 'user'
-            continue
-            
-        key, _, value = line.partition(":")
-        key = key.strip().lower()
-        value = value.strip()
-
-        if not key or not value:
-            continue
-        
-        try:
-            if 'uptime' in key:
-                uptime_part, _, boottime_part = value.partition('(')
-                data['uptime'] = uptime_part.strip()
-                data['boot_time'] = boottime_part.replace('since ', '').replace(')', '').strip()
-            elif 'cpu usage' in key:
-                data['cpu_usage'] = value
-            elif 'used ram' in key:
-                parts = value.split('/')
-                if len(parts) == 2:
-                    data['ram_usage'] = parts[0].strip()
-                    data['total_ram'] = parts[1].strip()
-            elif 'online users' in key:
-                data['online_users'] = int(value)
-            elif 'upload speed' in key:
-                data['upload_speed'] = value
-            elif 'download speed' in key:
-                data['download_speed'] = value
-            elif 'tcp connections' in key:
-                data['tcp_connections'] = int(value)
-            elif 'udp connections' in key:
-                data['udp_connections'] = int(value)
-            elif 'total uploaded' in key or 'uploaded traffic' in key:
-                if current_section == 'reboot':
-                    data['reboot_uploaded_traffic'] = value
-                elif current_section == 'user':
-                    data['user_uploaded_traffic'] = value
-            elif 'total downloaded' in key or 'downloaded traffic' in key:
-                if current_section == 'reboot':
-                    data['reboot_downloaded_traffic'] = value
-                elif current_section == 'user':
-                    data['user_downloaded_traffic'] = value
-            elif 'combined traffic' in key or 'total traffic' in key:
-                if current_section == 'reboot':
-                    data['reboot_total_traffic'] = value
-                elif current_section == 'user':
-                    data['user_total_traffic'] = value
-        except (ValueError, IndexError) as e:
-            raise ValueError(f'Error parsing line \'{line}\': {e}')
-
-    try:
-        return ServerStatusResponse(**data)
-    except Exception as e:
-        raise ValueError(f'Invalid or incomplete server info: {e}')
+    user_upload, user_download = status['user_upload_bytes'], status['user_download_bytes']
+    reboot_upload, reboot_download = status['tx_bytes'], status['rx_bytes']
+    return ServerStatusResponse(
+        uptime=format_uptime(status['uptime_seconds']),
+        boot_time=time.strftime('%Y-%m-%d %H:%M', time.localtime(status['boot_time'])),
+        cpu_usage=f"{status['cpu_percent']}%",
+        ram_usage=f"{status['mem_used_mb']}MB",
+        total_ram=f"{status['mem_total_mb']}MB",
+        online_users=status['online_users'],
+        upload_speed=convert_speed(status['upload_bytes_per_sec']),
+        download_speed=convert_speed(status['download_bytes_per_sec']),
+        tcp_connections=status['tcp_connections'],
+        udp_connections=status['udp_connections'],
+        reboot_uploaded_traffic=convert_bytes(reboot_upload),
+        reboot_downloaded_traffic=convert_bytes(reboot_download),
+        reboot_total_traffic=convert_bytes(reboot_upload + reboot_download),
+        user_uploaded_traffic=convert_bytes(user_upload),
+        user_downloaded_traffic=convert_bytes(user_download),
+        user_total_traffic=convert_bytes(user_upload + user_download),
+        sampled_at=status['timestamp'],
+        uptime_seconds=status['uptime_seconds'],
+        cpu_percent=status['cpu_percent'],
+        ram_used_mb=status['mem_used_mb'],
+        ram_total_mb=status['mem_total_mb'],
+        upload_bytes_per_sec=status['upload_bytes_per_sec'],
+        download_bytes_per_sec=status['download_bytes_per_sec'],
+        reboot_uploaded_bytes=reboot_upload,
+        reboot_downloaded_bytes=reboot_download,
+        user_uploaded_bytes=user_upload,
+        user_downloaded_bytes=user_download,
+    )
 
 
 @router.get('/services/status', response_model=ServerServicesStatusResponse)
@@ -174,6 +130,154 @@ def __parse_services_status(services_status: dict[str, bool]) -> ServerServicesS
             parsed_services_status['hysteria_warp'] = status
     return ServerServicesStatusResponse(**parsed_services_status)
 
+# Seconds between comments that keep an idle stream (and its proxies) open.
+STREAM_KEEPALIVE = 15
+# Encoded deltas kept for streams that are a few events behind.
+DELTA_BACKLOG = 8
+SERVICES_INTERVAL = 10
+
+
+def __sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class StatusHub:
+    '''
+    Fans the shared sampler's snapshots out to every open dashboard stream.
+
+    Each snapshot is rendered, diffed against the previous one and encoded once,
+    however many streams are open; a stream that fell further behind than
+    DELTA_BACKLOG events gets the full snapshot instead of the deltas it missed. The sampler is acquired, and the
+    services polled, only while at least one stream is connected.
+    '''
+
+    def __init__(self, render_status: Callable[[dict[str, Any]], dict[str, Any]],
+                 render_services: Callable[[dict[str, bool]], dict[str, Any]],
+                 encode: Callable[[str, Any], bytes]):
+        self.render_status = render_status
+        self.render_services = render_services
+        self.encode = encode
+        self._streams = 0
+        self._listener: Callable[[dict[str, Any] | None], None] | None = None
+        self._services_task: asyncio.Task | None = None
+        self._payload: dict[str, dict[str, Any]] = {}
+        self._seq = 0
+        self._deltas: deque[bytes] = deque(maxlen=DELTA_BACKLOG)
+        self._snapshot: bytes | None = None
+        self._changed = asyncio.Event()
+
+    def _publish(self, section: str, values: dict[str, Any]):
+        previous = self._payload.get(section)
+        changed = {key: value for key, value in values.items() if previous is None or previous.get(key) != value}
+        if not changed:
+            return
+        self._payload[section] = values
+        self._seq += 1
+        self._deltas.append(self.encode('delta', {section: changed}))
+        self._snapshot = None
+        # Wake every stream waiting on the current event, and give the next round a fresh one.
+        changed_event, self._changed = self._changed, asyncio.Event()
+        changed_event.set()
+
+    def _publish_status(self, snapshot: dict[str, Any] | None):
+        if snapshot is not None and self._streams:
+            self._publish('status', self.render_status(snapshot))
+
+    async def _poll_services(self):
+        while True:
+            try:
+                if res := await asyncio.to_thread(cli_api.get_services_status):
+                    self._publish('services', self.render_services(res))
+            except Exception:
+                pass  # Keep showing the last known states; the next round retries.
+            await asyncio.sleep(SERVICES_INTERVAL)
+
+    def _join(self):
+        self._streams += 1
+        if self._streams > 1:
+            return
+        # Created and started by the app's lifespan, so this does not block.
+        sampler = cli_api.status_sampler()
+        loop = asyncio.get_running_loop()
+        self._listener = lambda snapshot: loop.call_soon_threadsafe(self._publish_status, snapshot)
+        sampler.add_listener(self._listener)
+        sampler.acquire()
+        self._services_task = asyncio.create_task(self._poll_services())
+        # The thread samples again right away; until then show the last figures.
+        self._publish_status(sampler.latest())
+
+    def _leave(self):
+        self._streams -= 1
+        if self._streams:
+            return
+        sampler = cli_api.status_sampler()
+        sampler.release()
+        sampler.remove_listener(self._listener)
+        if self._services_task is not None:
+            self._services_task.cancel()
+            self._services_task = None
+        # Stale once nobody watches; the next stream starts from a fresh snapshot.
+        self._payload = {}
+        self._deltas.clear()
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        '''
+        Yields a "snapshot" event with the full payload, then "delta" events
+        carrying only the fields that changed.
+        '''
+        self._join()
+        seen = None
+        try:
+            while True:
+                changed = self._changed
+                if self._payload and seen != self._seq:
+                    missed = self._seq - seen if seen is not None else None
+                    if missed is not None and missed <= len(self._deltas):
+                        yield b''.join(list(self._deltas)[-missed:])
+                    else:
+                        if self._snapshot is None:
+                            self._snapshot = self.encode('snapshot', self._payload)
+                        yield self._snapshot
+                    seen = self._seq
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b': keepalive\n\n'
+        finally:
+            self._leave()
+
+
+status_hub = StatusHub(
+    render_status=lambda status: __build_server_status(status).model_dump(),
+    render_services=lambda services: __parse_services_status(services).model_dump(),
+    encode=__sse,
+)
+
+
+@router.get('/status/stream')
+async def server_status_stream_api():
+    """
+    Stream the server and services status as Server-Sent Events.
+
+    The first "snapshot" event carries the full ServerStatusResponse under
+    "status" and the ServerServicesStatusResponse under "services"; each
+    following "delta" event carries only the fields that changed. Server
+    status is pushed every sampler interval (STATUS_PUSH_INTERVAL) and
+    services every 10 seconds. All streams share one sampler, which pauses
+    while no stream is open.
+
+    Returns:
+        StreamingResponse: A text/event-stream response.
+    """
+    return StreamingResponse(
+        status_hub.stream(),
+        media_type='text/event-stream',
+        # Proxies must pass events through as they come instead of buffering them.
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @router.get('/version', response_model=VersionInfoResponse)
 async def get_version_info():
     """Retrieves the current version of the panel."""
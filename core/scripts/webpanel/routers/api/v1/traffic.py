@@ -0,0 +1,59 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from .schema.traffic import TrafficHistoryResponse, TrafficTopResponse
+import cli_api
+
+router = APIRouter()
+
+
+@router.get('/history', response_model=TrafficHistoryResponse, response_model_exclude_none=True)
+async def traffic_history_api(
+    username: Optional[list[str]] = Query(None, description='Users to include; omit for the total of all users'),
+    start: Optional[str] = Query(None, description='Epoch seconds, ISO 8601 or a duration ago such as 24h (default: 24h)'),
+    end: Optional[str] = Query(None, description='Same formats as start (default: now)'),
+    resolution: Optional[str] = Query(None, description='minute, hour or day (default: automatic)'),
+):
+    """
+    Retrieve per-user traffic over time.
+
+    Minute buckets are kept for 24 hours, hour buckets for 30 days and day
+    buckets until the history database reaches its size limit.
+
+    Returns:
+        TrafficHistoryResponse: The bucket-aligned range and its data points.
+
+    Raises:
+        HTTPException: If the parameters are invalid (422) or the history
+                       cannot be read (500).
+    """
+    try:
+        return await asyncio.to_thread(cli_api.traffic_history, username, start, end, resolution)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error: {str(e)}')
+
+
+@router.get('/top', response_model=TrafficTopResponse)
+async def traffic_top_api(
+    start: Optional[str] = Query(None, description='Epoch seconds, ISO 8601 or a duration ago such as 1h (default: 24h)'),
+    end: Optional[str] = Query(None, description='Same formats as start (default: now)'),
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Retrieve the users with the most traffic in a time range, highest first.
+
+    Returns:
+        TrafficTopResponse: The bucket-aligned range and the per-user totals.
+
+    Raises:
+        HTTPException: If the parameters are invalid (422) or the history
+                       cannot be read (500).
+    """
+    try:
+        return await asyncio.to_thread(cli_api.traffic_top, start, end, limit)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error: {str(e)}')
@@ -1,14 +1,19 @@
 import json
-from typing import List
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from .schema.user import (
     UserListResponse, 
+    UserPageResponse, 
     UserInfoResponse, 
     AddUserInputBody, 
     EditUserInputBody, 
     UserUriResponse, 
     AddBulkUsersInputBody, 
-    UsernamesRequest
+    UsernamesRequest,
+    BulkEditInputBody,
+    BulkEditResponse
 )
 from .schema.response import DetailResponse
 import cli_api
@@ -16,16 +21,52 @@ import cli_api
 router = APIRouter()
 
 
-@router.get('/', response_model=UserListResponse)
-async def list_users_api():
+@router.get('/', response_model=Union[UserPageResponse, UserListResponse])
+async def list_users_api(
+    offset: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: Optional[Literal['name', 'usage', 'expiry']] = None,
+    order: Optional[Literal['asc', 'desc']] = None,
+    status: Optional[Literal['online', 'offline', 'on-hold', 'not-active']] = None,
+    blocked: Optional[bool] = None,
+    expired: Optional[bool] = None,
+    near_quota: Optional[bool] = None,
+    prefix: Optional[str] = None,
+):
     """
-    Get a list of all users.
+    Get a list of users.
+
+    Without query parameters every user is returned as a dictionary keyed by username.
+    With any of them the users are filtered, sorted and paged on the server and one page is returned;
+    pass its next_cursor as cursor (or raise offset) to get the following page.
+
+    Args:
+        offset: Users to skip (ignored when cursor is given).
+        limit: Page size, 50 by default.
+        cursor: next_cursor of the previous page.
+        sort: name, usage or expiry (default: name).
+        order: asc or desc (default: asc).
+        status: Only users with this status.
+        blocked, expired, near_quota: Only users that are (true) or are not (false).
+        prefix: Only users whose name starts with this, case-insensitively.
 
     Returns:
-        List of user dictionaries.
+        A UserPageResponse, or the legacy dictionary of all users.
     Raises:
-        HTTPException: if no users are found, or if an error occurs.
+        HTTPException: if no users are found (legacy form only), or if an error occurs.
     """
+    paged = (offset, limit, cursor, sort, order, status, blocked, expired, near_quota, prefix)
+    if any(param is not None for param in paged):
+        try:
+            return await asyncio.to_thread(cli_api.list_users_page, offset=offset or 0, limit=limit or 50,
+                                           cursor=cursor, sort=sort or 'name', descending=order == 'desc',
+                                           status=status, blocked=blocked, expired=expired,
+                                           near_quota=near_quota, prefix=prefix)
+        except cli_api.InvalidInputError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
     try:
         if res := cli_api.list_users():
             return res
@@ -38,13 +79,14 @@ async def list_users_api():
 async def add_user_api(body: AddUserInputBody):
     try:
         cli_api.get_user(body.username)
-        raise HTTPException(status_code=409,
-                            detail=f"User '{body.username}' already exists.")
-    except cli_api.CommandExecutionError:
+    except (cli_api.UserNotFoundError, cli_api.CommandExecutionError):
         pass
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500,
                             detail=f"{str(e)}")
+    else:
+        raise HTTPException(status_code=409,
+                            detail=f"User '{body.username}' already exists.")
 
     try:
         cli_api.add_user(body.username, body.traffic_limit, body.expiration_days, body.password, body.creation_date, body.unlimited)
@@ -87,6 +129,35 @@ async def add_bulk_users_api(body: AddBulkUsersInputBody):
         raise HTTPException(status_code=500,
                             detail=f"An unexpected error occurred while adding bulk users: {str(e)}")
 
+@router.post('/bulk/edit', response_model=BulkEditResponse)
+async def bulk_edit_users_api(body: BulkEditInputBody):
+    """
+    Delete, block, unblock, extend or reset many users in one request.
+
+    The operations run in the given order inside a single store transaction: either every change
+    is saved or none is. Traffic is flushed once for the whole request, and deleted and blocked
+    users are kicked with one batched call after the changes are saved. A missing user only fails
+    its own result.
+
+    Args:
+        body: The operations; extend needs days.
+
+    Returns:
+        A BulkEditResponse with one result per user and operation.
+
+    Raises:
+        HTTPException: 422 for an invalid operation, 400 if the users cannot be kicked or saved.
+    """
+    try:
+        results = await asyncio.to_thread(cli_api.bulk_edit_users, [operation.model_dump() for operation in body.operations])
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+    succeeded = sum(1 for result in results if result['success'])
+    return BulkEditResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+
 @router.post('/uri/bulk', response_model=List[UserUriResponse])
 async def show_multiple_user_uris_api(request: UsernamesRequest):
     """
@@ -111,6 +182,38 @@ async def show_multiple_user_uris_api(request: UsernamesRequest):
         raise HTTPException(status_code=400, detail=f'Unexpected error: {str(e)}')
 
 
+@router.get('/export')
+async def export_users_api(
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+    fields: Optional[str] = None,
+    since: Optional[str] = None,
+):
+    """
+    Stream every user as NDJSON (one JSON object per line) or CSV.
+
+    The rows are read from the user store in batches and sent as they are produced,
+    so memory use does not depend on the number of users.
+
+    Args:
+        format: ndjson or csv.
+        fields: Comma-separated fields to include (default: all).
+        since: Only users modified since then: epoch seconds, ISO 8601 or a duration ago such as 24h.
+
+    Returns:
+        A streamed application/x-ndjson or text/csv body.
+    Raises:
+        HTTPException: 422 for an unknown field or an invalid time, 400 if the store cannot be read.
+    """
+    try:
+        chunks = cli_api.export_users(format, fields, since)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+    return StreamingResponse(chunks, media_type=cli_api.EXPORT_CONTENT_TYPES[format],
+                             headers={'Content-Disposition': f'attachment; filename="users.{format}"'})
+
+
 @router.get('/{username}', response_model=UserInfoResponse)
 async def get_user_api(username: str):
     """
@@ -126,8 +229,8 @@ async def get_user_api(username: str):
         HTTPException: if the user is not found, or if an error occurs.
     """
     try:
-        if res := cli_api.get_user(username):
-            return res
+        return cli_api.get_user(username)
+    except cli_api.UserNotFoundError:
         raise HTTPException(status_code=404, detail=f'User {username} not found.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -150,7 +253,7 @@ async def edit_user_api(username: str, body: EditUserInputBody):
     """
     try:
         cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
+        cli_api.flush_user_traffic([username])
         cli_api.edit_user(username, body.new_username, body.new_traffic_limit, body.new_expiration_days,
                           body.renew_password, body.renew_creation_date, body.blocked, body.unlimited_ip)
         return DetailResponse(detail=f'User {username} has been edited.')
@@ -173,15 +276,13 @@ async def remove_user_api(username: str):
         HTTPException: 404 if the user is not found, 400 if another error occurs.
     """
     try:
-        user = cli_api.get_user(username)
-        if not user:
-            raise HTTPException(status_code=404, detail=f'User {username} not found.')
-        
+        cli_api.get_user(username)
         cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
+        cli_api.flush_user_traffic([username])
         cli_api.remove_user(username)
-        cli_api.traffic_status(display_output=False)
         return DetailResponse(detail=f'User {username} has been removed.')
+    except cli_api.UserNotFoundError:
+        raise HTTPException(status_code=404, detail=f'User {username} not found.')
     except HTTPException:
 
         raise
@@ -204,12 +305,11 @@ async def reset_user_api(username: str):
         HTTPException: if an error occurs while resetting the user.
     """
     try:
-        user = cli_api.get_user(username)
-        if not user:
-            raise HTTPException(status_code=404, detail=f'User {username} not found.')
-        
+        cli_api.get_user(username)
         cli_api.reset_user(username)
         return DetailResponse(detail=f'User {username} has been reset.')
+    except cli_api.UserNotFoundError:
+        raise HTTPException(status_code=404, detail=f'User {username} not found.')
     except HTTPException:
         raise
     except Exception as e:
@@ -1,12 +1,9 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse
-import json
-import os
 from pathlib import Path
 from starlette.templating import Jinja2Templates
 
-# Adjust this path to your actual users.json location
-USERS_FILE = "/etc/hysteria/users.json"  # TODO: set correct path
+import cli_api
 
 # Template directory (reuse webpanel templates dir)
 templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[3] / "webpanel/templates"))
@@ -15,15 +12,10 @@ router = APIRouter()
 
 @router.get("/subscription/{token}", response_class=HTMLResponse)
 async def subscription_page(request: Request, token: str):
-    if not os.path.isfile(USERS_FILE):
-        raise HTTPException(status_code=404, detail="User database not found.")
-    with open(USERS_FILE, "r") as f:
-        users = json.load(f)
-    user = None
-    for u in users.values():
-        if u.get("token") == token:
-            user = u
-            break
+    try:
+        user = cli_api.get_user_by_token(token)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error: {str(e)}')
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
     # Calculate usage and expiry
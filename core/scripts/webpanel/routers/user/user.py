@@ -1,5 +1,5 @@
-
-from fastapi import APIRouter, HTTPException, Request, Depends
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from fastapi.templating import Jinja2Templates
 
 from dependency import get_templates
@@ -9,15 +9,42 @@ import cli_api
 
 router = APIRouter()
 
+# Filter buttons on the users page and the list_users_page() arguments they stand for.
+FILTERS = {
+    'all': {},
+    'on-hold': {'status': 'on-hold'},
+    'online': {'status': 'online'},
+    'enable': {'blocked': False},
+    'disable': {'blocked': True},
+    'expired': {'expired': True},
+    'near-quota': {'near_quota': True},
+}
+
 
 @router.get('/')
-async def users(request: Request, templates: Jinja2Templates = Depends(get_templates)):
+async def users(request: Request, templates: Jinja2Templates = Depends(get_templates),
+                page: int = Query(1, ge=1), per_page: int = Query(50, ge=1, le=500),
+                sort: Literal['name', 'usage', 'expiry'] = 'name', order: Literal['asc', 'desc'] = 'asc',
+                filter: str = 'all', q: str = ''):
     try:
-        dict_users = cli_api.list_users()  # type: ignore
-        users: list[User] = []
-        if dict_users:
-            users: list[User] = [User.from_dict(key, value) for key, value in dict_users.items()]  # type: ignore
+        result = cli_api.list_users_page(offset=(page - 1) * per_page, limit=per_page, sort=sort,
+                                         descending=order == 'desc', prefix=q.strip() or None,
+                                         **FILTERS.get(filter, {}))
+        users: list[User] = [User.from_dict(item.pop('username'), item) for item in result['items']]  # type: ignore
+        pages = max(1, -(-result['total'] // per_page))
 
-        return templates.TemplateResponse('users.html', {'users': users, 'request': request})
+        return templates.TemplateResponse('users.html', {
+            'users': users,
+            'request': request,
+            'total': result['total'],
+            'offset': result['offset'],
+            'page': page,
+            'pages': pages,
+            'per_page': per_page,
+            'sort': sort,
+            'order': order,
+            'filter': filter if filter in FILTERS else 'all',
+            'q': q,
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -4,17 +4,25 @@ import os
 import sys
 import time
 import fcntl
-import shutil
 import datetime
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from hysteria2_api import Hysteria2Client
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from storage import get_store, get_history, history_enabled, StoreError, JournaledUserStore  # noqa: E402
+from quota import QuotaTable, batches  # noqa: E402
+
 CONFIG_FILE = '/etc/hysteria/config.json'
-USERS_FILE = '/etc/hysteria/users.json'
 API_BASE_URL = 'http://127.0.0.1:25413'
 LOCKFILE = "/tmp/kick.lock"
-BACKUP_FILE = f"{USERS_FILE}.bak"
-MAX_WORKERS = 8
+# Held while the API counters are read for a flush or cleared, never while holding the store.
+FLUSH_LOCKFILE = "/tmp/traffic_flush.lock"
+# Seconds after which the collector re-reads every user even if the store looks unchanged.
+RESYNC_SECONDS = 300
+# Store meta key holding what flush_user_traffic() applied since the counters were last cleared.
+FLUSH_STATE_KEY = 'traffic_flush'
+# Seconds a non-clearing stats snapshot is reused by flush_user_traffic() in the same process.
+SNAPSHOT_TTL = 2.0
 
 # import logging
 # logging.basicConfig(
@@ -35,6 +43,16 @@ def acquire_lock():
     except IOError:
         sys.exit(1)
 
+@contextmanager
+def flush_lock():
+    """Keeps flush_user_traffic() and clearing reads of the counters from interleaving, across processes"""
+    with open(FLUSH_LOCKFILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def traffic_status(no_gui=False):
     """Updates and retrieves traffic statistics for all users.
     
@@ -65,56 +83,135 @@ def traffic_status(no_gui=False):
     client = Hysteria2Client(base_url=API_BASE_URL, secret=secret)
 
     try:
-        traffic_stats = client.get_traffic_stats(clear=True)
+        store = get_store()
         online_status = client.get_online_clients()
+        # The flush lock, not the store, keeps flush_user_traffic() out of the gap.
+        with flush_lock():
+            traffic_stats = client.get_traffic_stats(clear=True)
+            with store.transaction():
+                traffic = settle_flushed_traffic(store, {
+                    user_id: (stats.upload_bytes, stats.download_bytes) for user_id, stats in traffic_stats.items()
+                })
+                store.apply_traffic(traffic, {user_id: status.is_online for user_id, status in online_status.items()})
+        record_history(traffic)
+        users_data = store.all()
+    except StoreError as e:
+        if not no_gui:
+            print(f"Error: Failed to update the user store. Details: {e}")
+        return None
     except Exception as e:
         if not no_gui:
             print(f"Error communicating with Hysteria2 API: {e}")
         return None
 
-    users_data = {}
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r') as users_file:
-                users_data = json.load(users_file)
-        except json.JSONDecodeError:
-            if not no_gui:
-                print("Error: Failed to parse existing users data JSON file.")
-            return None
-
-    for user in users_data:
-        users_data[user]["status"] = "Offline"
-
-    for user_id, status in online_status.items():
-        if user_id in users_data:
-            users_data[user_id]["status"] = "Online" if status.is_online else "Offline"
-        else:
-            users_data[user_id] = {
-                "upload_bytes": 0,
-                "download_bytes": 0,
-                "status": "Online" if status.is_online else "Offline"
-            }
-
-    for user_id, stats in traffic_stats.items():
-        if user_id in users_data:
-            users_data[user_id]["upload_bytes"] = users_data[user_id].get("upload_bytes", 0) + stats.upload_bytes
-            users_data[user_id]["download_bytes"] = users_data[user_id].get("download_bytes", 0) + stats.download_bytes
-        else:
-            online = user_id in online_status and online_status[user_id].is_online
-            users_data[user_id] = {
-                "upload_bytes": stats.upload_bytes,
-                "download_bytes": stats.download_bytes,
-                "status": "Online" if online else "Offline"
-            }
-
-    with open(USERS_FILE, 'w') as users_file:
-        json.dump(users_data, users_file, indent=4)
-
     if not no_gui:
         display_traffic_data(users_data, green, cyan, NC)
     
     return users_data
 
+def _load_flush_state(store):
+    raw = store.get_meta(FLUSH_STATE_KEY)
+    try:
+        state = json.loads(raw) if raw else {}
+        offsets = {username: (int(up), int(down)) for username, (up, down) in state.get('offsets', {}).items()}
+        return int(state.get('epoch', 0)), offsets
+    except (ValueError, TypeError, AttributeError):
+        return 0, {}
+
+def _save_flush_state(store, epoch, offsets):
+    store.set_meta(FLUSH_STATE_KEY, json.dumps({'epoch': epoch, 'offsets': offsets}, separators=(',', ':')))
+
+def settle_flushed_traffic(store, traffic):
+    """Takes what flush_user_traffic() already stored out of a clearing /traffic read.
+
+    Must run under flush_lock(), in the store transaction that stores the
+    cleared counters, and the lock must have been held since they were
+    cleared. Starts a new
+    epoch, which retires every cached non-clearing snapshot. Users left with
+    nothing are dropped, so a user removed after a flush does not come back
+    as a bare traffic-only entry.
+    """
+    epoch, offsets = _load_flush_state(store)
+    if not offsets:
+        return traffic
+    traffic = dict(traffic)
+    for username, (up_offset, down_offset) in offsets.items():
+        upload, download = traffic.pop(username, (0, 0))
+        upload, download = max(0, upload - up_offset), max(0, download - down_offset)
+        if upload or download:
+            traffic[username] = (upload, download)
+    _save_flush_state(store, epoch + 1, {})
+    return traffic
+
+# (epoch, monotonic fetch time, {user: (upload, download)}) of the last non-clearing read
+_snapshot = None
+
+def _read_counters():
+    """Reads every user's uncleared counters from the Hysteria2 API without clearing them"""
+    with open(CONFIG_FILE, 'r') as config_file:
+        secret = json.load(config_file).get('trafficStats', {}).get('secret')
+    if not secret:
+        raise RuntimeError(f"Secret not found in {CONFIG_FILE}")
+    try:
+        traffic_stats = Hysteria2Client(base_url=API_BASE_URL, secret=secret).get_traffic_stats(clear=False)
+    except Exception as e:
+        raise RuntimeError(f"Error communicating with Hysteria2 API: {e}")
+    return {user_id: (stats.upload_bytes, stats.download_bytes) for user_id, stats in traffic_stats.items()}
+
+def flush_user_traffic(usernames, store=None):
+    """Stores the named users' pending traffic without touching anybody else.
+
+    Call it before editing, resetting or removing users so their counters are
+    current. The counters are read without clearing them (a snapshot younger
+    than SNAPSHOT_TTL from the same epoch is reused) and what each user gained
+    since their last flush is added to their row. The amounts are remembered
+    in the store meta so the collector's next clearing read subtracts them.
+
+    Returns:
+        dict: {username: (upload, download)} actually added.
+
+    Raises:
+        RuntimeError: If the API cannot be read.
+        StoreError: If the store cannot be written.
+    """
+    global _snapshot
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return {}
+    store = store or get_store()
+    # Only holders of the flush lock write the flush state, so it can be read
+    # and the API called before the store transaction is opened.
+    with flush_lock():
+        epoch, offsets = _load_flush_state(store)
+        snapshot = _snapshot
+        if snapshot is None or snapshot[0] != epoch or time.monotonic() - snapshot[1] >= SNAPSHOT_TTL:
+            snapshot = (epoch, time.monotonic(), _read_counters())
+        counters = snapshot[2]
+
+        deltas = {}
+        for username in usernames:
+            upload, download = counters.get(username, (0, 0))
+            up_offset, down_offset = offsets.get(username, (0, 0))
+            # Another process may have flushed from a newer snapshot: never go backwards.
+            if upload > up_offset or download > down_offset:
+                deltas[username] = (max(0, upload - up_offset), max(0, download - down_offset))
+            offsets[username] = (max(upload, up_offset), max(download, down_offset))
+        with store.transaction():
+            store.add_traffic(deltas)
+            _save_flush_state(store, epoch, offsets)
+    _snapshot = snapshot
+    record_history(deltas)
+    return deltas
+
+def record_history(traffic, timestamp=None):
+    """Adds one tick of per-user deltas to the traffic history; a failure here never fails the tick"""
+    if not history_enabled():
+        return 0
+    try:
+        return get_history().record(traffic, timestamp)
+    except StoreError:
+        return 0
+
 def display_traffic_data(data, green, cyan, NC):
     """Displays traffic data in a formatted table"""
     if not data:
@@ -163,51 +260,11 @@ def kick_users(usernames, secret):
     except Exception:
         return False
 
-def process_user(username, user_data, config_secret, users_data):
-    """Process a single user to check if they should be kicked"""
-    blocked = user_data.get('blocked', False)
-    
-    if blocked:
-        return None
-    
-    max_download_bytes = user_data.get('max_download_bytes', 0)
-    expiration_days = user_data.get('expiration_days', 0)
-    account_creation_date = user_data.get('account_creation_date')
-    current_download_bytes = user_data.get('download_bytes', 0)
-    current_upload_bytes = user_data.get('upload_bytes', 0)
-    
-    total_bytes = current_download_bytes + current_upload_bytes
-    
-    if not account_creation_date:
-        return None
-    
-    try:
-        current_date = datetime.datetime.now().timestamp()
-        creation_date = datetime.datetime.fromisoformat(account_creation_date.replace('Z', '+00:00'))
-        expiration_date = (creation_date + datetime.timedelta(days=expiration_days)).timestamp()
-        
-        should_block = False
-        
-        if max_download_bytes > 0 and total_bytes >= 0 and expiration_days > 0:
-            if total_bytes >= max_download_bytes or current_date >= expiration_date:
-                should_block = True
-                
-            if should_block:
-                users_data[username]['blocked'] = True
-                return username
-        
-    except Exception:
-        return None
-    
-    return None
-
 def kick_expired_users():
     """Kicks users who have exceeded their data limits or whose accounts have expired"""
     lock_file = acquire_lock()
     
     try:
-        shutil.copy2(USERS_FILE, BACKUP_FILE)
-        
         try:
             with open(CONFIG_FILE, 'r') as f:
                 config = json.load(f)
@@ -215,55 +272,189 @@ def kick_expired_users():
                 if not secret:
                     sys.exit(1)
         except Exception:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
             sys.exit(1)
             
         try:
-            with open(USERS_FILE, 'r') as f:
-                users_data = json.load(f)
-        except json.JSONDecodeError:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
+            store = get_store()
+            users_data = store.all()
+        except StoreError:
             sys.exit(1)
-        except Exception:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
-            sys.exit(1)
-            
-        users_to_kick = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_user = {
-                executor.submit(process_user, username, user_data, secret, users_data): username
-                for username, user_data in users_data.items()
-            }
             
-            for future in future_to_user:
-                username = future.result()
-                if username:
-                    users_to_kick.append(username)
+        users_to_kick = QuotaTable.from_users(users_data).due()
         
         if users_to_kick:
-            for retry in range(3):
-                try:
-                    with open(USERS_FILE, 'w') as f:
-                        json.dump(users_data, f, indent=2)
-                    break 
-                except Exception:
-                    time.sleep(1)
-                    if retry == 2: 
-                        raise
+            store.set_blocked(users_to_kick)
+            # The auth servers must see the block before the users can reconnect.
+            store.flush_derived()
         
-        if users_to_kick:
-            batch_size = 50 
-            for i in range(0, len(users_to_kick), batch_size):
-                batch = users_to_kick[i:i+batch_size]
-                kick_users(batch, secret)
+        for batch in batches(users_to_kick):
+            kick_users(batch, secret)
                         
     except Exception:
-        shutil.copy2(BACKUP_FILE, USERS_FILE)
         sys.exit(1)
     finally:
         fcntl.flock(lock_file, fcntl.LOCK_UN)
         lock_file.close()
 
+def compact_traffic_journal():
+    """Folds pending traffic journal records into the user store and returns how many were folded"""
+    store = get_store()
+    if not isinstance(store, JournaledUserStore):
+        return 0
+    return store.compact()
+
+class TrafficCollector:
+    """Long-lived traffic poller used by the scheduler service.
+
+    Keeps the Hysteria2 client, the API secret and a copy of the user table
+    in memory between ticks. The secret is re-read only when config.json
+    changes and the user table only when another process has written to the
+    store (or every RESYNC_SECONDS); otherwise each tick's deltas are added
+    to the cached table, so enforcement never re-reads every user.
+
+    Enforcement uses QuotaTable.due_changes(): expiries are popped from a
+    heap when they fall due and quotas are compared only for users whose
+    counters moved in the last delta or whose entry changed on reload.
+    """
+
+    def __init__(self, store=None, resync_seconds=RESYNC_SECONDS):
+        self.store = store or get_store()
+        self.resync_seconds = resync_seconds
+        self.client = None
+        self.secret = None
+        self.users = {}
+        self.quota = QuotaTable()
+        self._config_signature = None
+        self._store_token = None
+        self._loaded_at = 0.0
+
+    def _refresh_client(self):
+        st = os.stat(CONFIG_FILE)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if self.client is not None and signature == self._config_signature:
+            return
+        with open(CONFIG_FILE, 'r') as config_file:
+            secret = json.load(config_file).get('trafficStats', {}).get('secret')
+        if not secret:
+            raise RuntimeError(f"Secret not found in {CONFIG_FILE}")
+        self.secret = secret
+        self.client = Hysteria2Client(base_url=API_BASE_URL, secret=secret)
+        self._config_signature = signature
+
+    def _store_changed(self):
+        token = self.store.change_token()
+        return (token is None or token != self._store_token
+                or time.monotonic() - self._loaded_at >= self.resync_seconds)
+
+    def _reload_users(self):
+        """Re-reads the store and feeds only added, edited or reset users to the quota table"""
+        users = self.store.all()
+        for username, user in users.items():
+            if self.users.get(username) != user:
+                self.quota.set_user(username, user)
+        for username in self.users.keys() - users.keys():
+            self.quota.remove(username)
+        self.users = users
+        self._loaded_at = time.monotonic()
+
+    def _apply_locally(self, traffic, online):
+        """Mirrors UserStore.apply_traffic() on the cached table"""
+        for username, user in self.users.items():
+            user['status'] = 'Online' if online.get(username) else 'Offline'
+        for username, is_online in online.items():
+            if is_online and username not in self.users:
+                self.users[username] = {'upload_bytes': 0, 'download_bytes': 0, 'status': 'Online'}
+        for username, (upload, download) in traffic.items():
+            user = self.users.setdefault(username, {'upload_bytes': 0, 'download_bytes': 0, 'status': 'Offline'})
+            user['upload_bytes'] = user.get('upload_bytes', 0) + upload
+            user['download_bytes'] = user.get('download_bytes', 0) + download
+        self.quota.add_usage(traffic)
+
+    def enforce(self, now=None):
+        """Blocks and kicks users over quota or past expiry. Returns the blocked usernames."""
+        users_to_kick = self.quota.due_changes(now)
+        if not users_to_kick:
+            return []
+
+        try:
+            with self.store.transaction():
+                current = self.store.change_token() == self._store_token
+                self.store.set_blocked(users_to_kick)
+                # Skip our own write, but not one that landed before it.
+                if current:
+                    self._store_token = self.store.change_token()
+        except Exception:
+            # The due entries are already popped; start over from the store next tick.
+            self.users, self.quota, self._store_token = {}, QuotaTable(), None
+            raise
+        self.quota.mark_blocked(users_to_kick)
+        for username in users_to_kick:
+            self.users[username]['blocked'] = True
+        # The auth servers must see the block before the users can reconnect.
+        self.store.flush_derived()
+        for batch in batches(users_to_kick):
+            try:
+                self.client.kick_clients(batch)
+            except Exception:
+                pass
+        return users_to_kick
+
+    def tick(self):
+        """Runs one poll: fetch and clear the counters, store them, enforce limits.
+
+        Returns a dict of per-phase timings in milliseconds plus counters, or
+        raises on configuration, API or store errors (the caller logs them).
+        """
+        started = time.perf_counter()
+        self._refresh_client()
+
+        online_status = self.client.get_online_clients()
+        online = {user_id: status.is_online for user_id, status in online_status.items()}
+        with flush_lock():
+            traffic_stats = self.client.get_traffic_stats(clear=True)
+            fetched = time.perf_counter()
+
+            with self.store.transaction():
+                external_change = self._store_changed()
+                traffic = settle_flushed_traffic(self.store, {
+                    user_id: (stats.upload_bytes, stats.download_bytes) for user_id, stats in traffic_stats.items()
+                })
+                self.store.apply_traffic(traffic, online)
+                # Taken before the commit lets anyone else write, so every
+                # later edit still shows up as a change.
+                token = self.store.change_token()
+        if external_change:
+            self._reload_users()
+        else:
+            self._apply_locally(traffic, online)
+        self._store_token = token
+        applied = time.perf_counter()
+
+        record_history(traffic)
+        recorded = time.perf_counter()
+
+        # An extension, unblock or quota reset committed since must not be
+        # enforced against from the old table.
+        if self._store_changed():
+            self._store_token = self.store.change_token()
+            self._reload_users()
+            external_change = True
+        blocked = self.enforce()
+        finished = time.perf_counter()
+
+        return {
+            'fetch_ms': round((fetched - started) * 1000, 2),
+            'apply_ms': round((applied - fetched) * 1000, 2),
+            'history_ms': round((recorded - applied) * 1000, 2),
+            'enforce_ms': round((finished - recorded) * 1000, 2),
+            'total_ms': round((finished - started) * 1000, 2),
+            'users': len(self.users),
+            'active': sum(1 for up, down in traffic.values() if up or down),
+            'online': sum(1 for is_online in online.values() if is_online),
+            'blocked': len(blocked),
+            'reloaded': external_change,
+        }
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         if sys.argv[1] == "kick":
@@ -271,6 +462,8 @@ if __name__ == "__main__":
         elif sys.argv[1] == "--no-gui":
             traffic_status(no_gui=True)
             kick_expired_users()
+        elif sys.argv[1] == "compact":
+            compact_traffic_journal()
         else:
             print(f"Unknown argument: {sys.argv[1]}")
             print("Usage: python traffic.py [kick|--no-gui]")
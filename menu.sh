@@ -105,7 +105,7 @@ hysteria2_edit_user_handler() {
 
     prompt_for_input "Enter the username you want to edit: " '^[a-zA-Z0-9]+$' '' username
 
-    user_exists_output=$(python3 $CLI_PATH get-user -u "$username" 2>&1)
+    user_exists_output=$(python3 $CLI_PATH get-user -u "$username" 2>/dev/null)
     if [[ -z "$user_exists_output" ]]; then
         echo -e "${red}Error:${NC} User '$username' not found or an error occurred."
         return 1
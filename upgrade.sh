@@ -62,6 +62,12 @@ FILES=(
     "$HYSTERIA_INSTALL_DIR/ca.key"
     "$HYSTERIA_INSTALL_DIR/ca.crt"
     "$HYSTERIA_INSTALL_DIR/users.json"
+    "$HYSTERIA_INSTALL_DIR/users.db"
+    "$HYSTERIA_INSTALL_DIR/users.db-wal"
+    "$HYSTERIA_INSTALL_DIR/traffic.journal"
+    "$HYSTERIA_INSTALL_DIR/traffic_history.db"
+    "$HYSTERIA_INSTALL_DIR/traffic_history.db-wal"
+    "$HYSTERIA_INSTALL_DIR/auth.snapshot"
     "$HYSTERIA_INSTALL_DIR/config.json"
     "$HYSTERIA_INSTALL_DIR/.configs.env"
     "$HYSTERIA_INSTALL_DIR/nodes.json"